@@ -0,0 +1,393 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Local position analysis service. A position in notation(HasamiShogiGame.get_notation()) is analyzed for its legal
+# moves, the moves which capture, the pieces of the player to move the opponent could capture next, and an alpha-beta
+# search score. Positions are reduced by symmetry as in the opening book(seen from the side of the player to move,
+# mirror images are one position), so the LRU cache keyed by that hash answers a position, its mirror image and the
+# same position for the other color. Requests for a position already queued or being analyzed wait for that result.
+# The other requests arriving within the batch window are analyzed together on a thread or process pool. The cache
+# hit rate, queue latency and batch sizes are kept as Metrics(Instrumentation.py).
+# Usage: python Analysis.py "RRRRRRRRR/9/9/9/9/9/9/9/BBBBBBBBB b"          (or positions on stdin, one per line)
+#        python Analysis.py --load 5000 --unique 200 --clients 8 --processes --workers 2
+
+import argparse
+import json
+import math
+import multiprocessing
+import queue
+import random
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from Engine import AlphaBetaEngine, WIN_SCORE
+from Game import HasamiShogiGame, parse_notation
+from Instrumentation import Metrics
+from OpeningBook import book_key
+from Position import Position, popcount, transform_bitboard
+from Variant import STANDARD, get_variant
+
+DEFAULT_DEPTH = 3
+DEFAULT_TIME_LIMIT = 1.0  # Seconds per position, the search normally stops at the depth first
+DEFAULT_BATCH_WINDOW = 0.005
+DEFAULT_MAX_BATCH = 64
+DEFAULT_CACHE_SIZE = 4096
+ENGINE_HASH_MB = 1  # Transposition table of the engine analyzing a batch
+
+
+class _Request:
+    """A request waiting for the analysis of its position, with the symmetry from its board to the cached one."""
+    __slots__ = ("future", "notation", "player_color", "symmetry", "tables", "submitted")
+
+    def __init__(self, future, notation, player_color, symmetry, tables):
+        """Creates a request submitted now."""
+        self.future = future
+        self.notation = notation
+        self.player_color = player_color
+        self.symmetry = symmetry
+        self.tables = tables
+        self.submitted = time.perf_counter()
+
+
+class AnalysisService:
+    """
+    Analyzes positions in notation on a pool of worker threads or processes. submit() returns a Future of the
+    analysis: a dictionary of the player to move, game state, legal moves, captures, threatened pieces, search score,
+    best move and depth, with squares as [row, col] and moves as [from_row, from_col, to_row, to_col]. A dispatcher
+    thread collects the positions which are not cached into batches.
+    """
+    def __init__(self, depth=DEFAULT_DEPTH, time_limit=DEFAULT_TIME_LIMIT, workers=1, processes=False,
+                 batch_window=DEFAULT_BATCH_WINDOW, max_batch=DEFAULT_MAX_BATCH, cache_size=DEFAULT_CACHE_SIZE,
+                 metrics=None):
+        """
+        Creates a service searching depth moves deep(at most time_limit seconds a position) on workers threads, or
+        processes if processes is set. A batch is sent once max_batch positions are waiting or batch_window seconds
+        after its first position arrived. The cache holds the analyses of cache_size positions. The statistics are
+        recorded in metrics, by default new Metrics.
+        """
+        self._depth = depth
+        self._time_limit = time_limit
+        self._workers = max(1, workers)
+        self._batch_window = batch_window
+        self._max_batch = max(1, max_batch)
+        self._cache_size = cache_size
+        self._metrics = Metrics() if metrics is None else metrics
+        self._cache = OrderedDict()  # (variant name, key) -> analysis as seen by black, least recently used first
+        self._waiting = dict()  # (variant name, key) -> requests for a position queued or being analyzed
+        self._lock = threading.Lock()  # Guards the cache, the waiting requests and the metrics
+        self._queue = queue.Queue()
+        if processes:  # Spawned, forking the dispatcher's process with its threads could deadlock
+            self._executor = ProcessPoolExecutor(max_workers=self._workers,
+                                                 mp_context=multiprocessing.get_context("spawn"))
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers)
+        self._dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self._dispatcher.start()
+
+    def submit(self, notation):
+        """
+        Returns a Future of the analysis of the position in notation. A cached position's future is done at once. An
+        invalid position's future raises ValueError.
+        """
+        future = Future()
+        try:
+            variant, black, red, player_color = parse_notation(notation)
+            if popcount(black) > variant.num_pieces or popcount(red) > variant.num_pieces:
+                raise ValueError("A color has more than %d pieces" % variant.num_pieces)
+        except ValueError as error:
+            with self._lock:
+                self._metrics.count("analysis_errors")
+            future.set_exception(error)
+            return future
+        tables = variant.get_tables()
+        key, symmetry = book_key(Position(black, red, tables=tables), player_color)
+        request = _Request(future, " ".join(notation.split()), player_color, symmetry, tables)
+        cache_key = (variant.name, key)
+        with self._lock:
+            self._metrics.count("analysis_requests")
+            analysis = self._cache.get(cache_key)
+            if analysis is not None:
+                self._cache.move_to_end(cache_key)
+                self._metrics.count("analysis_cache_hits")
+            elif cache_key in self._waiting:
+                self._waiting[cache_key].append(request)
+                self._metrics.count("analysis_coalesced")
+            else:
+                self._waiting[cache_key] = [request]
+                self._metrics.count("analysis_cache_misses")
+                mapping = tables.symmetries[symmetry]
+                opponent_color = "RED" if player_color == "BLACK" else "BLACK"
+                pieces = dict(BLACK=black, RED=red)
+                self._queue.put((cache_key, transform_bitboard(pieces[player_color], mapping),
+                                 transform_bitboard(pieces[opponent_color], mapping), request.submitted))
+        if analysis is not None:
+            self._resolve(request, analysis, True)
+        return future
+
+    def analyze(self, notation, timeout=None):
+        """Returns the analysis of the position in notation, waiting up to timeout seconds(None for no limit)."""
+        return self.submit(notation).result(timeout)
+
+    def get_metrics(self):
+        """Returns the Metrics the service records into."""
+        return self._metrics
+
+    def get_stats(self):
+        """
+        Returns a dictionary of the requests, cache hits, hit rate(requests answered without a new analysis),
+        batches, mean batch size, cached positions and the queue latency(submitted to sent to a worker) and request
+        latency(submitted to answered) in milliseconds.
+        """
+        with self._lock:
+            metrics = self._metrics
+            requests, hits = metrics.get_counter("analysis_requests"), metrics.get_counter("analysis_cache_hits")
+            coalesced, batches = metrics.get_counter("analysis_coalesced"), metrics.get_counter("analysis_batches")
+            queue_latency, latency = metrics.get_histogram("analysis_queue"), metrics.get_histogram("analysis_latency")
+            stats = dict(requests=requests, cache_hits=hits, coalesced=coalesced,
+                         hit_rate=round((hits + coalesced) / requests, 4) if requests else 0.0,
+                         batches=batches, positions=metrics.get_counter("analysis_positions"),
+                         mean_batch=round(metrics.get_counter("analysis_positions") / batches, 2) if batches else 0.0,
+                         cached=len(self._cache), errors=metrics.get_counter("analysis_errors"),
+                         queue_p50_ms=round(1000 * queue_latency.get_quantile(0.5), 3),
+                         queue_p99_ms=round(1000 * queue_latency.get_quantile(0.99), 3),
+                         latency_p50_ms=round(1000 * latency.get_quantile(0.5), 3),
+                         latency_p99_ms=round(1000 * latency.get_quantile(0.99), 3))
+        return stats
+
+    def close(self):
+        """Stops the dispatcher once the queued positions are sent, and shuts down the workers after them."""
+        if self._dispatcher is not None:
+            self._queue.put(None)
+            self._dispatcher.join()
+            self._dispatcher = None
+            self._executor.shutdown()
+
+    def _dispatch(self):
+        """Dispatcher thread target, sends the queued positions to the workers in batches until close()."""
+        running = True
+        while running:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch, deadline = [job], time.perf_counter() + self._batch_window
+            while len(batch) < self._max_batch:
+                try:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    running = False
+                    break
+                batch.append(job)
+            self._send_batch(batch)
+
+    def _send_batch(self, batch):
+        """Splits a batch by variant and among the workers, and sends each part to the pool."""
+        now = time.perf_counter()
+        groups = dict()
+        for cache_key, mover, opponent, submitted in batch:
+            groups.setdefault(cache_key[0], list()).append((cache_key, mover, opponent))
+        with self._lock:
+            self._metrics.count("analysis_batches")
+            self._metrics.count("analysis_positions", len(batch))
+            for *_, submitted in batch:
+                self._metrics.observe("analysis_queue", now - submitted)
+        for variant_name, jobs in groups.items():
+            part_size = math.ceil(len(jobs) / self._workers)
+            for start in range(0, len(jobs), part_size):
+                part = jobs[start:start + part_size]
+                future = self._executor.submit(analyze_batch, variant_name, [job[1:] for job in part], self._depth,
+                                               self._time_limit)
+                future.add_done_callback(lambda done, keys=[job[0] for job in part]: self._finish(keys, done))
+
+    def _finish(self, cache_keys, done):
+        """Caches the analyses of a finished part of a batch and answers the requests waiting for them."""
+        error = done.exception()
+        answered = list()
+        with self._lock:
+            for index, cache_key in enumerate(cache_keys):
+                requests = self._waiting.pop(cache_key, list())
+                if error is not None:
+                    self._metrics.count("analysis_errors", len(requests))
+                    answered += [(request, error) for request in requests]
+                    continue
+                analysis = done.result()[index]
+                self._cache[cache_key] = analysis
+                if len(self._cache) > self._cache_size:
+                    self._cache.popitem(last=False)
+                    self._metrics.count("analysis_cache_evictions")
+                answered += [(request, analysis) for request in requests]
+            self._metrics.set_gauge("analysis_cached", len(self._cache))
+        for request, analysis in answered:
+            if error is not None:
+                request.future.set_exception(error)
+            else:
+                self._resolve(request, analysis, False)
+
+    def _resolve(self, request, analysis, cached):
+        """Answers a request with an analysis seen by black, turned back to the request's board and colors."""
+        tables, player_color = request.tables, request.player_color
+        inverse, squares = tables.inverse_symmetries[request.symmetry], tables.squares
+        opponent_color = "RED" if player_color == "BLACK" else "BLACK"
+        moves, captures, threatened, state, score, best_move, depth = analysis
+
+        def move_of(from_index, to_index):
+            return list(squares[inverse[from_index]] + squares[inverse[to_index]])
+
+        def squares_of(bitboard):
+            return sorted(list(squares[inverse[index]]) for index in range(tables.num_squares) if bitboard >> index & 1)
+        state = dict(BLACK_WON=player_color + "_WON", RED_WON=opponent_color + "_WON").get(state, state)
+        result = dict(position=request.notation, player=player_color, state=state,
+                      moves=sorted(move_of(*move) for move in moves),
+                      captures=sorted((dict(move=move_of(from_index, to_index), captured=squares_of(captured))
+                                       for from_index, to_index, captured in captures), key=lambda item: item["move"]),
+                      threatened=squares_of(threatened), score=score,
+                      best_move=move_of(*best_move) if best_move is not None else None, depth=depth, cached=cached)
+        with self._lock:
+            self._metrics.observe("analysis_latency", time.perf_counter() - request.submitted)
+        request.future.set_result(result)
+
+
+def analyze_batch(variant_name, positions, depth, time_limit):
+    """
+    Worker target: returns the analyses of positions of the variant, given as (mover, opponent) bitboards with the
+    mover playing black. An analysis is (moves, captures, threatened, state, score, best move, depth), with moves as
+    (from, to) square indexes, captures as (from, to, captured bitboard), threatened the bitboard of the mover's pieces
+    the opponent could capture next, and the score for the mover.
+    """
+    game = HasamiShogiGame(variant=get_variant(variant_name))
+    engine = AlphaBetaEngine(time_limit=time_limit, max_depth=depth, hash_mb=ENGINE_HASH_MB)
+    size = game.get_variant().board_size
+    analyses = list()
+    for mover, opponent in positions:
+        game.set_position(mover, opponent, "RED")
+        threatened = 0
+        for _, _, captured in _capturing_moves(game, size):
+            threatened |= captured
+        game.set_position(mover, opponent, "BLACK")
+        moves = [(from_row * size + from_col, to_row * size + to_col)
+                 for from_row, from_col, to_row, to_col in game.legal_moves()]
+        state = game.get_game_state()
+        if state == "UNFINISHED":
+            best_move, info = engine.search(game)
+            score, searched = info.score, info.depth
+            best_move = (best_move[0] * size + best_move[1], best_move[2] * size + best_move[3]) if best_move else None
+        else:
+            best_move, searched = None, 0
+            score = WIN_SCORE if state == "BLACK_WON" else -WIN_SCORE if state == "RED_WON" else 0
+        analyses.append((moves, _capturing_moves(game, size), threatened, state, score, best_move, searched))
+    return analyses
+
+
+def _capturing_moves(game, size):
+    """Returns the active player's moves which capture as (from, to, captured bitboard), by making each move."""
+    position = game.get_position()
+    defender = "RED" if game.get_active_player() == "BLACK" else "BLACK"
+    captures = list()
+    for from_row, from_col, to_row, to_col in game.legal_moves():
+        before = position.get_pieces(defender)
+        game.make_move(from_row, from_col, to_row, to_col)
+        captured = before & ~position.get_pieces(defender)
+        game.unmake_move()
+        if captured:
+            captures.append((from_row * size + from_col, to_row * size + to_col, captured))
+    return captures
+
+
+def random_positions(count, variant=STANDARD, max_plies=40, seed=0):
+    """Returns count positions in notation from random games of the variant, each after up to max_plies moves."""
+    rng = random.Random(seed)
+    positions = list()
+    while len(positions) < count:
+        game = HasamiShogiGame(variant=variant)
+        for _ in range(rng.randrange(max_plies + 1)):
+            moves = game.legal_moves()
+            if not moves:
+                break
+            game.make_move(*rng.choice(moves))
+        positions.append(game.get_notation())
+    return positions
+
+
+def run_load(service, num_requests, num_unique, num_clients=4, variant=STANDARD, seed=0):
+    """
+    Sends num_requests requests for num_unique random positions from num_clients threads, each waiting for its answer
+    before sending the next. Returns a report dictionary with the service statistics.
+    """
+    positions = random_positions(num_unique, variant, seed=seed)
+    rng = random.Random(seed)
+    requests = [rng.choice(positions) for _ in range(num_requests)]
+    errors = list()
+
+    def client(index):
+        for notation in requests[index::num_clients]:
+            try:
+                service.analyze(notation)
+            except Exception as error:
+                errors.append(repr(error))
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(num_clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    report = dict(requests=num_requests, unique=num_unique, clients=num_clients, seconds=round(elapsed, 3),
+                  requests_per_sec=round(num_requests / elapsed, 1) if elapsed else 0.0,
+                  first_error=errors[0] if errors else None)
+    report.update(service=service.get_stats())
+    return report
+
+
+def main(argv=None):
+    """Analyzes the positions given, or read from stdin, printing one JSON line each, or runs a load test."""
+    parser = argparse.ArgumentParser(description="Hasami Shogi position analysis service.")
+    parser.add_argument("positions", nargs="*", help="positions in notation, else read from stdin one per line")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH, help="search depth in moves")
+    parser.add_argument("--time-limit", type=float, default=DEFAULT_TIME_LIMIT, help="search seconds per position")
+    parser.add_argument("--workers", type=int, default=1, help="worker threads or processes")
+    parser.add_argument("--processes", action="store_true", help="analyze on worker processes instead of threads")
+    parser.add_argument("--window", type=float, default=1000 * DEFAULT_BATCH_WINDOW, help="batch window in ms")
+    parser.add_argument("--max-batch", type=int, default=DEFAULT_MAX_BATCH, help="positions per batch at most")
+    parser.add_argument("--cache", type=int, default=DEFAULT_CACHE_SIZE, help="positions kept in the cache")
+    parser.add_argument("--metrics", metavar="FILE", help="write the metrics to FILE at the end(.prom or JSON)")
+    parser.add_argument("--load", type=int, metavar="REQUESTS", help="run a load test of this many requests")
+    parser.add_argument("--unique", type=int, default=200, help="distinct positions in the load test")
+    parser.add_argument("--clients", type=int, default=4, help="client threads in the load test")
+    parser.add_argument("--variant", default=STANDARD.name, help="variant of the load test positions")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the load test positions")
+    args = parser.parse_args(argv)
+    service = AnalysisService(args.depth, args.time_limit, args.workers, args.processes, args.window / 1000,
+                              args.max_batch, args.cache)
+    try:
+        if args.load:
+            report = run_load(service, args.load, args.unique, args.clients, get_variant(args.variant), args.seed)
+            json.dump(report, sys.stdout, indent=2)
+            print()
+        else:
+            notations = args.positions or [line for line in sys.stdin if line.strip()]
+            for notation, future in [(notation, service.submit(notation)) for notation in notations]:
+                try:
+                    result = future.result()
+                except ValueError as error:
+                    result = dict(position=" ".join(notation.split()), error=str(error))
+                print(json.dumps(result, separators=(",", ":")))
+            json.dump(service.get_stats(), sys.stderr)
+            print(file=sys.stderr)
+    finally:
+        service.close()
+    if args.metrics:
+        service.get_metrics().write(args.metrics)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Process-wide image cache. Each image is decoded from disk once and the same surface is shared by every square sprite
+# and every game. Images are converted to the display's pixel format once a display mode is set, so blits don't pay
+# for a format conversion each frame.
+
+import os
+import pygame
+
+IMAGE_DIR = "images"
+IMAGE_NAMES = ("Background.png", "Black.png", "Red.png", "Blank.png", "Green.png")
+
+# Cached surfaces by image name, and the names already converted to the display format.
+_images = dict()
+_converted = set()
+
+
+def get_image(name):
+    """Returns the shared surface of an image in the images folder, loading it on first use."""
+    image = _images.get(name)
+    if image is None:
+        image = _images[name] = pygame.image.load(os.path.join(IMAGE_DIR, name))
+    if name not in _converted and pygame.display.get_surface() is not None:
+        image = _images[name] = _convert(image)
+        _converted.add(name)
+    return image
+
+
+def _convert(image):
+    """Returns the image converted to the display format, keeping per-pixel alpha if it has any."""
+    if image.get_flags() & pygame.SRCALPHA:
+        return image.convert_alpha()
+    return image.convert()
+
+
+def preload(names=IMAGE_NAMES):
+    """
+    Loads the images up front, e.g. at startup before the first game is drawn. Call after pygame.display.set_mode so
+    the images are converted too, else they are converted on their next get_image.
+    """
+    for name in names:
+        get_image(name)
+
+
+def clear():
+    """Empties the cache, e.g. after the display mode changes to a different pixel format."""
+    _images.clear()
+    _converted.clear()
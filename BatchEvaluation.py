@@ -0,0 +1,163 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Batch position evaluation with NumPy. Positions are an (N, 9, 9) int8 array with 1 for black, -1 for red and 0 for
+# an empty square. Every feature is computed for the whole batch at once from lookup tables of all possible board lines,
+# there is no Python loop over positions or squares.
+
+import functools
+import numpy as np
+
+BLACK, RED, EMPTY = 1, -1, 0
+FEATURE_NAMES = ("black_material", "red_material", "black_mobility", "red_mobility",
+                 "black_threatened", "red_threatened", "black_corners_vulnerable", "red_corners_vulnerable")
+# Score weights, from black's point of view: material, mobility, pieces under capture threat, vulnerable corners.
+WEIGHTS = np.array((100, -100, 1, -1, -40, 40, -40, 40), dtype=np.int32)
+
+# Square codes used for the capture threat of one color against the other.
+_UNREACHABLE, _REACHABLE, _ATTACKER, _DEFENDER, _EDGE = 0, 1, 2, 3, 4
+
+
+def positions_from_bitboards(black, red, board_size=9):
+    """Returns the (N, size, size) int8 positions for sequences of black and red bitboards(Python ints)."""
+    num_bytes = (board_size * board_size + 7) // 8
+    black_bits = np.frombuffer(b"".join(bitboard.to_bytes(num_bytes, "little") for bitboard in black), np.uint8)
+    red_bits = np.frombuffer(b"".join(bitboard.to_bytes(num_bytes, "little") for bitboard in red), np.uint8)
+    num_squares = board_size * board_size
+    black_bits = np.unpackbits(black_bits.reshape(-1, num_bytes), axis=1, bitorder="little")[:, :num_squares]
+    red_bits = np.unpackbits(red_bits.reshape(-1, num_bytes), axis=1, bitorder="little")[:, :num_squares]
+    positions = black_bits.astype(np.int8) - red_bits.astype(np.int8)
+    return positions.reshape(-1, board_size, board_size)
+
+
+def positions_from_games(games):
+    """Returns the (N, 9, 9) int8 positions of a sequence of HasamiShogiGame."""
+    positions = [game.get_position() for game in games]
+    return positions_from_bitboards([position.get_pieces("BLACK") for position in positions],
+                                    [position.get_pieces("RED") for position in positions])
+
+
+def _scan_order(size, step):
+    """Returns the order to scan a line so each square has seen the squares after it in the step direction."""
+    return range(size - 1, -1, -1) if step > 0 else range(size)
+
+
+def _first_stop(stops, codes, step, strict):
+    """
+    For each square of each line, returns the code of the first stop square in the step direction(+1 or -1), at or
+    strictly after the square, or _EDGE if the line ends first.
+    """
+    result = np.empty_like(codes)
+    current = np.full(codes.shape[1:], _EDGE, codes.dtype)
+    for index in _scan_order(len(codes), step):
+        if strict:
+            result[index] = current
+        current = np.where(stops[index], codes[index], current)
+        if not strict:
+            result[index] = current
+    return result
+
+
+def _pack_bits(line_major):
+    """Returns the (size, M) line-major bool array packed to an (M,) int array of bitmasks, bit i for square i."""
+    weights = (1 << np.arange(len(line_major), dtype=np.int32))[:, np.newaxis]
+    return (line_major * weights).sum(axis=0, dtype=np.int32)
+
+
+def _all_lines(size, num_codes):
+    """Returns every line of size squares with codes 0 to num_codes - 1, line-major (size, num_codes ** size)."""
+    index = np.arange(num_codes ** size, dtype=np.int32)
+    powers = num_codes ** np.arange(size, dtype=np.int32)
+    return (index[np.newaxis, :] // powers[:, np.newaxis] % num_codes).astype(np.int8)
+
+
+@functools.lru_cache(maxsize=None)
+def _tables(size):
+    """
+    Returns the lookup tables for lines of size squares, built once per size by scanning every possible line:
+    mobility and reachable empty squares for lines coded 0 empty, 1 black, 2 red(3 ** size lines), and threatened
+    defenders for lines coded with the square codes(4 ** size lines, empties split into reachable and unreachable).
+    """
+    lines = _all_lines(size, 3)
+    empty, occupied = lines == 0, lines != 0
+    mobility = np.zeros(lines.shape[1], np.int32)  # Black moves in the low 16 bits, red moves in the high bits.
+    for step in (1, -1):
+        run = np.zeros(lines.shape[1:], np.int32)
+        for index in _scan_order(size, step):
+            mobility += np.where(lines[index] == 1, run, 0) + (np.where(lines[index] == 2, run, 0) << 16)
+            run = np.where(empty[index], run + 1, 0)
+    reach = dict()
+    for color, code in ((BLACK, 1), (RED, 2)):
+        piece_codes = np.where(lines == code, _ATTACKER, _DEFENDER).astype(np.int8)
+        reachable = empty & ((_first_stop(occupied, piece_codes, 1, True) == _ATTACKER) |
+                             (_first_stop(occupied, piece_codes, -1, True) == _ATTACKER))
+        reach[color] = _pack_bits(reachable)
+
+    codes = _all_lines(size, 4)
+    is_defender = codes == _DEFENDER
+    forward = _first_stop(~is_defender, codes, 1, False)
+    backward = _first_stop(~is_defender, codes, -1, False)
+    threats = _pack_bits(is_defender & (((forward == _ATTACKER) & (backward == _REACHABLE)) |
+                                        ((forward == _REACHABLE) & (backward == _ATTACKER))))
+    bits = ((np.arange(1 << size)[:, np.newaxis] >> np.arange(size)) & 1).astype(bool)
+    return mobility, reach, threats, bits
+
+
+def _line_indexes(codes, num_codes):
+    """
+    Returns the (N, size) table indexes of the rows and of the columns of an (N, size, size) array of codes. The
+    indexes are exact in float32(at most 4 ** 9), which lets the sums run as matrix products.
+    """
+    powers = (num_codes ** np.arange(codes.shape[-1])).astype(np.float32)
+    codes = codes.astype(np.float32)
+    return (codes @ powers).astype(np.intp), (powers @ codes).astype(np.intp)
+
+
+def evaluate_batch(positions):
+    """
+    Returns (features, scores) for an (N, size, size) array of positions. Features is an (N, 8) int32 array in the
+    order of FEATURE_NAMES, scores an (N,) int32 array from black's point of view.
+
+    Each row and column is looked up in tables of all possible lines: the moves along the line for each color, the
+    empty squares an attacker can slide into along the line, and which defenders a line with those reachable squares
+    leaves under capture threat.
+    """
+    board = np.asarray(positions, dtype=np.int8)
+    if board.ndim == 2:
+        board = board[np.newaxis]
+    size = board.shape[-1]
+    mobility, reach, threats, bits = _tables(size)
+    empty, occupied = board == EMPTY, (board != EMPTY).view(np.int8)
+    rows, columns = _line_indexes(occupied + (board < 0), 3)  # Line codes 0 empty, 1 black, 2 red
+
+    features = np.empty((board.shape[0], len(FEATURE_NAMES)), np.int32)
+    features[:, 0] = (board == BLACK).sum(axis=(1, 2), dtype=np.int32)
+    features[:, 1] = (board == RED).sum(axis=(1, 2), dtype=np.int32)
+    moves = np.take(mobility, rows).sum(axis=1) + np.take(mobility, columns).sum(axis=1)
+    features[:, 2], features[:, 3] = moves & 0xFFFF, moves >> 16
+
+    last = size - 1
+    corner_rows, corner_cols = np.array((0, 0, last, last)), np.array((0, last, 0, last))
+    for attacker, threatened_feature, corner_feature in ((BLACK, 5, 7), (RED, 4, 6)):
+        # Empty squares an attacker can slide into along their row or their column.
+        reachable = empty & (np.take(bits, np.take(reach[attacker], rows), axis=0) |
+                             np.take(bits, np.take(reach[attacker], columns), axis=0).swapaxes(1, 2))
+        codes = 2 * occupied + ((board * attacker) < 0) + reachable  # Attacker 2, defender 3, empty 0 or 1
+        code_rows, code_columns = _line_indexes(codes, 4)
+        threatened = np.take(bits, np.take(threats, code_rows), axis=0) | \
+            np.take(bits, np.take(threats, code_columns), axis=0).swapaxes(1, 2)
+        features[:, threatened_feature] = threatened.sum(axis=(1, 2), dtype=np.int32)
+
+        side_a = codes[:, corner_rows + np.array((1, 1, -1, -1)), corner_cols]
+        side_b = codes[:, corner_rows, corner_cols + np.array((1, -1, 1, -1))]
+        vulnerable = (board[:, corner_rows, corner_cols] == -attacker) & \
+            (((side_a == _ATTACKER) & (side_b == _REACHABLE)) | ((side_a == _REACHABLE) & (side_b == _ATTACKER)))
+        features[:, corner_feature] = vulnerable.sum(axis=1, dtype=np.int32)
+    return features, features @ WEIGHTS
@@ -0,0 +1,335 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Benchmark suite for the rules, replay and rendering, run headless(SDL dummy video driver). Every benchmark is
+# seeded so runs measure the same work, and reports the best of a few repeats. Results are written as JSON, and can
+# be compared with a stored baseline: a benchmark more than the threshold slower is reported as a regression and the
+# exit status is 1.
+# Usage: python Benchmark.py --output benchmark.json
+#        python Benchmark.py --baseline benchmark.json --threshold 0.1 [--only perft,replay] [--archive games.hsgr]
+
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import pygame
+import Main
+from Board import Board
+from Game import HasamiShogiGame
+from Perft import perft
+from Record import GameRecordWriter, read_records
+
+FORMAT_VERSION = 1
+DEFAULT_REPEAT = 5
+MIN_RUN_SECONDS = 0.2
+DEFAULT_THRESHOLD = 0.10
+NUM_GAMES = 20
+MAX_MOVES = 200
+
+
+def _random_games(num_games, seed, max_moves=MAX_MOVES):
+    """Returns the move lists of seeded random games."""
+    rng = random.Random(seed)
+    games = list()
+    for _ in range(num_games):
+        game, moves = HasamiShogiGame(), list()
+        while game.get_game_state() == "UNFINISHED" and len(moves) < max_moves:
+            legal_moves = game.legal_moves()
+            if not legal_moves:
+                break
+            moves.append(rng.choice(legal_moves))
+            game.make_move(*moves[-1])
+        games.append(moves)
+    return games
+
+
+def _capture_positions(num_positions, seed):
+    """
+    Returns (game, move) pairs where the move captures, at least a quarter of them capturing a corner piece, collected
+    from seeded random games.
+    """
+    rng = random.Random(seed)
+    corner_captures = HasamiShogiGame().get_position().get_tables().corner_captures
+    captures, corners = list(), list()
+    while len(captures) + len(corners) < num_positions or len(corners) < num_positions // 4:
+        game = HasamiShogiGame()
+        while game.get_game_state() == "UNFINISHED" and len(game.get_move_history()) < MAX_MOVES:
+            moves = game.legal_moves()
+            if not moves:
+                break
+            position, player, size = game.get_position(), game.get_active_player(), game.get_variant().board_size
+            for move in moves:
+                to_index = move[2] * size + move[3]
+                mask = position.get_capture_mask(player, move[0] * size + move[1], to_index)
+                if mask:
+                    if to_index in corner_captures and mask & corner_captures[to_index][0]:
+                        corners.append((game.copy(), move))
+                    elif len(captures) < num_positions - num_positions // 4:
+                        captures.append((game.copy(), move))
+            game.make_move(*rng.choice(moves))
+    return captures + corners[:num_positions - len(captures)]
+
+
+def _best_time(function, repeat):
+    """
+    Returns the seconds per call of the function, the best of repeat runs. Like timeit, a run calls the function
+    enough times to take at least MIN_RUN_SECONDS, and the garbage collector is off while timing.
+    """
+    loops = 1
+    while True:
+        seconds = _time_loops(function, loops)
+        if seconds >= MIN_RUN_SECONDS:
+            break
+        loops *= 2 if seconds <= 0 else max(2, min(10, int(1.2 * MIN_RUN_SECONDS / seconds)))
+    best = seconds
+    for _ in range(repeat - 1):
+        best = min(best, _time_loops(function, loops))
+    return best / loops
+
+
+def _time_loops(function, loops):
+    """Returns the seconds taken calling the function loops times."""
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            function()
+        return time.perf_counter() - start
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def _result(value, unit, higher_is_better, **extra):
+    """Returns a benchmark result dictionary."""
+    return dict(value=value, unit=unit, higher_is_better=higher_is_better, **extra)
+
+
+def bench_perft(repeat, depth=3):
+    """Perft from the start position: move generation, make_move and unmake_move."""
+    nodes = perft(HasamiShogiGame(), depth)
+    seconds = _best_time(lambda: perft(HasamiShogiGame(), depth), repeat)
+    return _result(nodes / seconds, "nodes/s", True, depth=depth, nodes=nodes)
+
+
+def bench_move_generation(repeat, every=5):
+    """legal_moves() on every fifth position of random games."""
+    positions = list()
+    for moves in _random_games(NUM_GAMES, seed=1):
+        game = HasamiShogiGame()
+        for ply, move in enumerate(moves):
+            if ply % every == 0:
+                positions.append(game.copy())
+            game.make_move(*move)
+
+    def run():
+        for game in positions:
+            game.legal_moves()
+    seconds = _best_time(run, repeat)
+    return _result(len(positions) / seconds, "positions/s", True, positions=len(positions))
+
+
+def _replay(all_moves):
+    """Makes the moves of each game on a new game."""
+    for moves in all_moves:
+        game = HasamiShogiGame()
+        for move in moves:
+            game.make_move(*move)
+
+
+def bench_make_move_random(repeat):
+    """make_move throughput replaying seeded random games."""
+    all_moves = _random_games(NUM_GAMES, seed=2)
+    num_moves = sum(len(moves) for moves in all_moves)
+    seconds = _best_time(lambda: _replay(all_moves), repeat)
+    return _result(num_moves / seconds, "moves/s", True, moves=num_moves, games=len(all_moves))
+
+
+def bench_make_move_recorded(repeat, archive=None):
+    """
+    make_move throughput replaying recorded games: decoding the records of an archive(Record.py) and making their
+    moves. Without an archive, seeded random games are recorded to a temporary archive first.
+    """
+    if archive is None:
+        handle, path = tempfile.mkstemp(suffix=".hsgr")
+        os.close(handle)
+        with GameRecordWriter(path) as writer:
+            for moves in _random_games(NUM_GAMES, seed=3):
+                game = HasamiShogiGame()
+                for move in moves:
+                    game.make_move(*move)
+                writer.write_game(game)
+        records = list(read_records(path, use_mmap=False))
+        os.remove(path)
+    else:
+        records = list(read_records(archive, use_mmap=False))
+    num_moves = sum(record.get_num_moves() for record in records)
+
+    def run():
+        for record in records:
+            record.replay()
+    seconds = _best_time(run, repeat)
+    return _result(num_moves / seconds, "moves/s", True, moves=num_moves, games=len(records),
+                   archive=archive or "generated")
+
+
+def bench_captures(repeat, num_positions=400):
+    """make_move and unmake_move of capturing moves, a quarter of them capturing a corner piece."""
+    positions = _capture_positions(num_positions, seed=4)
+
+    def run():
+        for game, move in positions:
+            game.make_move(*move)
+            game.unmake_move()
+    seconds = _best_time(run, repeat)
+    return _result(len(positions) / seconds, "captures/s", True, positions=len(positions))
+
+
+def bench_replay(repeat):
+    """Full game replay of Main.TEST_MOVE_LIST from a new game, as the test code in Main.main() does."""
+    squares = Main.TEST_MOVE_LIST
+
+    def run():
+        game = HasamiShogiGame()
+        for index in range(0, len(squares) - 1, 2):
+            game.make_move(*squares[index], *squares[index + 1])
+    seconds = _best_time(run, repeat)
+    return _result(1000 * seconds, "ms/game", False, moves=len(squares) // 2)
+
+
+def bench_board_construction(repeat):
+    """Board.__init__: a sprite per square of the board."""
+    _init_display()
+    seconds = _best_time(Board, repeat)
+    return _result(1000 * seconds, "ms/board", False)
+
+
+def bench_frame_render(repeat):
+    """A frame of Main.main()'s "full" render mode: the whole window redrawn."""
+    display = _init_display()
+    game = HasamiShogiGame()
+    board = game.get_board()
+
+    def full_frame():
+        display.blit(Main.get_image(Main.BACKGROUND_IMAGE), (0, 0))
+        Main.fill_border(display, board.get_size())
+        Main.highlight_square(display, 4, 4)
+        Main.game_info(display, game)
+        board.display_board(display)
+        pygame.display.update()
+    return _result(1000 * _best_time(full_frame, repeat), "ms/frame", False)
+
+
+def bench_dirty_render(repeat, frames=100):
+    """Frames of the DirtyRenderer(the default render mode) during a random game, a move and new highlight each."""
+    display = _init_display()
+    all_moves = _random_games(1, seed=5, max_moves=frames)[0]
+    game = HasamiShogiGame()
+    board = game.get_board()
+
+    def dirty_frames():
+        while game.unmake_move():
+            pass
+        renderer = Main.DirtyRenderer(display, board)
+        for index, move in enumerate(all_moves):
+            game.make_move(*move)
+            pygame.display.update(renderer.render(game, index % board.get_size(), move[3]))
+    return _result(1000 * _best_time(dirty_frames, repeat) / len(all_moves), "ms/frame", False)
+
+
+def _init_display():
+    """Returns the display surface, opened on first use."""
+    if not pygame.display.get_init() or pygame.display.get_surface() is None:
+        pygame.init()
+        pygame.display.set_mode((Main.WINDOW_WIDTH, Main.WINDOW_HEIGHT))
+    return pygame.display.get_surface()
+
+
+BENCHMARKS = dict(perft=bench_perft, move_generation=bench_move_generation, make_move_random=bench_make_move_random,
+                  make_move_recorded=bench_make_move_recorded, captures=bench_captures, replay=bench_replay,
+                  board_construction=bench_board_construction, frame_render=bench_frame_render,
+                  dirty_render=bench_dirty_render)
+
+
+def run_benchmarks(names=None, repeat=DEFAULT_REPEAT, archive=None, report=None):
+    """
+    Runs the named benchmarks(all by default) and returns the report dictionary: the environment and each benchmark's
+    result. report(name, result) is called as each benchmark finishes.
+    """
+    results = dict()
+    for name in (names or BENCHMARKS):
+        if name == "make_move_recorded":
+            result = BENCHMARKS[name](repeat, archive)
+        else:
+            result = BENCHMARKS[name](repeat)
+        results[name] = result
+        if report is not None:
+            report(name, result)
+    return dict(version=FORMAT_VERSION, created=time.strftime("%Y-%m-%dT%H:%M:%S"), python=platform.python_version(),
+                pygame=pygame.version.ver, platform=platform.platform(), repeat=repeat, results=results)
+
+
+def compare(report, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns a list of (name, baseline value, value, change, regressed) for the benchmarks in both reports. change is
+    the relative improvement(positive is faster, whichever way the unit goes), a benchmark regressed if it is more
+    than threshold worse.
+    """
+    rows = list()
+    for name, result in report["results"].items():
+        base = baseline.get("results", dict()).get(name)
+        if base is None or base["unit"] != result["unit"] or not base["value"]:
+            continue
+        ratio = result["value"] / base["value"]
+        change = ratio - 1 if result["higher_is_better"] else 1 / ratio - 1
+        rows.append((name, base["value"], result["value"], change, change < -threshold))
+    return rows
+
+
+def main(argv=None):
+    """Runs the benchmarks from the command line, writes the JSON report and compares it with a baseline."""
+    parser = argparse.ArgumentParser(description="Hasami Shogi benchmark suite.")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fraction slower than the baseline reported as a regression")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs of each benchmark, the best counts")
+    parser.add_argument("--only", help="comma separated benchmarks to run: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--archive", help="game archive for make_move_recorded, else random games are recorded")
+    args = parser.parse_args(argv)
+    names = args.only.split(",") if args.only else None
+    for name in names or ():
+        if name not in BENCHMARKS:
+            parser.error("unknown benchmark: %s" % name)
+    report = run_benchmarks(names, args.repeat, args.archive,
+                            lambda name, result: print("%-20s %12.2f %s" % (name, result["value"], result["unit"])))
+    with open(args.output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    if args.baseline is None:
+        return 0
+    with open(args.baseline) as baseline_file:
+        rows = compare(report, json.load(baseline_file), args.threshold)
+    print("\n%-20s %12s %12s %8s" % ("benchmark", "baseline", "now", "change"))
+    for name, base, value, change, regressed in rows:
+        print("%-20s %12.2f %12.2f %+7.1f%%%s" % (name, base, value, 100 * change, "  REGRESSION" if regressed else ""))
+    return 1 if any(row[4] for row in rows) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
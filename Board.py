@@ -9,52 +9,86 @@
 #               assumed to be all or all but one piece captured.
 
 import pygame
-from Sprites import Sprites
+from Sprites import Sprites, SQUARE_WIDTH, SQUARE_HEIGHT, BORDER, GAP_SIZE
+from Position import Position, iter_squares
 
 
 class Board:
-    """Represents the 9x9 board in a game of Hasami Shogi."""
+    """
+    Represents the 9x9 board in a game of Hasami Shogi. The board is a pygame view of a Position, the square sprites
+    are synced from the position's bitboards when the board is displayed.
+    """
 
-    def __init__(self):
-        """Creates the 9x9 board for a game of Hasami Shogi. Stores the state of each square on the board."""
+    def __init__(self, position=None):
+        """
+        Creates the board for a game of Hasami Shogi, the size of the position(9x9 unless a variant). Stores the state
+        of each square on the board.
+        """
 
-        # Pygame Sprites Group
-        self._sprite_group = pygame.sprite.Group()
+        # Position the board is a view of, and the bitboards last synced to the sprites.
+        self._position = Position() if position is None else position
+        self._synced = dict(BLACK=self._position.get_pieces("BLACK"), RED=self._position.get_pieces("RED"))
+
+        # Pygame Sprites Group, draws only the sprites marked dirty unless repainted.
+        self._sprite_group = pygame.sprite.LayeredDirty(_use_update=True)
+        self._sprite_group.set_timing_threshold(float("inf"))  # Never fall back to redrawing every sprite
 
         def _make_board(board_size=9):
-            """Initialize Hasami Shogi board with pieces on first and last rank(row)."""
+            """Initialize Hasami Shogi board from the position, pieces start on first and last rank(row)."""
             shogi_board = []
             for row in range(board_size):
                 shogi_board.append([])
                 for col in range(board_size):
-                    if row == 0:
-                        sprite = Sprites(row, col, "R")
-                    elif row == board_size - 1:
-                        sprite = Sprites(row, col, "B")
-                    else:
-                        sprite = Sprites(row, col, ".")
+                    sprite = Sprites(row, col, self._position.get_square_state(row, col))
                     self._sprite_group.add(sprite)
                     shogi_board[row].append(sprite)
             return shogi_board
 
         # Initialize Board and Square Sprites.
-        self._shogi_board = _make_board()
+        self._shogi_board = _make_board(self._position.get_size())
+
+    def sync(self):
+        """Updates the sprites of the squares which changed in the position since the last sync."""
+        black, red = self._position.get_pieces("BLACK"), self._position.get_pieces("RED")
+        changed = (black ^ self._synced["BLACK"]) | (red ^ self._synced["RED"])
+        for row, col in iter_squares(changed, len(self._shogi_board)):
+            occupant = self._position.get_square_occupant(row, col)
+            self._shogi_board[row][col].set_state(None if occupant == "NONE" else occupant)
+        self._synced["BLACK"], self._synced["RED"] = black, red
 
     def display_board(self, game_display):
         """Displays the current board in Pygame."""
+        self.sync()
+        self._sprite_group.repaint_rect(game_display.get_rect())
         self._sprite_group.draw(game_display)
 
+    def display_dirty(self, game_display):
+        """Displays only the squares which changed since the last display, returns the list of updated rects."""
+        self.sync()
+        return self._sprite_group.draw(game_display)
+
+    def mark_dirty(self, row, col):
+        """Marks a square to be redrawn by the next display_dirty, e.g. after drawing under it."""
+        self._shogi_board[row][col].dirty = 1
+
     def get_square(self, mouse_x, mouse_y):
-        """Returns the row and column of the square based on mouse coordinates."""
-        for row in range(9):
-            for col in range(9):
-                sprite = self._shogi_board[row][col]
-                if sprite.rect.collidepoint(mouse_x, mouse_y):
-                    return [row, col]
+        """
+        Returns the row and column of the square based on mouse coordinates, computed from the board layout. Returns
+        None for both if the mouse is off the board or on the gap between squares.
+        """
+        col, x = divmod(mouse_x - BORDER - GAP_SIZE, SQUARE_WIDTH + GAP_SIZE)
+        row, y = divmod(mouse_y - BORDER - GAP_SIZE, SQUARE_HEIGHT + GAP_SIZE)
+        board_size = len(self._shogi_board)
+        if 0 <= row < board_size and 0 <= col < board_size and x < SQUARE_WIDTH and y < SQUARE_HEIGHT:
+            return [row, col]
         return [None, None]
 
+    def get_size(self):
+        """Returns the number of rows(and columns) of the board."""
+        return len(self._shogi_board)
+
     def get_square_state(self, row, col):
-        """Returns current state of a square on the board."""
+        """Returns current displayed state of a square on the board."""
         return self._shogi_board[row][col].get_state()
 
     def set_square(self, row, col, state=None):
@@ -63,7 +97,7 @@ class Board:
 
     def clear_green(self):
         """Reset green squares to blank."""
-        for row in range(9):
-            for col in range(9):
+        for row in range(len(self._shogi_board)):
+            for col in range(len(self._shogi_board)):
                 if self._shogi_board[row][col].get_state() == "G":
                     self._shogi_board[row][col].set_state()
@@ -0,0 +1,269 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Checks the capture detection of HasamiShogiGame(rank and file masks with lookup tables) against the original
+# square by square implementation on a 9x9 grid, over random games, then compares their moves per second. Exits with
+# status 1 if any move gives a different result. Usage: python CaptureCheck.py [num_games] [seed]
+
+import random
+import sys
+import time
+from Game import HasamiShogiGame
+from Position import square_index
+
+
+class _Grid:
+    """The squares of the original Board, 'B', 'R' or '.', without the pygame sprites."""
+    def __init__(self, board_size=9):
+        """Creates the board with pieces on the first and last rank(row)."""
+        self._squares = [["R" if row == 0 else "B" if row == board_size - 1 else "." for _ in range(board_size)]
+                         for row in range(board_size)]
+
+    def get_square_state(self, row, col):
+        """Returns current state of a square on the board."""
+        return self._squares[row][col]
+
+    def set_square(self, row, col, state=None):
+        """Updates the state of the specified square, BLACK, RED or None for empty."""
+        self._squares[row][col] = state[0] if state else "."
+
+
+class OriginalGame:
+    """
+    The rules as first written, square by square on the board: moves are checked by walking the squares between, and
+    captures by walking out from the to square. The reference implementation, the methods are kept as they were.
+    """
+    def __init__(self):
+        """Creates a new game of Hasami Shogi."""
+        self._board = _Grid()
+        self._current_player = "BLACK"
+        self._game_state = "UNFINISHED"
+        self._captured_pieces = dict(BLACK=0, RED=0)
+
+    def get_game_state(self):
+        """Returns the state of the game, unfinished, red won, or black won."""
+        return self._game_state
+
+    def get_num_captured_pieces(self, player_color):
+        """Returns the number of pieces of that color that have been captured."""
+        if player_color in ("BLACK", "RED"):
+            return self._captured_pieces[player_color]
+
+    def get_square_state(self, row, col):
+        """Returns the state of a square, 'B', 'R' or '.'."""
+        return self._board.get_square_state(row, col)
+
+    def get_square_occupant(self, row, col):
+        """Returns whether the specified square is occupied by a red piece, black piece, or neither."""
+        square_occupant = self._board.get_square_state(row, col)
+        return "BLACK" if square_occupant == 'B' else "RED" if square_occupant == 'R' else "NONE"
+
+    def make_move(self, from_row, from_col, to_row, to_col):
+        """
+        The function makes a move(if valid), removes any captured pieces, and updates the game state and turn. Returns
+        True if valid, else returns False.
+        """
+        if self._game_state != "UNFINISHED":  # Check Game State
+            return False
+        if not self._check_move(from_row, from_col, to_row, to_col, self._board):
+            return False
+
+        self._board.set_square(to_row, to_col, self._current_player)  # Make move
+        self._board.set_square(from_row, from_col)  # Remove player at from square
+        self._check_for_captures(from_row, from_col, to_row, to_col)  # Check for and capture pieces
+        self._update_game_state()  # Update game state
+
+        if self._game_state == "UNFINISHED":   # Update turn
+            self._current_player = "RED" if self._current_player == "BLACK" else "BLACK"
+        return True
+
+    def _check_move(self, from_row, from_col, to_row, to_col, board):
+        """Check if move is valid."""
+        # Check if from square is not for current player.
+        if self._current_player[0] != board.get_square_state(from_row, from_col):
+            return False
+        # From square and to square are the same, or both row and column changed.
+        if (from_row == to_row and from_col == to_col) or (from_row != to_row and from_col != to_col):
+            return False
+        # Check each square is empty based on a move along row or column
+        from_val, to_val, row = (from_col, to_col, True) if from_row == to_row else (from_row, to_row, False)
+        move_direction = int((to_val - from_val) / abs(to_val - from_val))
+        for val in range(from_val + move_direction, to_val + move_direction, move_direction):
+            if board.get_square_state((from_row if row else val), (val if row else from_col)) != ".":
+                return False
+        return True
+
+    def _check_for_captures(self, from_row, from_col, to_row, to_col):
+        """Checks for captures, removes captured pieces, and updates count of captured pieces."""
+        captured_pieces = list()
+
+        if (to_row, to_col) in ((1, 0), (0, 1), (7, 0), (8, 1), (0, 7), (1, 8), (7, 8), (8, 7)):
+            corner_capture = self._check_corners(to_row, to_col)
+            if corner_capture is not None:
+                captured_pieces.append(corner_capture)
+
+        # Determine which direction piece moved, relative to black side of board.
+        direction = "RIGHT" if to_col>from_col else "UP" if to_row<from_row else "LEFT" if to_col<from_col else "DOWN"
+        non_corner_captures = self._check_non_corners(to_row, to_col, direction)  # Check non-corner captures
+        if non_corner_captures is not None and len(non_corner_captures) > 0:
+            captured_pieces.extend(non_corner_captures)
+
+        # If win condition is set to 10, all of opponent's pieces may be captured (set to 9 for all but one).
+        win_condition = 10
+        if self._captured_pieces[self._color_captured()] + len(captured_pieces) < win_condition:
+            self._remove_pieces(captured_pieces)
+            self._captured_pieces[self._color_captured()] += len(captured_pieces)
+
+    def _color_captured(self):
+        """Returns the player defending pieces."""
+        return "RED" if self._current_player == "BLACK" else "BLACK"
+
+    def _check_corners(self, to_row, to_col):
+        """Check corners for captures. To square must be in one of eight positions."""
+        defender = self._color_captured()
+
+        if (to_row, to_col) in ((1, 0), (0, 1)):
+            if self.get_square_occupant(1, 0) == self.get_square_occupant(0, 1) == self._current_player:
+                if self.get_square_occupant(0, 0) == defender:
+                    return (0, 0)
+        elif (to_row, to_col) in ((7, 0), (8, 1)):
+            if self.get_square_occupant(7, 0) == self.get_square_occupant(8, 1) == self._current_player:
+                if self.get_square_occupant(8, 0) == defender:
+                    return (8, 0)
+        elif (to_row, to_col) in ((0, 7), (1, 8)):
+            if self.get_square_occupant(0, 7) == self.get_square_occupant(1, 8) == self._current_player:
+                if self.get_square_occupant(0, 8) == defender:
+                    return (0, 8)
+        else:
+            if self.get_square_occupant(7, 8) == self.get_square_occupant(8, 7) == self._current_player:
+                if self.get_square_occupant(8, 8) == defender:
+                    return (8, 8)
+
+    def _check_non_corners(self, to_row, to_col, direction):
+        """Check for non-corner captures based on the direction of move. Checks in three directions from to_sqr."""
+        defender = self._color_captured()
+        captured_pieces = list()
+
+        if direction in ("UP", "LEFT", "RIGHT") and to_row > 0:  # Check up - along column
+            captured_pieces.extend(self._check_direction(defender, to_row-1, -1, -1, to_col, False))
+        if direction in ("UP", "LEFT", "DOWN") and to_col > 0:  # Check left - along row
+            captured_pieces.extend(self._check_direction(defender, to_col-1, -1, -1, to_row, True))
+        if direction in ("DOWN", "LEFT", "RIGHT") and to_row < 8:  # Check down - along column
+            captured_pieces.extend(self._check_direction(defender, to_row+1, 9, 1, to_col, False))
+        if direction in ("UP", "DOWN", "RIGHT") and to_col < 8:  # Check right - along row
+            captured_pieces.extend(self._check_direction(defender, to_col+1, 9, 1, to_row, True))
+        return captured_pieces
+
+    def _check_direction(self, defender, start, end, inc, to_val, row):
+        """Checks the direction for custodian captures and returns captures. Helper to _check_non_corners."""
+        valid_capture, pieces_in_play, captured_pieces = True, list(), list()
+        for val in range(start, end, inc):
+            square_value = self._board.get_square_state(to_val if row else val, val if row else to_val)
+            if square_value == '.':
+                valid_capture = False
+            if square_value == self._current_player[0] and valid_capture:
+                captured_pieces.extend(pieces_in_play)
+                valid_capture = False
+            if square_value == defender[0] and valid_capture:
+                pieces_in_play.append((to_val if row else val, val if row else to_val))
+        return captured_pieces
+
+    def _remove_pieces(self, captured_squares):
+        """Remove captured pieces from the board."""
+        for row, col in captured_squares:
+            self._board.set_square(row, col)
+
+    def _update_game_state(self):
+        """Updates the game state after each move."""
+        if self._captured_pieces["BLACK"] >= 8:
+            self._game_state = "RED_WON"
+        elif self._captured_pieces["RED"] >= 8:
+            self._game_state = "BLACK_WON"
+
+
+def _compare(game, reference, move, predicted, captured):
+    """Returns the differences between the game and the reference after a move, as a list of text."""
+    differences = list()
+    for row in range(9):
+        for col in range(9):
+            state = game.get_position().get_square_state(row, col)
+            if state != reference.get_square_state(row, col):
+                differences.append("square %d%d is %s, the original has %s" % (
+                    row, col, state, reference.get_square_state(row, col)))
+    if game.get_game_state() != reference.get_game_state():
+        differences.append("state %s, the original has %s" % (game.get_game_state(), reference.get_game_state()))
+    for color in ("BLACK", "RED"):
+        if game.get_num_captured_pieces(color) != reference.get_num_captured_pieces(color):
+            differences.append("%s captured %d, the original has %d" % (
+                color, game.get_num_captured_pieces(color), reference.get_num_captured_pieces(color)))
+    if predicted != captured:
+        differences.append("capture mask %x predicted before the move, %x captured" % (predicted, captured))
+    return ["move %d%d-%d%d: %s" % (move + (difference,)) for difference in differences]
+
+
+def play_random_games(num_games, seed, max_moves=300):
+    """
+    Plays random games with the game and the original implementation in lockstep, and checks the capture mask
+    predicted before each move. Returns the move lists, the number of capturing moves, and the differences found(a game
+    stops at its first).
+    """
+    rng = random.Random(seed)
+    games, num_captures, mismatches = list(), 0, list()
+    for _ in range(num_games):
+        game, reference = HasamiShogiGame(), OriginalGame()
+        while game.get_game_state() == "UNFINISHED" and len(game.get_move_history()) < max_moves:
+            move = rng.choice(game.legal_moves())
+            player, position = game.get_active_player(), game.get_position()
+            defender = "RED" if player == "BLACK" else "BLACK"
+            defenders = position.get_pieces(defender)
+            predicted = position.get_capture_mask(player, square_index(*move[:2]), square_index(*move[2:]))
+            game.make_move(*move)
+            if not reference.make_move(*move):
+                mismatches.append("move %d%d-%d%d: illegal in the original" % move)
+                break
+            differences = _compare(game, reference, move, predicted, defenders & ~position.get_pieces(defender))
+            if differences:
+                mismatches.extend(differences)
+                break
+            num_captures += bool(predicted)
+        games.append(game.get_move_history())
+    return games, num_captures, mismatches
+
+
+def moves_per_second(game_class, games, repeat=3):
+    """Returns the make_move calls per second replaying the games with the game class."""
+    start, num_moves = time.perf_counter(), 0
+    for _ in range(repeat):
+        for moves in games:
+            game = game_class()
+            for move in moves:
+                game.make_move(*move)
+            num_moves += len(moves)
+    return num_moves / (time.perf_counter() - start)
+
+
+def main():
+    """Runs the differential check and the benchmark, and prints the results. Exits with status 1 on a difference."""
+    num_games = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    seed = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    games, num_captures, mismatches = play_random_games(num_games, seed)
+    if mismatches:
+        print("\n".join(mismatches))
+        print("%d differences from the original implementation" % len(mismatches))
+        sys.exit(1)
+    print("%d games, %d moves, %d capturing moves: identical" % (len(games), sum(map(len, games)), num_captures))
+    original = moves_per_second(OriginalGame, games)
+    lookup = moves_per_second(HasamiShogiGame, games)
+    print("original  %8d moves/sec" % original)
+    print("lookup    %8d moves/sec    %.2fx" % (lookup, lookup / original))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Client for the game server in Server.py, used by Main.py to play a game over the network. The socket is read on a
+# background thread, so the pygame loop only polls for the opponent's moves.
+
+import json
+import queue
+import socket
+import sys
+import threading
+
+
+class GameClient:
+    """
+    Connection to a game server. After create() or join(), attach() a HasamiShogiGame: the moves made in it for the
+    client's colors are sent to the server, and the other colors are played by get_remote_player().
+    """
+    def __init__(self, host, port, timeout=10.0):
+        """Connects to the server, waiting at most timeout seconds for the connection and each reply."""
+        self._socket = socket.create_connection((host, port), timeout)
+        self._socket.settimeout(None)
+        self._timeout = timeout
+        self._send_lock = threading.Lock()
+        self._replies = queue.Queue()
+        self._remote_moves = queue.Queue()
+        self._next_id = 1
+        self._game_id = None
+        self._variant = None
+        self._colors = set()
+        self._moves = list()
+        self._connected = True
+        self._thread = threading.Thread(target=self._read_messages, daemon=True)
+        self._thread.start()
+
+    def get_game_id(self):
+        """Returns the id of the game on the server."""
+        return self._game_id
+
+    def get_variant(self):
+        """Returns the name of the variant the game on the server is played by."""
+        return self._variant
+
+    def get_colors(self):
+        """Returns the colors played by this client."""
+        return sorted(self._colors)
+
+    def is_connected(self):
+        """Returns True until the server closes the connection."""
+        return self._connected
+
+    def create(self, color="BLACK", variant="standard"):
+        """Creates a game of the variant on the server playing the color, BLACK, RED or BOTH. Returns the game id."""
+        reply = self._request(dict(op="create", color=color, variant=variant))
+        self._variant = reply["variant"]
+        self._game_id, self._colors, self._moves = reply["game"], set(reply["colors"]), list()
+        return self._game_id
+
+    def join(self, game_id):
+        """Joins a game on the server as the color nobody plays yet, or to watch if both are taken."""
+        reply = self._request(dict(op="join", game=game_id))
+        self._variant = reply["variant"]
+        self._game_id, self._colors, self._moves = reply["game"], set(reply["colors"]), reply["moves"]
+        return self._game_id
+
+    def attach(self, game):
+        """Replays the moves already made on the server in the game, then sends the moves made in it."""
+        for move in self._moves:
+            game.make_move(*move)
+        self._moves = list()
+        game.add_move_listener(self._on_move)
+
+    def rematch(self):
+        """Asks the server to restart the finished game."""
+        self._send(dict(op="rematch", game=self._game_id))
+
+    def get_remote_player(self):
+        """Returns a player making the moves of the colors played by the other client."""
+        return RemotePlayer(self)
+
+    def get_remote_move(self):
+        """Returns the next move received for the other client's colors as (move, ply), or None."""
+        try:
+            delta = self._remote_moves.get_nowait()
+        except queue.Empty:
+            return None
+        return tuple(delta["move"]), delta["ply"]
+
+    def close(self):
+        """Closes the connection."""
+        self._connected = False
+        self._socket.close()
+
+    def _on_move(self, game, move):
+        """Move listener, sends the moves of the client's colors to the server."""
+        if move is not None and game.get_square_occupant(move[2], move[3]) in self._colors:
+            self._send(dict(op="move", game=self._game_id, move=list(move)))
+
+    def _request(self, message):
+        """Sends a request and returns its reply, raises ValueError if the server refused it."""
+        message["id"] = self._next_id
+        self._next_id += 1
+        self._send(message)
+        try:
+            reply = self._replies.get(timeout=self._timeout)
+        except queue.Empty:
+            raise ConnectionError("No reply from the server")
+        if reply is None:
+            raise ConnectionError("Disconnected from the server")
+        if reply["op"] == "error":
+            raise ValueError(reply["error"])
+        return reply
+
+    def _send(self, message):
+        """Sends a message to the server."""
+        with self._send_lock:
+            self._socket.sendall(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+    def _read_messages(self):
+        """
+        Thread target, reads the server's messages: replies to requests and the moves of the other colors. The
+        connection counts as lost on a message which is not valid, so a request waiting for a reply is not left
+        waiting forever.
+        """
+        try:
+            for line in self._socket.makefile("rb"):
+                message = json.loads(line)
+                if "id" in message:
+                    self._replies.put(message)
+                elif message["op"] == "delta" and message["player"] not in self._colors:
+                    self._remote_moves.put(message)
+                elif message["op"] == "error":
+                    print("Server error: %s" % message["error"], file=sys.stderr)
+        except (ValueError, KeyError, TypeError) as error:
+            print("Bad message from the server: %r" % (error,), file=sys.stderr)
+        except OSError:
+            pass
+        finally:
+            self._connected = False
+            self._replies.put(None)
+
+
+class RemotePlayer:
+    """
+    Plays the colors of the other client in a network game: its moves are the ones the server sends. It has the same
+    methods as EnginePlayer, so Main.py polls it for a move the same way.
+    """
+    def __init__(self, client):
+        """Creates a player for the moves received by the client."""
+        self._client = client
+        self._waiting = False
+
+    def is_thinking(self):
+        """Returns True while waiting for the other client's move."""
+        return self._waiting
+
+    def start(self, game):
+        """Starts waiting for the other client's move in the game."""
+        self._waiting = True
+
+    def get_move(self):
+        """Returns (move, description) once the move has arrived, else None."""
+        received = self._client.get_remote_move()
+        if received is None:
+            return None
+        self._waiting = False
+        move, ply = received
+        return move, "move %d from the server" % ply
+
+    def stop(self):
+        """Stops waiting, a move which arrives later is still returned by the next get_move."""
+        self._waiting = False
+
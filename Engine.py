@@ -0,0 +1,266 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+import threading
+import time
+from Position import NUM_SQUARES
+from TranspositionTable import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND
+
+WIN_SCORE = 100000
+PIECE_VALUE = 100
+INFINITY = 1000000
+NODES_PER_TIME_CHECK = 256
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the time limit is reached or the search is stopped."""
+
+
+class SearchInfo:
+    """Statistics of a search: depth reached, nodes searched, time, score and principal variation."""
+    def __init__(self):
+        """Creates empty search statistics."""
+        self.depth = 0
+        self.nodes = 0
+        self.elapsed = 0.0
+        self.score = 0
+        self.pv = list()
+        self.tt_probes = 0
+        self.tt_hits = 0
+        self.lookup = None  # The LookupResult when the move came from the opening book or tablebase
+
+    def get_nps(self):
+        """Returns the nodes searched per second."""
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    def get_tt_hit_rate(self):
+        """Returns the fraction of transposition table probes in this search which found an entry."""
+        return self.tt_hits / self.tt_probes if self.tt_probes else 0.0
+
+    def __str__(self):
+        if self.lookup is not None:
+            return str(self.lookup)
+        pv = " ".join("%d%d-%d%d" % move for move in self.pv)
+        return "depth %d  score %d  nodes %d  nps %d  time %.2fs  tt hits %.1f%%  pv %s" % (
+            self.depth, self.score, self.nodes, self.get_nps(), self.elapsed, 100 * self.get_tt_hit_rate(), pv)
+
+
+class AlphaBetaEngine:
+    """
+    Computer opponent for Hasami Shogi. Searches with iterative deepening negamax alpha-beta under a time limit per
+    move. Moves are ordered principal variation first, then captures, killer moves and the history heuristic. Results
+    are kept in a transposition table between searches, and repeated positions score as a draw.
+    """
+    def __init__(self, time_limit=1.0, max_depth=32, hash_mb=16):
+        """Creates an engine that searches for at most time_limit seconds or max_depth moves."""
+        self._time_limit = time_limit
+        self._table = TranspositionTable(hash_mb)
+        self._max_depth = max_depth
+        self._deadline = 0.0
+        self._stop_event = None
+        self._info = SearchInfo()
+        self._killers = list()
+        self._history = [0] * (NUM_SQUARES * NUM_SQUARES)
+        self._size = 9
+        self._pv_moves = dict()
+
+    def search(self, game, stop_event=None):
+        """
+        Searches the game for the active player and returns (best move, SearchInfo). The game is not changed, the
+        search runs on a copy. Setting stop_event ends the search early with the last completed depth. A move known to
+        the game's opening book or tablebase is returned without searching.
+        """
+        root = game.copy()
+        self._stop_event = stop_event
+        self._info = SearchInfo()
+        known = root.lookup()
+        if known is not None and known.move is not None:
+            self._info.lookup, self._info.pv = known, [known.move]
+            if known.result is not None:
+                self._info.score = WIN_SCORE - known.plies if known.result == "WIN" else known.plies - WIN_SCORE
+            return known.move, self._info
+        self._killers = [[None, None] for _ in range(self._max_depth + 1)]
+        self._size = root.get_variant().board_size
+        self._history = [0] * (self._size ** 4)
+        self._pv_moves = dict()
+        table_probes, table_hits = self._table.get_probe_counts()
+        start = time.perf_counter()
+        self._deadline = start + self._time_limit
+
+        moves = root.legal_moves()
+        best_move = moves[0] if moves else None
+        for depth in range(1, self._max_depth + 1):
+            pv = list()
+            try:
+                score = self._negamax(root, depth, -INFINITY, INFINITY, 0, pv)
+            except _SearchTimeout:
+                break
+            self._info.depth, self._info.score, self._info.pv = depth, score, pv
+            self._pv_moves = dict(enumerate(pv))
+            if pv:
+                best_move = pv[0]
+            if abs(score) >= WIN_SCORE - self._max_depth or len(moves) <= 1:
+                break
+        self._info.elapsed = time.perf_counter() - start
+        probes, hits = self._table.get_probe_counts()
+        self._info.tt_probes, self._info.tt_hits = probes - table_probes, hits - table_hits
+        return best_move, self._info
+
+    def get_table(self):
+        """Returns the engine's transposition table."""
+        return self._table
+
+    def _negamax(self, game, depth, alpha, beta, ply, pv):
+        """Returns the score of the game for the active player, filling pv with the principal variation."""
+        self._info.nodes += 1
+        if self._info.nodes % NODES_PER_TIME_CHECK == 0:
+            if time.perf_counter() > self._deadline or (self._stop_event is not None and self._stop_event.is_set()):
+                raise _SearchTimeout()
+
+        if game.get_game_state() == "DRAW" or (ply > 0 and game.get_repetition_count() > 1):
+            return 0
+        if game.get_game_state() != "UNFINISHED":
+            return -WIN_SCORE + ply  # The last move won, so the player to move has lost.
+        if depth == 0:
+            return evaluate(game)
+
+        key, original_alpha = game.get_hash(), alpha
+        entry = self._table.probe(key)
+        tt_move = None
+        if entry is not None:
+            entry_depth, entry_score, entry_flag, tt_move = entry
+            entry_score = _score_from_table(entry_score, ply)
+            if ply > 0 and entry_depth >= depth:
+                if entry_flag == EXACT or (entry_flag == LOWER_BOUND and entry_score >= beta) or \
+                        (entry_flag == UPPER_BOUND and entry_score <= alpha):
+                    return entry_score
+        moves = game.legal_moves()
+        if not moves:
+            return 0
+
+        best_score, best_move = -INFINITY, None
+        child_pv = list()
+        for move in self._order_moves(game, moves, ply, tt_move):
+            game.make_move(*move)
+            child_pv.clear()
+            score = -self._negamax(game, depth - 1, -beta, -alpha, ply + 1, child_pv)
+            game.unmake_move()
+            if score > best_score:
+                best_score, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + child_pv
+                    if alpha >= beta:
+                        self._store_cutoff(game, move, depth, ply)
+                        break
+        flag = UPPER_BOUND if best_score <= original_alpha else LOWER_BOUND if best_score >= beta else EXACT
+        self._table.store(key, depth, _score_to_table(best_score, ply), flag, best_move)
+        return best_score
+
+    def _order_moves(self, game, moves, ply, tt_move=None):
+        """
+        Returns the moves sorted best first: transposition table move, principal variation, captures, killers, then
+        history score.
+        """
+        position, player = game.get_position(), game.get_active_player()
+        pv_move = self._pv_moves.get(ply)
+        killers = self._killers[ply] if ply < len(self._killers) else (None, None)
+        history, size = self._history, self._size
+
+        def move_key(move):
+            from_index, to_index = move[0] * size + move[1], move[2] * size + move[3]
+            if move == tt_move:
+                return -5 * INFINITY
+            if move == pv_move:
+                return -4 * INFINITY
+            if position.get_capture_mask(player, from_index, to_index):
+                return -2 * INFINITY
+            if move == killers[0] or move == killers[1]:
+                return -INFINITY
+            return -history[from_index * size * size + to_index]
+
+        return sorted(moves, key=move_key)
+
+    def _store_cutoff(self, game, move, depth, ply):
+        """Records a quiet move which caused a beta cutoff in the killer and history tables."""
+        size = self._size
+        from_index, to_index = move[0] * size + move[1], move[2] * size + move[3]
+        if game.get_position().get_capture_mask(game.get_active_player(), from_index, to_index):
+            return
+        self._history[from_index * size * size + to_index] += depth * depth
+        if ply < len(self._killers):
+            killers = self._killers[ply]
+            if killers[0] != move:
+                killers[0], killers[1] = move, killers[0]
+
+
+def _score_to_table(score, ply):
+    """Returns a win score as distance from the stored position rather than from the root."""
+    if abs(score) >= WIN_SCORE // 2:
+        return score + ply if score > 0 else score - ply
+    return score
+
+
+def _score_from_table(score, ply):
+    """Returns a stored win score as distance from the root again."""
+    if abs(score) >= WIN_SCORE // 2:
+        return score - ply if score > 0 else score + ply
+    return score
+
+
+def evaluate(game):
+    """Returns a static score of the game for the active player, based on the pieces each color has left."""
+    player = game.get_active_player()
+    opponent = "RED" if player == "BLACK" else "BLACK"
+    return PIECE_VALUE * (game.get_num_captured_pieces(opponent) - game.get_num_captured_pieces(player))
+
+
+class EnginePlayer:
+    """
+    Runs an AlphaBetaEngine on a background thread, so the pygame display keeps redrawing while the engine thinks.
+    Start a search with start(), then poll get_move() once per frame.
+    """
+    def __init__(self, engine=None):
+        """Creates a player for the engine, by default an AlphaBetaEngine with a one second time limit."""
+        self._engine = AlphaBetaEngine() if engine is None else engine
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._result = None
+
+    def is_thinking(self):
+        """Returns True while a search is running or its move has not been collected."""
+        return self._thread is not None
+
+    def start(self, game):
+        """Starts searching the game on a background thread."""
+        self.stop()
+        self._stop_event.clear()
+        self._result = None
+        self._thread = threading.Thread(target=self._run, args=(game.copy(),), daemon=True)
+        self._thread.start()
+
+    def _run(self, game):
+        """Thread target, stores the search result."""
+        self._result = self._engine.search(game, self._stop_event)
+
+    def get_move(self):
+        """Returns (best move, SearchInfo) once the search has finished, else None."""
+        if self._thread is None or self._thread.is_alive():
+            return None
+        self._thread = None
+        return self._result
+
+    def stop(self):
+        """Stops a running search and discards its result."""
+        if self._thread is not None:
+            self._stop_event.set()
+            self._thread.join()
+            self._thread = None
+        self._result = None
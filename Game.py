@@ -8,26 +8,291 @@
 #               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
 #               assumed to be all or all but one piece captured.
 
-from Board import Board
+import re
+import struct
+from Instrumentation import instrument, uninstrument
+from Position import Position, popcount, zobrist_hash
+from Variant import STANDARD, VARIANTS
+
+# Methods timed by set_metrics(), of the game, its position and its board.
+TIMED_GAME_METHODS = ("make_move", "unmake_move", "_check_move", "_check_for_captures", "legal_moves", "show_moves",
+                      "clear_moves")
+TIMED_POSITION_METHODS = ("get_move_mask", "get_capture_mask")
+TIMED_BOARD_METHODS = ("display_board", "display_dirty")
+
+# A snapshot is the header(format version, variant, turn and game state, pieces captured of each color, repetition
+# limit, number of moves), the bitboards of black and red, then the move history as move codes: the ordinal of the
+# moving piece among the mover's pieces times the number of other squares on its rank and file, plus the destination
+# among them. A code is one byte, or two when the variant has too many pieces for one. A game set up with
+# set_position() has the start flag set, and the moves are replayed from the start bitboards of black and red(with
+# the start player in the flags) stored after the position.
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<BBBBBBH")
+GAME_STATES = ("UNFINISHED", "BLACK_WON", "RED_WON", "DRAW")
+SNAPSHOT_START_FLAG = 8
+SNAPSHOT_START_RED_FLAG = 16
+MAX_REPETITION_LIMIT = 255  # The repetition limit is one byte of the snapshot header
+_VARIANT_NAMES = tuple(VARIANTS)
+
+# Position notation: the ranks from the top as shown on the Board('B', 'R' and '.' squares, a run of empty squares
+# may be written as its length), separated by '/', then the player to move('b' or 'r') and the variant if it is not
+# the first of its board size, e.g. "RRRRRRRRR/9/9/9/9/9/9/9/BBBBBBBBB b". Captures are the pieces missing.
+NOTATION_PLAYERS = dict(b="BLACK", r="RED")
 
 
 class HasamiShogiGame:
-    """The class represents a game of Hasami Shogi."""
-    def __init__(self):
-        """Creates a new game of Hasami Shogi."""
-        self._board = Board()
+    """
+    The class represents a game of Hasami Shogi. The rules run on a Position(one bitboard per color), so the game can
+    be played without pygame. The pygame Board is only created when requested for display. The Zobrist hash of the
+    position is updated incrementally with each move. The rules come from a Variant, by default the standard game.
+    """
+    def __init__(self, repetition_limit=None, variant=STANDARD):
+        """
+        Creates a new game of Hasami Shogi. If repetition_limit is set, the game is a draw once the same position
+        occurs that many times. Raises ValueError if repetition_limit is over MAX_REPETITION_LIMIT.
+        """
+        if repetition_limit and not 0 < repetition_limit <= MAX_REPETITION_LIMIT:
+            raise ValueError("The repetition limit must be from 1 to %d" % MAX_REPETITION_LIMIT)
+        self._variant = variant
+        self._tables = variant.get_tables()
+        self._size = variant.board_size
+        self._position = Position(*variant.get_start(), tables=self._tables)
+        self._board = None
+        self._current_player = "BLACK"
+        self._game_state = "UNFINISHED"
+        self._captured_pieces = dict(BLACK=0, RED=0)
+        self._repetition_limit = repetition_limit
+        self._hash = zobrist_hash(self._position, self._current_player)
+        self._start = None  # (black, red, player) the history starts from when set up by set_position()
+        # Undo stack of (player, from, to, captured bitboard, previous count, previous state, previous hash)
+        self._history = list()
+        self._move_listeners = list()
+        self._lookups = list()
+
+    @classmethod
+    def from_snapshot(cls, data):
+        """Returns a new game restored from a snapshot, see restore()."""
+        game = cls()
+        game.restore(data)
+        return game
+
+    def reset(self, variant=None):
+        """
+        Starts a new game in place, of the variant if given. The position object is kept, so the pygame board(and its
+        sprites) stay attached and only the squares which change are redrawn. Move listeners, lookups and metrics are
+        kept, and are not called. Raises ValueError for a variant of another board size once the board is created.
+        """
+        variant = self._variant if variant is None else variant
+        if variant.board_size != self._size:
+            if self._board is not None:
+                raise ValueError("The board is %dx%d, can't reset to a %dx%d variant" % (
+                    self._size, self._size, variant.board_size, variant.board_size))
+            self._tables, self._size = variant.get_tables(), variant.board_size
+            self._position = Position(*variant.get_start(), tables=self._tables)
+        else:
+            self._position.set_pieces(*variant.get_start())
+        self._variant = variant
         self._current_player = "BLACK"
         self._game_state = "UNFINISHED"
         self._captured_pieces = dict(BLACK=0, RED=0)
+        self._hash = zobrist_hash(self._position, self._current_player)
+        self._start = None
+        self._history = list()
+        self.clear_moves()
+
+    def set_position(self, black, red, player_color="BLACK"):
+        """
+        Sets up a position in place(see reset() for what is kept), with the player to move and no move history, the
+        moves made from it are replayed from it by snapshot() and restore(). The pieces missing from each color count
+        as captured, and the game state is a win if the captures or a line already decide the game. Raises ValueError
+        if the squares overlap or a color has too many pieces.
+        """
+        num_pieces = self._variant.num_pieces
+        if black & red or black >> self._size * self._size or red >> self._size * self._size:
+            raise ValueError("Pieces must be on distinct squares of the board")
+        if popcount(black) > num_pieces or popcount(red) > num_pieces:
+            raise ValueError("A color has more than %d pieces" % num_pieces)
+        self._position.set_pieces(black, red)
+        self._current_player = player_color
+        self._captured_pieces = dict(BLACK=num_pieces - popcount(black), RED=num_pieces - popcount(red))
+        self._game_state = "UNFINISHED"
+        win_captures = self._variant.win_captures
+        if win_captures and self._captured_pieces["BLACK"] >= win_captures:
+            self._game_state = "RED_WON"
+        elif win_captures and self._captured_pieces["RED"] >= win_captures:
+            self._game_state = "BLACK_WON"
+        elif self._variant.line_length:
+            # The player who moved last is checked first, their move would have ended the game.
+            for color in ("RED", "BLACK") if player_color == "BLACK" else ("BLACK", "RED"):
+                pieces = self._position.get_pieces(color)
+                if any(pieces & window == window for square_windows in self._variant.get_line_windows(color)
+                       for window in square_windows):
+                    self._game_state = color + "_WON"
+                    break
+        self._hash = zobrist_hash(self._position, self._current_player)
+        self._start = (black, red, player_color)
+        self._history = list()
+        self.clear_moves()
+
+    @classmethod
+    def from_notation(cls, text):
+        """Returns a new game set up from a position in notation, see parse_notation()."""
+        variant, black, red, player_color = parse_notation(text)
+        game = cls(variant=variant)
+        game.set_position(black, red, player_color)
+        return game
+
+    def get_notation(self):
+        """Returns the position and player to move in notation, see parse_notation()."""
+        ranks = list()
+        for row in range(self._size):
+            rank, empty = "", 0
+            for col in range(self._size):
+                state = self._position.get_square_state(row, col)
+                if state == ".":
+                    empty += 1
+                    continue
+                rank += (str(empty) if empty else "") + state
+                empty = 0
+            ranks.append(rank + (str(empty) if empty else ""))
+        notation = "/".join(ranks) + " " + self._current_player[0].lower()
+        if self._variant is not _default_variant(self._size):
+            notation += " " + self._variant.name
+        return notation
+
+    def snapshot(self):
+        """
+        Returns the game as compact bytes: the variant, turn, game state, captures, repetition limit, position and move
+        history, about 30 bytes plus a byte per move(and the start position for a game set up with set_position()).
+        restore() takes it back.
+        """
+        size, squares = self._size, self._size * self._size
+        code_bytes = _move_code_bytes(self._variant)
+        moves = bytearray()
+        start = self.get_start()
+        replay = Position(start[0], start[1], tables=self._tables)
+        for player, from_index, to_index, captured_mask, *_ in self._history:
+            code = _encode_move(replay.get_pieces(player), from_index, to_index, size)
+            moves += code.to_bytes(code_bytes, "little")
+            replay.move_piece(player, 1 << from_index, 1 << to_index)
+            if captured_mask:
+                replay.remove_pieces("RED" if player == "BLACK" else "BLACK", captured_mask)
+        flags = (self._current_player == "RED") | GAME_STATES.index(self._game_state) << 1
+        board_bytes = (squares + 7) // 8
+        start_bytes = b""
+        if self._start is not None:
+            flags |= SNAPSHOT_START_FLAG | (SNAPSHOT_START_RED_FLAG if start[2] == "RED" else 0)
+            start_bytes = start[0].to_bytes(board_bytes, "little") + start[1].to_bytes(board_bytes, "little")
+        header = SNAPSHOT_HEADER.pack(SNAPSHOT_VERSION, _VARIANT_NAMES.index(self._variant.name), flags,
+                                      self._captured_pieces["BLACK"], self._captured_pieces["RED"],
+                                      self._repetition_limit or 0, len(self._history))
+        return (header + self._position.get_pieces("BLACK").to_bytes(board_bytes, "little") +
+                self._position.get_pieces("RED").to_bytes(board_bytes, "little") + start_bytes + bytes(moves))
+
+    def restore(self, data):
+        """
+        Restores the game in place from a snapshot(see reset() for what is kept), by replaying its moves so they can be
+        taken back. Raises ValueError if the data is not a valid snapshot.
+        """
+        if len(data) < SNAPSHOT_HEADER.size:
+            raise ValueError("Snapshot too short")
+        version, variant_id, flags, black_captured, red_captured, repetition_limit, num_moves = \
+            SNAPSHOT_HEADER.unpack_from(data)
+        if version != SNAPSHOT_VERSION or variant_id >= len(_VARIANT_NAMES) or flags >> 5:
+            raise ValueError("Unsupported snapshot")
+        variant = VARIANTS[_VARIANT_NAMES[variant_id]]
+        size, code_bytes = variant.board_size, _move_code_bytes(variant)
+        board_bytes = (size * size + 7) // 8
+        bitboards = 4 if flags & SNAPSHOT_START_FLAG else 2
+        moves_start = SNAPSHOT_HEADER.size + bitboards * board_bytes
+        if len(data) != moves_start + code_bytes * num_moves:
+            raise ValueError("Snapshot length does not match its number of moves")
+        black, red, *start = [int.from_bytes(data[offset:offset + board_bytes], "little")
+                              for offset in range(SNAPSHOT_HEADER.size, moves_start, board_bytes)]
+
+        self.reset(variant)
+        if start:
+            self.set_position(*start, "RED" if flags & SNAPSHOT_START_RED_FLAG else "BLACK")
+        self._repetition_limit = repetition_limit or None
+        listeners, self._move_listeners = self._move_listeners, list()  # Replayed moves are not new moves
+        try:
+            for offset in range(moves_start, len(data), code_bytes):
+                code = int.from_bytes(data[offset:offset + code_bytes], "little")
+                move = _decode_move(self._position.get_pieces(self._current_player), code, size)
+                if move is None or not self.make_move(*move):
+                    raise ValueError("Snapshot has an illegal move")
+        finally:
+            self._move_listeners = listeners
+        if (self._position.get_pieces("BLACK") != black or self._position.get_pieces("RED") != red or
+                self._captured_pieces != dict(BLACK=black_captured, RED=red_captured) or
+                self._current_player != ("RED" if flags & 1 else "BLACK") or
+                self._game_state != GAME_STATES[flags >> 1 & 3]):
+            raise ValueError("Snapshot moves do not lead to its position")
 
     def get_board(self):
-        """Returns the game board."""
+        """Returns the game board, a pygame view of the position which is created on first use."""
+        if self._board is None:
+            from Board import Board
+            self._board = Board(self._position)
         return self._board
 
+    def get_position(self):
+        """Returns the position(bitboards) the game is played on."""
+        return self._position
+
+    def get_variant(self):
+        """Returns the Variant whose rules the game is played by."""
+        return self._variant
+
+    def copy(self):
+        """Returns an independent copy of the game, without a pygame board."""
+        game = HasamiShogiGame.__new__(HasamiShogiGame)
+        game._variant, game._tables, game._size = self._variant, self._tables, self._size
+        game._position = self._position.copy()
+        game._board = None
+        game._current_player = self._current_player
+        game._game_state = self._game_state
+        game._captured_pieces = dict(self._captured_pieces)
+        game._repetition_limit = self._repetition_limit
+        game._hash = self._hash
+        game._start = self._start
+        game._history = list(self._history)
+        game._move_listeners = list()
+        game._lookups = self._lookups
+        return game
+
+    def get_start(self):
+        """
+        Returns the (black, red, player to move) the move history starts from: the variant's start, or the position
+        set up by set_position().
+        """
+        return self._start or self._variant.get_start() + ("BLACK",)
+
+    def get_repetition_limit(self):
+        """Returns the number of repetitions of a position which draw the game, or None if repetitions are allowed."""
+        return self._repetition_limit
+
     def get_game_state(self):
-        """Returns the state of the game, unfinished, red won, or black won."""
+        """Returns the state of the game, unfinished, red won, black won, or draw(only with a repetition limit)."""
         return self._game_state
 
+    def get_hash(self):
+        """Returns the Zobrist hash of the current position and player to move."""
+        return self._hash
+
+    def get_repetition_count(self):
+        """
+        Returns how many times the current position has occurred in the game. Only positions since the last capture
+        are compared, a capture can't be undone by moving.
+        """
+        count = 1
+        for record in reversed(self._history):
+            if record[6] == self._hash:
+                count += 1
+            if record[3]:
+                break
+        return count
+
     def get_active_player(self):
         """Returns whose turn it is, red or black."""
         return self._current_player
@@ -39,31 +304,164 @@ class HasamiShogiGame:
 
     def get_square_occupant(self, row, col):
         """Returns whether the specified square is occupied by a red piece, black piece, or neither."""
-        square_occupant = self._board.get_square_state(row, col)
         if self._check_sqr_valid(row, col):
-            return "BLACK" if square_occupant == 'B' else "RED" if square_occupant == 'R' else "NONE"
+            return self._position.get_square_occupant(row, col)
+
+    def add_move_listener(self, listener):
+        """
+        Registers a function called as listener(game, move) after each move made, with the move as (from_row,
+        from_col, to_row, to_col), and as listener(game, None) after a move is taken back.
+        """
+        self._move_listeners.append(listener)
+
+    def remove_move_listener(self, listener):
+        """Unregisters a move listener."""
+        self._move_listeners.remove(listener)
+
+    def set_lookups(self, lookups):
+        """
+        Sets the opening book and endgame tablebase(OpeningBook, Tablebase, or anything with a probe(game) method)
+        consulted by lookup(), in order. Copies of the game share them.
+        """
+        self._lookups = list(lookups)
+
+    def set_metrics(self, metrics=None):
+        """
+        Times the calls to the rules methods of the game and its position, and the drawing methods of its board(if
+        created), in histograms of the Metrics(Instrumentation.py) named after the methods. None stops timing them.
+        Without metrics the methods run untimed, at no cost. Copies of the game are not timed.
+        """
+        targets = [(self, TIMED_GAME_METHODS), (self._position, TIMED_POSITION_METHODS)]
+        if self._board is not None:
+            targets.append((self._board, TIMED_BOARD_METHODS))
+        for target, names in targets:
+            uninstrument(target, names)
+            if metrics is not None:
+                instrument(target, names, metrics)
+
+    def lookup(self):
+        """
+        Returns the LookupResult of the current position from the first lookup which knows it: the known best move
+        and/or the result for the active player. Returns None if no lookup knows the position. Each probe is O(1).
+        """
+        for source in self._lookups:
+            result = source.probe(self)
+            if result is not None:
+                return result
+        return None
 
     def make_move(self, from_row, from_col, to_row, to_col):
         """
         The function makes a move(if valid), removes any captured pieces, and updates the game state and turn. Returns
-        True if valid, else returns False.
+        True if valid, else returns False. The move is pushed on the undo stack so it can be taken back.
         """
         if self._game_state != "UNFINISHED":  # Check Game State
             return False
         if not self._check_sqrs_valid(from_row, from_col, to_row, to_col):
             return False
-        if not self._check_move(from_row, from_col, to_row, to_col, self._board):
+        if not self._check_move(from_row, from_col, to_row, to_col, self._position):
             return False
 
-        self._board.set_square(to_row, to_col, self._current_player)  # Make move
-        self._board.set_square(from_row, from_col)  # Remove player at from square
-        self._check_for_captures(from_row, from_col, to_row, to_col)  # Check for and capture pieces
-        self._update_game_state()  # Update game state
+        player, defender = self._current_player, self._color_captured()
+        previous_captured, previous_state, previous_hash = self._captured_pieces[defender], self._game_state, self._hash
+        from_index, to_index = from_row * self._size + from_col, to_row * self._size + to_col
+        self._position.move_piece(player, 1 << from_index, 1 << to_index)  # Make move
+        keys = self._tables.zobrist_keys[player]
+        self._hash ^= keys[from_index] ^ keys[to_index]
+        captured_mask = self._check_for_captures(from_index, to_index)  # Check for and capture pieces
+        self._update_game_state(to_index)  # Update game state
+        self._history.append((player, from_index, to_index, captured_mask, previous_captured, previous_state,
+                              previous_hash))
 
         if self._game_state == "UNFINISHED":   # Update turn
             self._current_player = "RED" if self._current_player == "BLACK" else "BLACK"
+            self._hash ^= self._tables.zobrist_red_to_move
+            if self._repetition_limit and self.get_repetition_count() >= self._repetition_limit:
+                self._game_state = "DRAW"
+        if self._move_listeners:
+            for listener in self._move_listeners:
+                listener(self, (from_row, from_col, to_row, to_col))
         return True
 
+    def unmake_move(self):
+        """
+        Takes back the last move made, restoring captured pieces, counters, game state and turn. Returns True if a move
+        was taken back, else returns False.
+        """
+        if not self._history:
+            return False
+        player, from_index, to_index, captured_mask, previous_captured, previous_state, previous_hash = \
+            self._history.pop()
+        defender = "RED" if player == "BLACK" else "BLACK"
+        self._position.move_piece(player, 1 << to_index, 1 << from_index)
+        if captured_mask:
+            self._position.add_pieces(defender, captured_mask)
+        self._captured_pieces[defender] = previous_captured
+        self._game_state = previous_state
+        self._current_player = player
+        self._hash = previous_hash
+        if self._move_listeners:
+            for listener in self._move_listeners:
+                listener(self, None)
+        return True
+
+    def playout(self, rng, max_plies=200, capture_tries=0):
+        """
+        Plays random moves until the game is over or max_plies moves were made, and returns the game state. For Monte
+        Carlo playouts: each move is a random piece of the player's(the next one along if it is blocked) moved to a
+        random square of its move mask, without building move lists, and only the rules are applied(captures and game
+        state), the moves are not recorded for unmake_move(), repetitions or the move listeners. Use it on a copy of
+        the game. With capture_tries, up to that many more moves are drawn while the move drawn captures nothing, so
+        captures are played more often.
+        """
+        position, random = self._position, rng.random
+        get_move_mask = self._get_move_mask if self._variant.jumps else position.get_move_mask
+        squares = dict()  # Color -> squares of its pieces, kept up to date through the moves and captures
+        for color in ("BLACK", "RED"):
+            pieces, squares[color] = position.get_pieces(color), list()
+            while pieces:
+                low_bit = pieces & -pieces
+                squares[color].append(low_bit.bit_length() - 1)
+                pieces ^= low_bit
+        plies = 0
+        while self._game_state == "UNFINISHED" and plies < max_plies:
+            player = self._current_player
+            player_squares, move = squares[player], None
+            num_pieces = len(player_squares)
+            for _ in range(capture_tries + 1):
+                first = int(random() * num_pieces)
+                for offset in range(num_pieces):
+                    from_index = player_squares[(first + offset) % num_pieces]
+                    to_mask = get_move_mask(from_index)
+                    if to_mask:
+                        break
+                else:
+                    break  # No piece can move
+                for _ in range(int(random() * popcount(to_mask))):
+                    to_mask &= to_mask - 1
+                move = (from_index, (to_mask & -to_mask).bit_length() - 1)
+                if position.get_capture_mask(player, *move):
+                    break
+            if move is None:
+                break
+            from_index, to_index = move
+            position.move_piece(player, 1 << from_index, 1 << to_index)
+            player_squares[player_squares.index(from_index)] = to_index
+            captured_mask = self._check_for_captures(from_index, to_index)
+            if captured_mask:
+                defender_squares = squares[self._color_captured()]
+                defender_squares[:] = [index for index in defender_squares if not captured_mask >> index & 1]
+            self._update_game_state(to_index)
+            if self._game_state == "UNFINISHED":
+                self._current_player = "RED" if player == "BLACK" else "BLACK"
+            plies += 1
+        return self._game_state
+
+    def get_move_history(self):
+        """Returns the moves made so far as (from_row, from_col, to_row, to_col) tuples."""
+        squares = self._tables.squares
+        return [squares[from_index] + squares[to_index] for _, from_index, to_index, *_ in self._history]
+
     def _check_sqr_valid(self, row=None, col=None):
         """Return True if the specified Square is valid."""
         if row is None or col is None:
@@ -76,136 +474,203 @@ class HasamiShogiGame:
             return False
         return True
 
-    def _check_move(self, from_row, from_col, to_row, to_col, board):
+    def _check_move(self, from_row, from_col, to_row, to_col, position):
         """Check if move is valid."""
+        # Both squares must be on the board, the square index would wrap to another rank or go negative.
+        size = self._size
+        if not (0 <= from_row < size and 0 <= from_col < size and 0 <= to_row < size and 0 <= to_col < size):
+            return False
         # Check if from square is not for current player.
-        if self._current_player[0] != board.get_square_state(from_row, from_col):
+        if self._current_player[0] != position.get_square_state(from_row, from_col):
             return False
-        # From square and to square are the same, or both row and column changed.
-        if (from_row == to_row and from_col == to_col) or (from_row != to_row and from_col != to_col):
+        # To square must be reachable along the row or column with every square on the way empty(or by a jump).
+        if not (1 << (to_row * self._size + to_col)) & self._get_move_mask(from_row * self._size + from_col):
             return False
-        # Check each square is empty based on a move along row or column
-        from_val, to_val, row = (from_col, to_col, True) if from_row == to_row else (from_row, to_row, False)
-        move_direction = int((to_val - from_val) / abs(to_val - from_val))
-        for val in range(from_val + move_direction, to_val + move_direction, move_direction):
-            if board.get_square_state((from_row if row else val), (val if row else from_col)) != ".":
-                return False
         return True
 
-    def _check_for_captures(self, from_row, from_col, to_row, to_col):
-        """Checks for captures, removes captured pieces, and updates count of captured pieces."""
-        captured_pieces = list()
-
-        if (to_row, to_col) in ((1, 0), (0, 1), (7, 0), (8, 1), (0, 7), (1, 8), (7, 8), (8, 7)):
-            corner_capture = self._check_corners(to_row, to_col)
-            if corner_capture is not None:
-                captured_pieces.append(corner_capture)
+    def _get_move_mask(self, index):
+        """Returns the bitboard of the squares the piece on the square can move to, slides plus jumps if allowed."""
+        if self._variant.jumps:
+            return self._position.get_move_mask(index) | self._position.get_jump_mask(index)
+        return self._position.get_move_mask(index)
 
-        # Determine which direction piece moved, relative to black side of board.
-        direction = "RIGHT" if to_col>from_col else "UP" if to_row<from_row else "LEFT" if to_col<from_col else "DOWN"
-        non_corner_captures = self._check_non_corners(to_row, to_col, direction)  # Check non-corner captures
-        if non_corner_captures is not None and len(non_corner_captures) > 0:
-            captured_pieces.extend(non_corner_captures)
+    def _check_for_captures(self, from_index, to_index):
+        """
+        Checks for captures, removes captured pieces, and updates count of captured pieces. Returns the bitboard of
+        the captured pieces(0 if none). The captures come from the position's rank and file masks and corner table.
+        """
+        captured_mask = self._position.get_capture_mask(self._current_player, from_index, to_index)
+        if not captured_mask:
+            return 0
 
-        # If win condition is set to 10, all of opponent's pieces may be captured (set to 9 for all but one).
-        win_condition = 10
-        if self._captured_pieces[self._color_captured()] + len(captured_pieces) < win_condition:
-            self._remove_pieces(captured_pieces)
-            self._captured_pieces[self._color_captured()] += len(captured_pieces)
+        # All of the opponent's pieces may be captured, the variant decides how many captures win.
+        num_captured = popcount(captured_mask)
+        if self._captured_pieces[self._color_captured()] + num_captured <= self._variant.num_pieces:
+            self._remove_pieces(captured_mask)
+            self._captured_pieces[self._color_captured()] += num_captured
+            return captured_mask
+        return 0
 
     def _color_captured(self):
         """Returns the player defending pieces."""
         return "RED" if self._current_player == "BLACK" else "BLACK"
 
-    def _check_corners(self, to_row, to_col):
-        """Check corners for captures. To square must be in one of eight positions."""
+    def _remove_pieces(self, captured_mask):
+        """Remove captured pieces from the board, and their keys from the hash."""
         defender = self._color_captured()
+        self._position.remove_pieces(defender, captured_mask)
+        keys = self._tables.zobrist_keys[defender]
+        while captured_mask:
+            low_bit = captured_mask & -captured_mask
+            self._hash ^= keys[low_bit.bit_length() - 1]
+            captured_mask ^= low_bit
 
-        if (to_row, to_col) in ((1, 0), (0, 1)):
-            if self.get_square_occupant(1, 0) == self.get_square_occupant(0, 1) == self._current_player:
-                if self.get_square_occupant(0, 0) == defender:
-                    return (0, 0)
-        elif (to_row, to_col) in ((7, 0), (8, 1)):
-            if self.get_square_occupant(7, 0) == self.get_square_occupant(8, 1) == self._current_player:
-                if self.get_square_occupant(8, 0) == defender:
-                    return (8, 0)
-        elif (to_row, to_col) in ((0, 7), (1, 8)):
-            if self.get_square_occupant(0, 7) == self.get_square_occupant(1, 8) == self._current_player:
-                if self.get_square_occupant(0, 8) == defender:
-                    return (0, 8)
-        else:
-            if self.get_square_occupant(7, 8) == self.get_square_occupant(8, 7) == self._current_player:
-                if self.get_square_occupant(8, 8) == defender:
-                    return (8, 8)
-
-    def _check_non_corners(self, to_row, to_col, direction):
-        """Check for non-corner captures based on the direction of move. Checks in three directions from to_sqr."""
-        defender = self._color_captured()
-        captured_pieces = list()
-
-        if direction in ("UP", "LEFT", "RIGHT") and to_row > 0:  # Check up - along column
-            captured_pieces.extend(self._check_direction(defender, to_row-1, -1, -1, to_col, False))
-        if direction in ("UP", "LEFT", "DOWN") and to_col > 0:  # Check left - along row
-            captured_pieces.extend(self._check_direction(defender, to_col-1, -1, -1, to_row, True))
-        if direction in ("DOWN", "LEFT", "RIGHT") and to_row < 8:  # Check down - along column
-            captured_pieces.extend(self._check_direction(defender, to_row+1, 9, 1, to_col, False))
-        if direction in ("UP", "DOWN", "RIGHT") and to_col < 8:  # Check right - along row
-            captured_pieces.extend(self._check_direction(defender, to_col+1, 9, 1, to_row, True))
-        return captured_pieces
-
-    def _check_direction(self, defender, start, end, inc, to_val, row):
-        """Checks the direction for custodian captures and returns captures. Helper to _check_non_corners."""
-        valid_capture, pieces_in_play, captured_pieces = True, list(), list()
-        for val in range(start, end, inc):
-            square_value = self._board.get_square_state(to_val if row else val, val if row else to_val)
-            if square_value == '.':
-                valid_capture = False
-            if square_value == self._current_player[0] and valid_capture:
-                captured_pieces.extend(pieces_in_play)
-                valid_capture = False
-            if square_value == defender[0] and valid_capture:
-                pieces_in_play.append((to_val if row else val, val if row else to_val))
-        return captured_pieces
-
-    def _remove_pieces(self, captured_squares):
-        """Remove captured pieces from the board."""
-        for row, col in captured_squares:
-            self._board.set_square(row, col)
-
-    def _update_game_state(self):
-        """Updates the game state after each move."""
-        if self._captured_pieces["BLACK"] >= 8:
+    def _update_game_state(self, to_index):
+        """
+        Updates the game state after each move: a win by captures, or with a line_length variant, by the piece moved
+        to the to square completing a line.
+        """
+        win_captures = self._variant.win_captures
+        if win_captures and self._captured_pieces["BLACK"] >= win_captures:
             self._game_state = "RED_WON"
-        elif self._captured_pieces["RED"] >= 8:
+        elif win_captures and self._captured_pieces["RED"] >= win_captures:
             self._game_state = "BLACK_WON"
+        elif self._variant.line_length:
+            pieces = self._position.get_pieces(self._current_player)
+            for window in self._variant.get_line_windows(self._current_player)[to_index]:
+                if pieces & window == window:
+                    self._game_state = self._current_player + "_WON"
+                    break
+
+    def legal_moves(self):
+        """
+        Returns all legal moves for the active player as (from_row, from_col, to_row, to_col) tuples. Does not change
+        the game or the board.
+        """
+        moves = list()
+        if self._game_state != "UNFINISHED":
+            return moves
+        squares = self._tables.squares
+        get_move_mask = self._get_move_mask if self._variant.jumps else self._position.get_move_mask
+        pieces = self._position.get_pieces(self._current_player)
+        while pieces:
+            from_bit = pieces & -pieces
+            from_index = from_bit.bit_length() - 1
+            from_row, from_col = squares[from_index]
+            to_mask = get_move_mask(from_index)
+            while to_mask:
+                to_bit = to_mask & -to_mask
+                to_row, to_col = squares[to_bit.bit_length() - 1]
+                moves.append((from_row, from_col, to_row, to_col))
+                to_mask ^= to_bit
+            pieces ^= from_bit
+        return moves
+
+    def legal_moves_from(self, row, col):
+        """Returns the legal moves for the active player's piece on the specified square, empty if there is none."""
+        if self._game_state != "UNFINISHED" or self._position.get_square_occupant(row, col) != self._current_player:
+            return list()
+        moves = list()
+        to_mask = self._get_move_mask(row * self._size + col)
+        while to_mask:
+            to_bit = to_mask & -to_mask
+            to_row, to_col = self._tables.squares[to_bit.bit_length() - 1]
+            moves.append((row, col, to_row, to_col))
+            to_mask ^= to_bit
+        return moves
 
     def show_moves(self, from_row, from_col):
         """For the selected square, show the possible moves."""
-        # Check each direction for possible moves
-        set_green = list()
-        if from_row > 0:  # Check up - along column
-            set_green.extend(self._check_possible(from_row - 1, -1, -1, from_col, False))
-        if from_col > 0:  # Check left - along row
-            set_green.extend(self._check_possible(from_col - 1, -1, -1, from_row, True))
-        if from_row < 8:  # Check down - along column
-            set_green.extend(self._check_possible(from_row + 1, 9, 1, from_col, False))
-        if from_col < 8:  # Check right - along row
-            set_green.extend(self._check_possible(from_col + 1, 9, 1, from_row, True))
-        if len(set_green) > 0:
-            for (row, col) in set_green:
-                self._board.set_square(row, col, "GREEN")
-
-    def _check_possible(self, start, end, inc, from_val, row):
-        """Check direction for possible moves."""
-        valid_move, valid_squares = True, list()
-        for val in range(start, end, inc):
-            sqr_val = self._board.get_square_state(from_val if row else val, val if row else from_val)
-            if sqr_val != ".":
-                valid_move = False
-            if sqr_val == "." and valid_move:
-                valid_squares.append((from_val if row else val, val if row else from_val))
-        return valid_squares
+        to_mask = self._get_move_mask(from_row * self._size + from_col)
+        if to_mask:
+            board = self.get_board()
+            board.sync()
+            while to_mask:
+                to_bit = to_mask & -to_mask
+                row, col = self._tables.squares[to_bit.bit_length() - 1]
+                board.set_square(row, col, "GREEN")
+                to_mask ^= to_bit
 
     def clear_moves(self):
         """Clear the possible moves displayed from the board."""
-        self._board.clear_green()
+        if self._board is not None:
+            self._board.clear_green()
+
+
+def parse_notation(text):
+    """
+    Returns (variant, black, red, player to move) of a position in notation: the ranks from the top separated by '/',
+    each square 'B', 'R' or '.', or a number for a run of empty squares, then 'b' or 'r' for the player to move(black
+    if left out) and optionally the variant name(by default the first variant of the board size). Raises ValueError
+    if the text is not a valid position.
+    """
+    fields = text.split()
+    if not fields or len(fields) > 3:
+        raise ValueError("Expected ranks, player to move and variant, got %r" % text)
+    ranks = fields[0].split("/")
+    size = len(ranks)
+    if len(fields) > 2:
+        variant = VARIANTS.get(fields[2])
+        if variant is None:
+            raise ValueError("Unknown variant %r, choose from %s" % (fields[2], ", ".join(VARIANTS)))
+    else:
+        variant = _default_variant(size)
+    if variant is None or variant.board_size != size:
+        raise ValueError("%d ranks is not the board size of a variant" % size)
+    player_color = NOTATION_PLAYERS.get(fields[1].lower() if len(fields) > 1 else "b")
+    if player_color is None:
+        raise ValueError("The player to move must be 'b' or 'r', got %r" % fields[1])
+    black = red = 0
+    for row, rank in enumerate(ranks):
+        col = 0
+        for run, state in re.findall(r"(\d+)|(.)", rank):
+            if run:
+                col += int(run)
+                continue
+            if state not in "BR.":
+                raise ValueError("Unknown square %r in rank %d" % (state, row + 1))
+            if col < size and state != ".":
+                if state == "B":
+                    black |= 1 << (row * size + col)
+                else:
+                    red |= 1 << (row * size + col)
+            col += 1
+        if col != size:
+            raise ValueError("Rank %d has %d squares, expected %d" % (row + 1, col, size))
+    return variant, black, red, player_color
+
+
+def _default_variant(board_size):
+    """Returns the first preset variant with the board size, the variant of a position in notation which names none."""
+    return next((variant for variant in VARIANTS.values() if variant.board_size == board_size), None)
+
+
+def _move_code_bytes(variant):
+    """Returns the bytes per move code in the snapshots of games of the variant."""
+    return 1 if variant.num_pieces * 2 * (variant.board_size - 1) <= 256 else 2
+
+
+def _encode_move(mover_pieces, from_index, to_index, size):
+    """Returns the snapshot code of a move, given the bitboard of the mover's pieces before the move."""
+    ordinal = popcount(mover_pieces & ((1 << from_index) - 1))
+    from_row, from_col = divmod(from_index, size)
+    to_row, to_col = divmod(to_index, size)
+    if to_col == from_col:
+        target = to_row - (to_row > from_row)
+    else:
+        target = size - 1 + to_col - (to_col > from_col)
+    return ordinal * 2 * (size - 1) + target
+
+
+def _decode_move(mover_pieces, code, size):
+    """Returns the move (from_row, from_col, to_row, to_col) of a snapshot code, or None if there is no such piece."""
+    ordinal, target = divmod(code, 2 * (size - 1))
+    for _ in range(ordinal):
+        mover_pieces &= mover_pieces - 1
+    if not mover_pieces:
+        return None
+    from_row, from_col = divmod((mover_pieces & -mover_pieces).bit_length() - 1, size)
+    if target < size - 1:
+        return from_row, from_col, target + (target >= from_row), from_col
+    target -= size - 1
+    return from_row, from_col, from_row, target + (target >= from_col)
@@ -0,0 +1,245 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Opt-in instrumentation: counters, gauges and latency histograms, exported as JSON or Prometheus text. Functions are
+# timed by replacing them on an object or module with a timing wrapper(instrument()), and uninstrument() puts the
+# originals back, so code which is not instrumented runs exactly as before with no checks on the hot path. FrameTimer
+# splits each frame of the pygame loop into phases. Usage: python Main.py --metrics metrics.json(or metrics.prom,
+# F2 writes the file during the game) --profile main.pstats
+
+import atexit
+import bisect
+import cProfile
+import json
+import time
+import types
+
+# Histogram bucket upper bounds in seconds, 1 microsecond to 1 second.
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2,
+                   5e-2, 0.1, 0.25, 0.5, 1.0)
+PROMETHEUS_PREFIX = "hasami_"
+
+
+class Histogram:
+    """Counts of observed durations by bucket, with their number, sum and maximum."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Creates an empty histogram with the bucket upper bounds(the last bucket has no bound)."""
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        """Adds a duration to the histogram."""
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def get_quantile(self, fraction):
+        """Returns the upper bound of the bucket holding the fraction quantile, the maximum for the last bucket."""
+        if not self.count:
+            return 0.0
+        rank, total = fraction * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        """Returns the histogram as a dictionary for JSON, with the count, sum, mean, max, p50 and p99 in seconds."""
+        return dict(count=self.count, sum=self.sum, mean=self.sum / self.count if self.count else 0.0, max=self.max,
+                    p50=self.get_quantile(0.5), p99=self.get_quantile(0.99),
+                    buckets=dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], self.counts)))
+
+
+class Metrics:
+    """A set of named counters, gauges and histograms."""
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        """Creates empty metrics, the histograms use the bucket upper bounds in seconds."""
+        self._buckets = buckets
+        self._counters = dict()
+        self._gauges = dict()
+        self._histograms = dict()
+
+    def count(self, name, amount=1):
+        """Adds amount to the counter."""
+        self._counters[name] = self._counters.get(name, 0) + amount
+
+    def set_gauge(self, name, value):
+        """Sets the gauge to value."""
+        self._gauges[name] = value
+
+    def observe(self, name, seconds):
+        """Adds a duration to the histogram."""
+        self.get_histogram(name).observe(seconds)
+
+    def get_counter(self, name):
+        """Returns the value of the counter, 0 if never counted."""
+        return self._counters.get(name, 0)
+
+    def get_gauge(self, name):
+        """Returns the value of the gauge, or None if never set."""
+        return self._gauges.get(name)
+
+    def get_histogram(self, name):
+        """Returns the histogram, created empty on first use."""
+        histogram = self._histograms.get(name)
+        if histogram is None:
+            histogram = self._histograms[name] = Histogram(self._buckets)
+        return histogram
+
+    def timed(self, name, function):
+        """
+        Returns a wrapper of the function which adds the duration of each call to the histogram name. The function is
+        the wrapper's __wrapped__.
+        """
+        histogram, perf_counter = self.get_histogram(name), time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                histogram.observe(perf_counter() - start)
+        wrapper.__wrapped__ = function
+        wrapper.__name__ = getattr(function, "__name__", name)
+        return wrapper
+
+    def reset(self):
+        """Clears every counter, gauge and histogram."""
+        self._counters.clear()
+        self._gauges.clear()
+        for histogram in self._histograms.values():
+            histogram.__init__(histogram.buckets)
+
+    def to_dict(self):
+        """Returns the metrics as a dictionary of counters, gauges and histograms."""
+        return dict(counters=dict(self._counters), gauges=dict(self._gauges),
+                    histograms=dict((name, histogram.to_dict()) for name, histogram in self._histograms.items()))
+
+    def to_json(self, indent=2):
+        """Returns the metrics as JSON text."""
+        return json.dumps(self.to_dict(), indent=indent, sort_keys=True)
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """
+        Returns the metrics in the Prometheus text exposition format: counters as name_total, histograms as
+        name_seconds with cumulative buckets.
+        """
+        lines = list()
+        for name, value in sorted(self._counters.items()):
+            lines += ["# TYPE %s%s_total counter" % (prefix, name), "%s%s_total %s" % (prefix, name, value)]
+        for name, value in sorted(self._gauges.items()):
+            lines += ["# TYPE %s%s gauge" % (prefix, name), "%s%s %s" % (prefix, name, value)]
+        for name, histogram in sorted(self._histograms.items()):
+            metric = "%s%s_seconds" % (prefix, name)
+            lines.append("# TYPE %s histogram" % metric)
+            total = 0
+            for bound, count in zip([repr(bound) for bound in histogram.buckets] + ["+Inf"], histogram.counts):
+                total += count
+                lines.append('%s_bucket{le="%s"} %d' % (metric, bound, total))
+            lines += ["%s_sum %r" % (metric, histogram.sum), "%s_count %d" % (metric, histogram.count)]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path):
+        """Writes the metrics to a file, Prometheus text if the path ends with .prom, else JSON."""
+        with open(path, "w") as metrics_file:
+            metrics_file.write(self.to_prometheus() if path.endswith(".prom") else self.to_json() + "\n")
+
+
+def instrument(target, names, metrics, prefix=""):
+    """
+    Replaces the named functions of a module, or methods of an object, with wrappers timing each call in the
+    histogram prefix + name(without leading underscores). Calls made through the module or object, including its own
+    calls to itself, are timed.
+    """
+    for name in names:
+        function = getattr(target, name)
+        setattr(target, name, metrics.timed(prefix + name.lstrip("_"), getattr(function, "__wrapped__", function)))
+
+
+def uninstrument(target, names):
+    """Puts back the functions or methods instrument() replaced."""
+    for name in names:
+        function = getattr(target, name)
+        if hasattr(function, "__wrapped__"):
+            if isinstance(target, types.ModuleType):
+                setattr(target, name, function.__wrapped__)
+            else:
+                delattr(target, name)  # The class's method shows through again
+
+
+class FrameTimer:
+    """
+    Splits each frame of a loop into phases: start() begins a frame, mark(phase) ends the phase running since the last
+    mark, end() ends the frame. Each phase is a histogram frame_<phase> and the whole frame is frame. Time spent in
+    the rules histograms during the frame(wherever it happened, e.g. a human's move while handling input) is added
+    to frame_rules. A frame longer than spike_seconds counts as a frame spike, and the phases of the slowest frame are
+    kept as the frame_worst_<phase> gauges.
+    """
+    def __init__(self, metrics, rules=(), spike_seconds=0.05):
+        """Creates a frame timer recording into metrics, rules are the names of the histograms timing the rules."""
+        self._metrics = metrics
+        self._rules = [metrics.get_histogram(name) for name in rules]
+        self._spike_seconds = spike_seconds
+        self._worst = 0.0
+        self._phases = dict()
+        self._start = self._last = 0.0
+        self._rules_start = 0.0
+
+    def start(self):
+        """Starts a frame."""
+        self._start = self._last = time.perf_counter()
+        self._rules_start = sum(histogram.sum for histogram in self._rules)
+        self._phases = dict()
+
+    def mark(self, phase):
+        """Ends the phase running since the frame started or the last mark."""
+        now = time.perf_counter()
+        self._phases[phase] = self._phases.get(phase, 0.0) + now - self._last
+        self._last = now
+
+    def end(self):
+        """Ends the frame, recording its phases."""
+        total = time.perf_counter() - self._start
+        if self._rules:
+            self._phases["rules"] = sum(histogram.sum for histogram in self._rules) - self._rules_start
+        metrics = self._metrics
+        metrics.observe("frame", total)
+        for phase, seconds in self._phases.items():
+            metrics.observe("frame_" + phase, seconds)
+        if total > self._spike_seconds:
+            metrics.count("frame_spikes")
+        if total > self._worst:
+            self._worst = total
+            metrics.set_gauge("frame_worst_seconds", total)
+            for phase, seconds in self._phases.items():
+                metrics.set_gauge("frame_worst_%s_seconds" % phase, seconds)
+
+
+def profile_to_file(path):
+    """
+    Starts profiling the calling thread with cProfile and returns the profiler. The stats are written to the path as
+    a pstats dump when the program exits, e.g. for python -m pstats path.
+    """
+    profiler = cProfile.Profile()
+    atexit.register(_write_profile, profiler, path)
+    profiler.enable()
+    return profiler
+
+
+def _write_profile(profiler, path):
+    """Exit handler, stops the profiler and writes its stats."""
+    profiler.disable()
+    profiler.dump_stats(path)
@@ -0,0 +1,111 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Load test for the game server. Simulates many clients, each playing random moves for both colors of its own game,
+# and reports the move round-trip latency(request sent to delta received) and moves per second.
+# Usage: python LoadTest.py --clients 500 --moves 40            (starts a server in this process)
+#        python LoadTest.py --clients 500 --connect 127.0.0.1:8765
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from Game import HasamiShogiGame
+from Server import GameServer
+
+
+async def _request(reader, writer, message):
+    """Sends a request and returns its reply, skipping other messages such as resets."""
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+    await writer.drain()
+    while True:
+        reply = json.loads(await reader.readline())
+        if reply.get("id") == message["id"]:
+            if reply["op"] == "error":
+                raise ValueError(reply["error"])
+            return reply
+
+
+async def run_client(host, port, num_moves, seed, latencies):
+    """Plays num_moves random moves over one connection, appending each move's round trip in seconds to latencies."""
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        game_id = (await _request(reader, writer, dict(op="create", color="BOTH", id=0)))["game"]
+        game = HasamiShogiGame(repetition_limit=3)
+        for request_id in range(1, num_moves + 1):
+            moves = game.legal_moves() if game.get_game_state() == "UNFINISHED" else None
+            if not moves:
+                await _request(reader, writer, dict(op="leave", game=game_id, id=-request_id))
+                game_id = (await _request(reader, writer, dict(op="create", color="BOTH", id=0)))["game"]
+                game = HasamiShogiGame(repetition_limit=3)
+                moves = game.legal_moves()
+            move = rng.choice(moves)
+            start = time.perf_counter()
+            await _request(reader, writer, dict(op="move", game=game_id, move=list(move), id=request_id))
+            latencies.append(time.perf_counter() - start)
+            game.make_move(*move)
+    finally:
+        writer.close()
+
+
+def percentile(sorted_values, fraction):
+    """Returns the value at the fraction(0 to 1) of the sorted values, nearest rank."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+async def run_load_test(num_clients, num_moves, host=None, port=None, seed=0):
+    """
+    Runs num_clients clients at once, each making num_moves moves, against the server at host:port, or a server
+    started in this process if host is None. Returns a report dictionary.
+    """
+    server = None
+    if host is None:
+        server = GameServer(max_sessions=2 * num_clients)
+        host, port = "127.0.0.1", await server.start("127.0.0.1", 0)
+    latencies = list()
+    start = time.perf_counter()
+    results = await asyncio.gather(*(run_client(host, port, num_moves, seed + client, latencies)
+                                     for client in range(num_clients)), return_exceptions=True)
+    elapsed = time.perf_counter() - start
+    errors = [repr(result) for result in results if isinstance(result, BaseException)]
+    if server is not None:
+        await server.stop()
+    latencies.sort()
+    return dict(clients=num_clients, moves=len(latencies), seconds=round(elapsed, 3),
+                moves_per_sec=round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+                p50_ms=round(1000 * percentile(latencies, 0.5), 3), p99_ms=round(1000 * percentile(latencies, 0.99), 3),
+                max_ms=round(1000 * latencies[-1], 3) if latencies else 0.0, errors=len(errors),
+                first_error=errors[0] if errors else None)
+
+
+def main(argv=None):
+    """Runs the load test from the command line and prints the report."""
+    parser = argparse.ArgumentParser(description="Load test for the Hasami Shogi game server.")
+    parser.add_argument("--clients", type=int, default=100, help="clients connected at once")
+    parser.add_argument("--moves", type=int, default=40, help="moves made by each client")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="server to test, else one is started in this process")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random moves")
+    args = parser.parse_args(argv)
+    host = port = None
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        host, port = host or "127.0.0.1", int(port)
+    report = asyncio.run(run_load_test(args.clients, args.moves, host, port, args.seed))
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
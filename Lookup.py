@@ -0,0 +1,114 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# On-disk index shared by the opening book(OpeningBook.py) and the endgame tablebase(Tablebase.py): a hash table of
+# 64 bit keys and 32 bit values with open addressing, read through a memory map so a probe touches only a slot or two
+# of the file. An index file is a header followed by the key array and the value array, in native byte order:
+#   magic(4 bytes), version, board size, rule byte, extra byte, number of entries, number of slots.
+# The rule and extra bytes are for the kind of index, e.g. the tablebase stores the pieces left when a game is lost
+# and the most pieces in its endgames.
+
+import mmap
+import struct
+from array import array
+
+VERSION = 1
+INDEX_HEADER = struct.Struct("<4sBBBBQQ")
+EMPTY_KEY = 0
+_MIX = 0x9E3779B97F4A7C15  # Spreads structured keys(packed squares) over the slots
+_MASK64 = (1 << 64) - 1
+
+
+def _first_slot(key, num_slots):
+    """Returns the slot where the search for a key starts."""
+    return ((key * _MIX) & _MASK64) % num_slots
+
+
+def write_index(path, magic, board_size, rule, entries, extra=0, load_factor=0.5):
+    """
+    Writes a dictionary of keys(non-zero 64 bit ints) to values(32 bit ints) as an index file. The table has about
+    1 / load_factor slots per entry, so a probe rarely looks past its first slot.
+    """
+    num_slots = max(8, int(len(entries) / load_factor) + 1)
+    keys, values = array("Q", bytes(8 * num_slots)), array("I", bytes(4 * num_slots))
+    for key, value in entries.items():
+        slot = _first_slot(key, num_slots)
+        while keys[slot] != EMPTY_KEY:
+            slot = slot + 1 if slot + 1 < num_slots else 0
+        keys[slot], values[slot] = key, value
+    with open(path, "wb") as index_file:
+        index_file.write(INDEX_HEADER.pack(magic, VERSION, board_size, rule, extra, len(entries), num_slots))
+        keys.tofile(index_file)
+        values.tofile(index_file)
+
+
+class MappedIndex:
+    """An index file opened read-only through a memory map. get() is O(1): a hash and a short linear probe."""
+    def __init__(self, path, magic):
+        """Opens the index file, raises ValueError if it is not an index of the expected kind."""
+        with open(path, "rb") as index_file:
+            self._map = mmap.mmap(index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < INDEX_HEADER.size:
+            raise ValueError("Not a Hasami Shogi index file: %s" % path)
+        file_magic, version, self.board_size, self.rule, self.extra, self._num_entries, self._num_slots = \
+            INDEX_HEADER.unpack_from(self._map)
+        if file_magic != magic or version != VERSION:
+            raise ValueError("Not a Hasami Shogi %s index, or unsupported version: %s" % (magic.decode(), path))
+        if len(self._map) != INDEX_HEADER.size + 12 * self._num_slots:
+            raise ValueError("Truncated index file: %s" % path)
+        view = memoryview(self._map)
+        keys_end = INDEX_HEADER.size + 8 * self._num_slots
+        self._keys = view[INDEX_HEADER.size:keys_end].cast("Q")
+        self._values = view[keys_end:].cast("I")
+
+    def get_num_entries(self):
+        """Returns the number of keys in the index."""
+        return self._num_entries
+
+    def get(self, key):
+        """Returns the value stored for the key, or None."""
+        keys, num_slots = self._keys, self._num_slots
+        slot = _first_slot(key, num_slots)
+        while True:
+            slot_key = keys[slot]
+            if slot_key == key:
+                return self._values[slot]
+            if slot_key == EMPTY_KEY:
+                return None
+            slot = slot + 1 if slot + 1 < num_slots else 0
+
+    def close(self):
+        """Releases the memory map."""
+        self._keys.release()
+        self._values.release()
+        self._map.close()
+
+
+class LookupResult:
+    """
+    A position found in the opening book or tablebase: the move to play(None if only the result is known), the
+    result for the player to move(WIN, LOSS or DRAW, None for a book move) and the plies until the game ends.
+    """
+    def __init__(self, source, move, result=None, plies=0, games=0, score=0.0):
+        """Creates a lookup result, games and score are the book statistics of the move."""
+        self.source = source
+        self.move = move
+        self.result = result
+        self.plies = plies
+        self.games = games
+        self.score = score
+
+    def __str__(self):
+        move = "%d%d-%d%d" % self.move if self.move is not None else "no move"
+        if self.result is None:
+            return "%s %s  %d games  %.0f%%" % (self.source, move, self.games, 100 * self.score)
+        if self.result == "DRAW":
+            return "%s %s  draw" % (self.source, move)
+        return "%s %s  %s in %d" % (self.source, move, self.result.lower(), self.plies)
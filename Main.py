@@ -8,135 +8,335 @@
 #               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
 #               assumed to be all or all but one piece captured.
 
-import pygame, sys
+import pygame, sys, argparse, atexit, functools, time
 from pygame.locals import *
 from Game import HasamiShogiGame
+from Variant import STANDARD, VARIANTS, get_variant
+from Engine import AlphaBetaEngine, EnginePlayer
+from MonteCarlo import MCTSEngine
+from Client import GameClient
+from OpeningBook import OpeningBook
+from Tablebase import Tablebase
+from Assets import get_image, preload
+from Instrumentation import FrameTimer, Metrics, instrument, profile_to_file
+from Sprites import SQUARE_WIDTH, SQUARE_HEIGHT, BORDER, GAP_SIZE
 
 WINDOW_WIDTH = 770
 WINDOW_HEIGHT = 930
-SQUARE_WIDTH = 72
-SQUARE_HEIGHT = 90
 BOARD_SIZE = 9
-BORDER = 50
-GAP_SIZE = 2
 BLACK_COLOR = (0, 0, 0)
 GREEN_COLOR = (0, 255, 0)
-BACKGROUND_IMAGE = pygame.image.load('images/Background.png')
+DEFAULT_FPS = 30
+IDLE_TIMEOUT = 1000  # Milliseconds to wait for input before redrawing an idle window
+BACKGROUND_IMAGE = 'Background.png'
+# Squares clicked in a recorded game, from and to square of each move in turn(the test code replays it).
+TEST_MOVE_LIST = [(8, 0), (1, 0), (0, 8), (2, 8), (1, 0), (1, 7), (2, 8), (2, 7), (8, 8), (1, 8), (0, 0), (8, 0),
+                  (1, 8), (1, 6), (2, 7), (1, 7), (8, 5), (1, 5), (1, 7), (2, 7), (8, 7), (3, 7), (0, 1), (0, 0),
+                  (1, 6), (1, 7), (0, 0), (6, 0), (1, 5), (2, 5), (0, 2), (0, 0), (1, 7), (1, 8), (0, 0), (5, 0),
+                  (1, 8), (0, 8), (0, 3), (0, 0), (8, 4), (8, 5), (0, 0), (4, 0), (8, 2), (7, 2), (0, 6), (2, 6),
+                  (3, 7), (2, 7), (0, 4), (2, 4), (2, 7), (2, 6), (0, 7), (2, 7), (8, 6), (2, 6), (2, 4), (2, 5),
+                  (8, 5), (7, 5), (0, 5), (1, 5), (0, 8), (0, 5), (2, 5), (2, 3), (7, 2), (2, 2), (2, 7), (2, 4),
+                  (8, 3), (3, 3), (4, 0), (4, 1), (3, 3), (3, 0), (4, 1), (4, 0), (7, 5), (7, 0), (2, 4), (2, 5),
+                  (8, 1), (8, 5), (2, 5), (2, 4), (8, 5), (2, 5)]
 
 
-def main():
-    """Hasami Shogi implemented in Pygame."""
+def main(players=None, render_mode="dirty", fps=DEFAULT_FPS, show_stats=False, preload_images=True, client=None,
+         variant=STANDARD, lookups=(), metrics=None, metrics_path=None):
+    """
+    Hasami Shogi implemented in Pygame. Players maps each color to an EnginePlayer for a computer opponent, or None
+    for a human clicking squares. Both colors are human by default. To play over the network, client is a GameClient
+    with a game on the server, and the colors of the other client are played by a RemotePlayer. Moves can't be taken
+    back in a network game.
+
+    The "dirty" render mode redraws only the squares, highlight and text which changed each frame, "full" redraws the
+    whole window. On a human's turn the window redraws when there is input, on the computer's turn at most fps times
+    per second. show_stats displays the frame rate and CPU use and prints the time until the first frame of each game.
+    Images are loaded once up front with preload_images, else on first use. The game is played by the rules of the
+    variant, whose board must fit the window(at most BOARD_SIZE squares a side). The computer players play the moves
+    of the lookups(opening book, tablebase) without searching. Playing again resets the game in place, reusing the
+    window, board and sprites.
+
+    With metrics(Instrumentation.Metrics), the rules and drawing calls are timed and each frame is split into input,
+    engine and draw phases, plus the rules time within the frame. F2 writes the metrics to metrics_path.
+    """
+    start = time.perf_counter()
+    players = dict(BLACK=None, RED=None) if players is None else players
     pygame.init()
     game_display = pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
     pygame.display.set_caption('Hasami Shogi')
+    if preload_images:
+        preload()
+    clock = pygame.time.Clock()
+    frame_stats = FrameStats(clock) if show_stats else None
 
-    game_display.blit(BACKGROUND_IMAGE, BACKGROUND_IMAGE.get_rect())
-    game = HasamiShogiGame()
+    game_display.blit(get_image(BACKGROUND_IMAGE), (0, 0))
+    game = HasamiShogiGame(variant=variant)
+    game.set_lookups(lookups)
+    if client is not None:
+        client.attach(game)
     game_board = game.get_board()
+    renderer = DirtyRenderer(game_display, game_board) if render_mode == "dirty" else None
+    frame_timer = None
+    if metrics is not None:
+        game.set_metrics(metrics)
+        instrument(sys.modules[__name__], ("game_info", "stats_info"), metrics)
+        frame_timer = FrameTimer(metrics, rules=("make_move", "unmake_move", "show_moves", "clear_moves"))
 
-    select_count = 0
-    from_row, from_col, to_row, to_col = None, None, None, None
     mouse_x, mouse_y = 0, 0
 
     ### Test ###
     test_code = False
     test_case = 0
     if test_code:
-        move_list = [(8, 0), (1, 0), (0, 8), (2, 8), (1, 0), (1, 7), (2, 8), (2, 7), (8, 8), (1, 8), (0, 0), (8, 0), (1, 8), (1, 6), (2, 7), (1, 7), (8, 5), (1, 5), (1, 7), (2, 7), (8, 7), (3, 7), (0, 1), (0, 0), (1, 6), (1, 7), (0, 0), (6, 0), (1, 5), (2, 5), (0, 2), (0, 0), (1, 7), (1, 8), (0, 0), (5, 0), (1, 8), (0, 8), (0, 3), (0, 0), (8, 4), (8, 5), (0, 0), (4, 0), (8, 2), (7, 2), (0, 6), (2, 6), (3, 7), (2, 7), (0, 4), (2, 4), (2, 7), (2, 6), (0, 7), (2, 7), (8, 6), (2, 6), (2, 4), (2, 5), (8, 5), (7, 5), (0, 5), (1, 5), (0, 8), (0, 5), (2, 5), (2, 3), (7, 2), (2, 2), (2, 7), (2, 4), (8, 3), (3, 3), (4, 0), (4, 1), (3, 3), (3, 0), (4, 1), (4, 0), (7, 5), (7, 0), (2, 4), (2, 5), (8, 1), (8, 5), (2, 5), (2, 4), (8, 5), (2, 5)]
+        move_list = TEST_MOVE_LIST
 
         for index in range(0, 80, 2):
-            game.make_move(move_list[index][0], move_list[index][1], move_list[index + 1][0], move_list[index + 1][1])
+            game.make_move(*move_list[index], *move_list[index + 1])
         if test_case == 1:
             for index in range(80, 88, 2):
-                game.make_move(move_list[index][0], move_list[index][1], move_list[index + 1][0], move_list[index + 1][1])
+                game.make_move(*move_list[index], *move_list[index + 1])
     ######
 
-    while True:
-        if game.get_game_state() != "UNFINISHED":
-            break
-        for event in pygame.event.get():
-            if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
-                pygame.quit()
-                sys.exit()
-            if event.type == MOUSEMOTION:
-                mouse_x, mouse_y = event.pos
-            if event.type == MOUSEBUTTONUP:
-                mouse_x, mouse_y = event.pos
-                # Second Square selected - To Square
-                if select_count == 1:
-                    to_row, to_col = game_board.get_square(mouse_x, mouse_y)
-                    # Clear possible moves
+    while True:  # A game per pass, playing again resets the game and its board in place
+        select_count = 0
+        from_row, from_col, to_row, to_col = None, None, None, None
+        row, column = None, None
+        while True:
+            if game.get_game_state() != "UNFINISHED":
+                break
+            # While a human is to move, block until there is input so an idle window uses no CPU. While the computer is
+            # to move, poll at the frame rate to collect its move.
+            computer_turn = players[game.get_active_player()] is not None
+            if computer_turn:
+                events = pygame.event.get()
+            else:
+                events = [pygame.event.wait(IDLE_TIMEOUT)] + pygame.event.get()
+            if frame_timer is not None:  # The frame is timed from here, waiting for input is idle time
+                frame_timer.start()
+            for event in events:
+                if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
+                    pygame.quit()
+                    sys.exit()
+                if event.type == KEYUP and event.key == K_F2 and metrics is not None and metrics_path is not None:
+                    metrics.write(metrics_path)
+                if event.type == KEYUP and event.key == K_BACKSPACE and client is None:  # Take back to a human's turn
+                    for engine_player in players.values():
+                        if engine_player is not None:
+                            engine_player.stop()
                     game.clear_moves()
-                    # Check move is valid and make move
-                    game.make_move(from_row, from_col, to_row, to_col)
-                    select_count, from_row, from_col, to_row, to_col = None, None, None, None, None
-                # First square selected - From Square
-                if select_count == 0:
-                    from_row, from_col = game_board.get_square(mouse_x, mouse_y)
-                    if from_row is not None and from_col is not None:
-                        if game.get_active_player()[0] == game_board.get_square_state(from_row, from_col):
-                            select_count = 1
-                            # Show possible moves
-                            game.show_moves(from_row, from_col)
-                # No selection
-                if select_count is None:
-                    select_count = 0
-        row, column = game_board.get_square(mouse_x, mouse_y)
-
-        game_display.blit(BACKGROUND_IMAGE, BACKGROUND_IMAGE.get_rect())
-        fill_border(game_display)
-        if row is not None and column is not None:
-            highlight_square(game_display, row, column)
+                    while game.unmake_move() and players[game.get_active_player()] is not None:
+                        pass
+                    select_count, from_row, from_col = 0, None, None
+                if event.type == MOUSEMOTION:
+                    mouse_x, mouse_y = event.pos
+                    row, column = game_board.get_square(mouse_x, mouse_y)
+                if event.type == MOUSEBUTTONUP and players[game.get_active_player()] is None:
+                    mouse_x, mouse_y = event.pos
+                    # Second Square selected - To Square
+                    if select_count == 1:
+                        to_row, to_col = game_board.get_square(mouse_x, mouse_y)
+                        # Clear possible moves
+                        game.clear_moves()
+                        # Check move is valid and make move
+                        game.make_move(from_row, from_col, to_row, to_col)
+                        select_count, from_row, from_col, to_row, to_col = None, None, None, None, None
+                    # First square selected - From Square
+                    if select_count == 0:
+                        from_row, from_col = game_board.get_square(mouse_x, mouse_y)
+                        if from_row is not None and from_col is not None:
+                            if game.get_active_player() == game.get_square_occupant(from_row, from_col):
+                                select_count = 1
+                                # Show possible moves
+                                game.show_moves(from_row, from_col)
+                    # No selection
+                    if select_count is None:
+                        select_count = 0
+
+            if frame_timer is not None:
+                frame_timer.mark("input")
+            # Computer or remote player's turn - the move arrives on a background thread while the board keeps
+            # redrawing.
+            engine_player = players[game.get_active_player()]
+            if engine_player is not None and game.get_game_state() == "UNFINISHED":
+                if not engine_player.is_thinking():
+                    engine_player.start(game)
+                else:
+                    result = engine_player.get_move()
+                    if result is not None:
+                        move, search_info = result
+                        print("%s: %s" % (game.get_active_player().capitalize(), search_info))
+                        if move is not None:
+                            game.make_move(*move)
+            if frame_timer is not None:
+                frame_timer.mark("engine")
+            stats_text = frame_stats.get_text() if frame_stats is not None else None
+
+            if renderer is not None:
+                pygame.display.update(renderer.render(game, row, column, stats_text))
+            else:
+                game_display.blit(get_image(BACKGROUND_IMAGE), (0, 0))
+                fill_border(game_display, game_board.get_size())
+                if row is not None and column is not None:
+                    highlight_square(game_display, row, column)
+                game_info(game_display, game)
+                game_board.display_board(game_display)
+                if stats_text is not None:
+                    stats_info(game_display, stats_text)
+                pygame.display.update()
+            if frame_timer is not None:
+                frame_timer.mark("draw")
+                frame_timer.end()
+            if start is not None:
+                if show_stats:
+                    print("Game ready in %.1f ms" % (1000 * (time.perf_counter() - start)))
+                start = None
+            clock.tick(fps if computer_turn else 0)
+
+        if game.get_game_state() == "BLACK_WON":
+            text = "Black Won. Would you like to play again?"
+        elif game.get_game_state() == "DRAW":
+            text = "Draw. Would you like to play again?"
+        else:
+            text = "Red Won. Would you like to play again?"
+        text_box = render_text(text, GREEN_COLOR, BLACK_COLOR)
+        text_rect = text_box.get_rect()
+        text_rect.center = (int(WINDOW_WIDTH / 2), int(WINDOW_HEIGHT / 2))
+
+        text_box_yes = render_text("Yes", GREEN_COLOR, BLACK_COLOR)
+        text_rect_yes = text_box_yes.get_rect()
+        text_rect_yes.center = (int(WINDOW_WIDTH / 2) - 60, int(WINDOW_HEIGHT / 2) + 90)
+
+        text_box_no = render_text("No", GREEN_COLOR, BLACK_COLOR)
+        text_rect_no = text_box_no.get_rect()
+        text_rect_no.center = (int(WINDOW_WIDTH / 2) + 60, int(WINDOW_HEIGHT / 2) + 90)
+
+        # Game Display once finished, drawn once since nothing changes until the player answers.
+        game_display.blit(get_image(BACKGROUND_IMAGE), (0, 0))
+        fill_border(game_display, game_board.get_size())
         game_info(game_display, game)
         game_board.display_board(game_display)
+        game_display.blit(text_box, text_rect)
+        game_display.blit(text_box_yes, text_rect_yes)
+        game_display.blit(text_box_no, text_rect_no)
         pygame.display.update()
-
-    if game.get_game_state() == "BLACK_WON":
-        text = "Black Won. Would you like to play again?"
-    else:
-        text = "Red Won. Would you like to play again?"
-    font = pygame.font.SysFont("Calibri", 20, bold=True)
-    text_box = font.render(text, True, GREEN_COLOR, BLACK_COLOR)
-    text_rect = text_box.get_rect()
-    text_rect.center = (int(WINDOW_WIDTH / 2), int(WINDOW_HEIGHT / 2))
-    game_display.blit(text_box, text_rect)
-
-    text_box_yes = font.render("Yes", True, GREEN_COLOR, BLACK_COLOR)
-    text_rect_yes = text_box_yes.get_rect()
-    text_rect_yes.center = (int(WINDOW_WIDTH / 2) - 60, int(WINDOW_HEIGHT / 2) + 90)
-
-    text_box_no = font.render("No", True, GREEN_COLOR, BLACK_COLOR)
-    text_rect_no = text_box_no.get_rect()
-    text_rect_no.center = (int(WINDOW_WIDTH / 2) + 60, int(WINDOW_HEIGHT / 2) + 90)
-
-    # Game Display once finished.
-    while True:
-        for event in pygame.event.get():
+        while True:
+            event = pygame.event.wait()
             if event.type == QUIT or (event.type == KEYUP and event.key == K_ESCAPE):
                 pygame.quit()
                 sys.exit()
             if event.type == MOUSEBUTTONUP:
                 mouse_x, mouse_y = event.pos
                 if text_rect_yes.collidepoint(mouse_x, mouse_y):
-                    main()
+                    if client is not None:
+                        client.rematch()
+                    start = time.perf_counter()
+                    game.reset()
+                    if renderer is not None:
+                        renderer.invalidate()
+                    break
                 elif text_rect_no.collidepoint(mouse_x, mouse_y):
                     pygame.quit()
                     sys.exit()
 
-        game_display.blit(BACKGROUND_IMAGE, BACKGROUND_IMAGE.get_rect())
-        fill_border(game_display)
-        game_info(game_display, game)
-        game_board.display_board(game_display)
-        game_display.blit(text_box, text_rect)
-        game_display.blit(text_box_yes, text_rect_yes)
-        game_display.blit(text_box_no, text_rect_no)
-        pygame.display.update()
+
+class DirtyRenderer:
+    """
+    Draws the game redrawing only what changed since the last frame: the squares whose sprites changed state, the
+    highlighted square, the score line and the stats overlay. render() returns the rects to pass to
+    pygame.display.update().
+    """
+    def __init__(self, game_display, game_board):
+        """Creates a renderer for the board on the display, the first frame is drawn in full."""
+        self._display = game_display
+        self._board = game_board
+        self._background = pygame.Surface(game_display.get_size())
+        self._background.blit(get_image(BACKGROUND_IMAGE), (0, 0))
+        fill_border(self._background, game_board.get_size())
+        self._square = (None, None)
+        self._info = None
+        self._info_rect = None
+        self._stats = None
+        self._stats_rect = None
+        self._full = True
+
+    def invalidate(self):
+        """Redraws the whole window on the next frame, e.g. after something else drew over it."""
+        self._full = True
+
+    def render(self, game, row, column, stats_text=None):
+        """Draws the frame with the square at row, column highlighted and returns the list of updated rects."""
+        rects = list()
+        if self._full:
+            self._display.blit(self._background, (0, 0))
+            self._info_rect = self._stats_rect = None
+            if row is not None and column is not None:
+                highlight_square(self._display, row, column)
+        elif (row, column) != self._square:
+            for square in (self._square, (row, column)):
+                if square[0] is not None and square[1] is not None:
+                    rects.append(self._restore(self._highlight_rect(*square)))
+                    self._board.mark_dirty(*square)
+            if row is not None and column is not None:
+                highlight_square(self._display, row, column)
+        self._square = (row, column)
+
+        info = (game.get_num_captured_pieces("RED"), game.get_num_captured_pieces("BLACK"), game.get_active_player())
+        if self._full or info != self._info:
+            if self._info_rect is not None:
+                rects.append(self._restore(self._info_rect))
+            self._info_rect = game_info(self._display, game)
+            rects.append(self._info_rect)
+            self._info = info
+        if stats_text is not None and (self._full or stats_text != self._stats):
+            if self._stats_rect is not None:
+                rects.append(self._restore(self._stats_rect))
+            self._stats_rect = stats_info(self._display, stats_text)
+            rects.append(self._stats_rect)
+            self._stats = stats_text
+
+        if self._full:
+            self._board.display_board(self._display)
+            self._full = False
+            return [self._display.get_rect()]
+        return rects + self._board.display_dirty(self._display)
+
+    def _restore(self, rect):
+        """Redraws the background under rect and returns it."""
+        self._display.blit(self._background, rect, rect)
+        return rect
+
+    @staticmethod
+    def _highlight_rect(row, column):
+        """Returns the rect highlight_square draws for a square."""
+        x, y = get_square_location(row, column)
+        return pygame.Rect(x, y, SQUARE_WIDTH + 4, SQUARE_HEIGHT + 4)
 
 
-def fill_border(game_display):
+class FrameStats:
+    """Measures the frame rate and the CPU used by the process, refreshed about once per second."""
+    def __init__(self, clock, interval=1.0):
+        """Creates the stats for the frames ticked on clock."""
+        self._clock = clock
+        self._interval = interval
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self._text = "FPS: --  CPU: --"
+
+    def get_text(self):
+        """Returns the stats overlay text, e.g. 'FPS: 30.0  CPU: 4.2%'."""
+        wall = time.perf_counter()
+        if wall - self._wall >= self._interval:
+            cpu = time.process_time()
+            self._text = "FPS: %.1f  CPU: %.1f%%" % (self._clock.get_fps(),
+                                                    100 * (cpu - self._cpu) / (wall - self._wall))
+            self._wall, self._cpu = wall, cpu
+        return self._text
+
+
+def fill_border(game_display, board_size=BOARD_SIZE):
     """Fills in the border of the board."""
-    pygame.draw.rect(game_display, BLACK_COLOR, (BORDER, BORDER,
-                                                 (SQUARE_WIDTH + 2) * 9 + 2, (SQUARE_HEIGHT + 2) * 9 + 2))
+    pygame.draw.rect(game_display, BLACK_COLOR, (BORDER, BORDER, (SQUARE_WIDTH + 2) * board_size + 2,
+                                                 (SQUARE_HEIGHT + 2) * board_size + 2))
 
 
 def highlight_square(game_display, row, column):
@@ -152,18 +352,102 @@ def get_square_location(row, column):
     return [x, y]
 
 
+@functools.lru_cache(maxsize=None)
+def get_font(size=20):
+    """Returns the bold Calibri font of the given size, created once."""
+    return pygame.font.SysFont("Calibri", size, bold=True)
+
+
+@functools.lru_cache(maxsize=64)
+def render_text(text, color, background=None):
+    """Returns the rendered surface of a line of text, cached so unchanged text is not rendered again."""
+    return get_font().render(text, background is not None, color, background)
+
+
 def game_info(game_display, game):
-    """Displays the current game's information."""
-    font = pygame.font.SysFont("Calibri", 20, bold=True)
+    """Displays the current game's information, returns the rect drawn."""
     black_score = game.get_num_captured_pieces("RED")
     red_score = game.get_num_captured_pieces("BLACK")
     active_player = game.get_active_player().capitalize()
-    display_info = font.render("Black's Score: %s    Red's Score: %s    %s's Turn" %
-                                    (str(black_score), str(red_score), active_player), False, GREEN_COLOR)
+    display_info = render_text("Black's Score: %s    Red's Score: %s    %s's Turn" %
+                               (str(black_score), str(red_score), active_player), GREEN_COLOR)
     info_rect = display_info.get_rect()
     info_rect.topright = (WINDOW_WIDTH - 50, 10)
     game_display.blit(display_info, info_rect)
+    return info_rect
+
+
+def stats_info(game_display, stats_text):
+    """Displays the frame rate and CPU stats below the board, returns the rect drawn."""
+    display_stats = render_text(stats_text, GREEN_COLOR)
+    stats_rect = display_stats.get_rect()
+    stats_rect.bottomleft = (BORDER, WINDOW_HEIGHT - 10)
+    game_display.blit(display_stats, stats_rect)
+    return stats_rect
+
+
+def parse_args(argv=None):
+    """
+    Returns the keyword arguments of main() from the command line: the players for each color, human or ai, with the
+    ai time limit per move, the opening book and tablebase, the variant and the render options.
+    """
+    parser = argparse.ArgumentParser(description="Hasami Shogi implemented in Pygame.")
+    parser.add_argument("--black", choices=("human", "ai", "mcts"), default="human", help="player for black")
+    parser.add_argument("--red", choices=("human", "ai", "mcts"), default="human", help="player for red")
+    parser.add_argument("--time", type=float, default=1.0, help="ai time limit per move in seconds")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for the mcts player")
+    parser.add_argument("--book", help="opening book file for the ai, built with OpeningBook.py")
+    parser.add_argument("--tablebase", help="endgame tablebase file for the ai, built with Tablebase.py")
+    parser.add_argument("--variant", choices=[name for name, variant in VARIANTS.items()
+                                              if variant.board_size <= BOARD_SIZE], default=STANDARD.name,
+                        help="rules to play by, a network game uses the rules of the game on the server")
+    parser.add_argument("--render", choices=("dirty", "full"), default="dirty",
+                        help="redraw only what changed each frame, or the whole window")
+    parser.add_argument("--fps", type=int, default=DEFAULT_FPS, help="frame rate cap")
+    parser.add_argument("--stats", action="store_true", help="display the frame rate and CPU use")
+    parser.add_argument("--no-preload", action="store_true", help="load images on first use instead of at startup")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="time the rules, drawing and frames, written to the file(JSON, or Prometheus text for a "
+                             ".prom file) on F2 and at exit")
+    parser.add_argument("--profile", metavar="FILE", help="profile the main thread, written as a pstats dump at exit")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="play a game on a server started with Server.py")
+    parser.add_argument("--game", type=int, help="id of the game on the server to join, else a new game is created")
+    parser.add_argument("--color", choices=("BLACK", "RED", "BOTH"), default="BLACK",
+                        help="color to play in a new game on the server")
+    args = parser.parse_args(argv)
+    players = dict()
+    for color, player in (("BLACK", args.black), ("RED", args.red)):
+        if player == "ai":
+            players[color] = EnginePlayer(AlphaBetaEngine(time_limit=args.time))
+        elif player == "mcts":
+            players[color] = EnginePlayer(MCTSEngine(time_limit=args.time, workers=args.workers))
+        else:
+            players[color] = None
+    lookups = [OpeningBook(args.book)] if args.book else []
+    if args.tablebase:
+        lookups.append(Tablebase(args.tablebase))
+    metrics = Metrics() if args.metrics else None
+    if metrics is not None:
+        atexit.register(metrics.write, args.metrics)
+    if args.profile:
+        profile_to_file(args.profile)
+    client, variant = None, get_variant(args.variant)
+    if args.connect:
+        host, _, port = args.connect.rpartition(":")
+        client = GameClient(host or "127.0.0.1", int(port))
+        if args.game is None:
+            print("Created game %d, join with --connect %s --game %d" %
+                  (client.create(args.color, variant.name), args.connect, client.get_game_id()))
+        else:
+            client.join(args.game)
+            variant = get_variant(client.get_variant())
+        for color in players:
+            if color not in client.get_colors():
+                players[color] = client.get_remote_player()
+    return dict(players=players, render_mode=args.render, fps=args.fps, show_stats=args.stats,
+                preload_images=not args.no_preload, client=client, variant=variant,
+                lookups=lookups, metrics=metrics, metrics_path=args.metrics)
 
 
 if __name__ == '__main__':
-    main()
+    main(**parse_args())
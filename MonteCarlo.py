@@ -0,0 +1,281 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Monte Carlo tree search(UCT) computer opponent, an alternative to the alpha-beta engine(Engine.py) for the variants
+# where a static evaluation is weak. The tree is walked with make_move()/unmake_move() and each new leaf is scored by
+# a random playout on a copy of the game(HasamiShogiGame.playout(), which applies the rules without the bookkeeping).
+# With several workers the search is root parallel: each worker process grows its own tree from the same position and
+# the visits and wins of the root moves are summed. The tree is kept under a node cap by collapsing the least visited
+# subtrees back into leaves. Usage: python MonteCarlo.py [seconds] [workers] [variant]
+
+import math
+import multiprocessing
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from Game import HasamiShogiGame
+from Variant import STANDARD, get_variant
+
+NODE_BYTES = 240  # About the memory of a node with its move, for the memory cap
+PLAYOUTS_PER_TIME_CHECK = 16
+PRUNE_FRACTION = 0.75  # Pruning collapses subtrees until the tree is this fraction of the cap
+
+
+class _Node:
+    """
+    A node of the search tree, reached by playing move. wins counts the playouts won(draws as half) by the player who
+    made the move, so a parent picks the child best for itself. untried is None until the node's moves are generated.
+    """
+    __slots__ = ("move", "parent", "children", "untried", "visits", "wins")
+
+    def __init__(self, move=None, parent=None):
+        """Creates a leaf node."""
+        self.move = move
+        self.parent = parent
+        self.children = list()
+        self.untried = None
+        self.visits = 0
+        self.wins = 0.0
+
+
+class MCTSInfo:
+    """Statistics of a search: playouts, tree size, subtrees pruned, time, workers and the best move's win rate."""
+    def __init__(self):
+        """Creates empty search statistics."""
+        self.playouts = 0
+        self.nodes = 0
+        self.pruned = 0
+        self.elapsed = 0.0
+        self.workers = 1
+        self.win_rate = 0.0
+        self.pv = list()
+        self.lookup = None  # The LookupResult when the move came from the opening book or tablebase
+
+    def get_pps(self):
+        """Returns the playouts per second."""
+        return int(self.playouts / self.elapsed) if self.elapsed > 0 else 0
+
+    def __str__(self):
+        if self.lookup is not None:
+            return str(self.lookup)
+        pv = " ".join("%d%d-%d%d" % move for move in self.pv)
+        return "playouts %d  pps %d  nodes %d  pruned %d  workers %d  time %.2fs  win %.1f%%  move %s" % (
+            self.playouts, self.get_pps(), self.nodes, self.pruned, self.workers, self.elapsed, 100 * self.win_rate,
+            pv)
+
+
+class MCTSEngine:
+    """
+    Computer opponent searching with UCT under a time limit per move. Has the same search() as AlphaBetaEngine, so it
+    can be run by an EnginePlayer. The search is started over for every move.
+    """
+    def __init__(self, time_limit=1.0, exploration=1.4, workers=1, memory_mb=64, max_playout_plies=60,
+                 capture_tries=2, seed=None):
+        """
+        Creates an engine that searches for time_limit seconds on workers processes, with each tree kept under
+        memory_mb megabytes. Playouts stop unfinished after max_playout_plies moves and are scored by the captures,
+        capture_tries is passed on to HasamiShogiGame.playout().
+        """
+        self._time_limit = time_limit
+        self._exploration = exploration
+        self._workers = max(1, workers)
+        self._memory_mb = memory_mb
+        self._max_nodes = max(1000, int(memory_mb * 1024 * 1024 / NODE_BYTES))
+        self._max_playout_plies = max_playout_plies
+        self._capture_tries = capture_tries
+        self._rng = random.Random(seed)
+        self._executor = None
+
+    def search(self, game, stop_event=None):
+        """
+        Searches the game for the active player and returns (best move, MCTSInfo), the most visited root move. The game
+        is not changed. Setting stop_event ends the search early(worker processes run to the search's deadline, and
+        their trees are then not merged). A move known to the game's opening book or tablebase is returned without
+        searching.
+        """
+        info = MCTSInfo()
+        known = game.lookup()
+        if known is not None and known.move is not None:
+            info.lookup, info.pv = known, [known.move]
+            return known.move, info
+        start = time.perf_counter()
+        futures = list()
+        if self._workers > 1:
+            if self._executor is None:  # Spawned, as forking the thread of an EnginePlayer could deadlock
+                self._executor = ProcessPoolExecutor(max_workers=self._workers - 1,
+                                                     mp_context=multiprocessing.get_context("spawn"))
+            snapshot = game.snapshot()
+            deadline = time.time() + self._time_limit  # Wall clock, so a task started late still ends on time
+            futures = [self._executor.submit(_search_worker, snapshot, self._get_settings(), deadline,
+                                             self._rng.getrandbits(32)) for _ in range(self._workers - 1)]
+        stats, playouts, nodes, pruned = self._search_tree(game, self._rng, start + self._time_limit, stop_event)
+        info.workers = 1 + len(futures)
+        for future in futures:
+            if stop_event is not None and stop_event.is_set():
+                future.cancel()
+                continue
+            worker_stats, worker_playouts, worker_nodes, worker_pruned = future.result()
+            for move, (visits, wins) in worker_stats.items():
+                move_stats = stats.setdefault(move, [0, 0.0])
+                move_stats[0] += visits
+                move_stats[1] += wins
+            playouts, nodes, pruned = playouts + worker_playouts, nodes + worker_nodes, pruned + worker_pruned
+        info.playouts, info.nodes, info.pruned = playouts, nodes, pruned
+        info.elapsed = time.perf_counter() - start
+        if not stats:
+            moves = game.legal_moves()
+            return (moves[0] if moves else None), info
+        best_move, (visits, wins) = max(stats.items(), key=lambda item: item[1][0])
+        info.win_rate, info.pv = wins / visits if visits else 0.0, [best_move]
+        return best_move, info
+
+    def close(self):
+        """Shuts down the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    def _get_settings(self):
+        """Returns the engine settings for a worker process."""
+        return dict(time_limit=self._time_limit, exploration=self._exploration, memory_mb=self._memory_mb,
+                    max_playout_plies=self._max_playout_plies, capture_tries=self._capture_tries)
+
+    def _search_tree(self, game, rng, deadline, stop_event=None):
+        """
+        Grows a tree from the game until the deadline and returns ({root move: [visits, wins]}, playouts, tree size,
+        subtrees pruned).
+        """
+        root_game, root = game.copy(), _Node()
+        exploration, max_nodes = self._exploration, self._max_nodes
+        num_pieces = game.get_variant().num_pieces
+        playouts = nodes = pruned = 0
+        while True:
+            if playouts % PLAYOUTS_PER_TIME_CHECK == 0 and (
+                    time.perf_counter() > deadline or (stop_event is not None and stop_event.is_set())):
+                break
+            # Selection: follow the best UCT child while the node is fully expanded.
+            node, depth = root, 0
+            while node.untried == [] and node.children:
+                log_visits = math.log(node.visits)
+                node = max(node.children, key=lambda child: child.wins / child.visits +
+                           exploration * math.sqrt(log_visits / child.visits))
+                root_game.make_move(*node.move)
+                depth += 1
+            # Expansion: add one untried move, unless the game is over.
+            if root_game.get_game_state() == "UNFINISHED":
+                if node.untried is None:
+                    node.untried = root_game.legal_moves()
+                    rng.shuffle(node.untried)
+                if node.untried:
+                    child = _Node(node.untried.pop(), node)
+                    node.children.append(child)
+                    nodes += 1
+                    root_game.make_move(*child.move)
+                    depth += 1
+                    node = child
+            # Playout, scored for the player who made the move into the leaf.
+            mover = "RED" if root_game.get_active_player() == "BLACK" else "BLACK"
+            if root_game.get_game_state() == "UNFINISHED":
+                playout_game = root_game.copy()
+                playout_game.playout(rng, self._max_playout_plies, self._capture_tries)
+            else:
+                playout_game = root_game
+            reward = _score_playout(playout_game, mover, num_pieces)
+            playouts += 1
+            # Backpropagation, taking the moves back on the way up.
+            while node is not None:
+                node.visits += 1
+                node.wins += reward
+                reward = 1.0 - reward
+                node = node.parent
+            for _ in range(depth):
+                root_game.unmake_move()
+            if nodes > max_nodes:
+                removed, collapsed = _prune(root, nodes - int(max_nodes * PRUNE_FRACTION))
+                nodes, pruned = nodes - removed, pruned + collapsed
+        stats = dict((child.move, [child.visits, child.wins]) for child in root.children)
+        return stats, playouts, nodes, pruned
+
+
+def _score_playout(game, mover, num_pieces):
+    """
+    Returns the result of a playout for the player mover: 1 for a win, 0 for a loss, 0.5 for a draw. An unfinished
+    playout is scored between 0 and 1 by the difference in pieces captured.
+    """
+    state = game.get_game_state()
+    if state == mover + "_WON":
+        return 1.0
+    if state.endswith("_WON"):
+        return 0.0
+    if state == "DRAW":
+        return 0.5
+    opponent = "RED" if mover == "BLACK" else "BLACK"
+    lead = game.get_num_captured_pieces(opponent) - game.get_num_captured_pieces(mover)
+    return 0.5 + 0.5 * lead / num_pieces
+
+
+def _prune(root, target):
+    """
+    Collapses the least visited expanded subtrees below the root into leaves until at least target nodes are removed.
+    A collapsed node keeps its statistics and is expanded again if the search comes back to it. Returns (nodes
+    removed, subtrees collapsed).
+    """
+    expanded, stack = list(), list(root.children)
+    while stack:
+        node = stack.pop()
+        if node.children:
+            expanded.append(node)
+            stack.extend(node.children)
+    expanded.sort(key=lambda node: node.visits)  # A subtree's nodes have fewer visits than its root, so come first
+    removed = collapsed = 0
+    for node in expanded:
+        if removed >= target:
+            break
+        if not node.children:
+            continue
+        size, stack = 0, list(node.children)
+        while stack:
+            child = stack.pop()
+            size += 1
+            stack.extend(child.children)
+        node.children, node.untried = list(), None
+        removed += size
+        collapsed += 1
+    return removed, collapsed
+
+
+def _search_worker(snapshot, settings, deadline, seed):
+    """
+    Worker process target: grows a tree from the game restored from the snapshot(its start position and moves, so
+    repetitions count) until the deadline(time.time()) and returns its root move statistics.
+    """
+    game = HasamiShogiGame.from_snapshot(snapshot)
+    engine = MCTSEngine(**settings)
+    return engine._search_tree(game, random.Random(seed), time.perf_counter() + deadline - time.time())
+
+
+def main(argv=None):
+    """Benchmarks the search from the start position: playouts per second and tree size, single and parallel."""
+    argv = sys.argv[1:] if argv is None else argv
+    seconds = float(argv[0]) if argv else 2.0
+    workers = int(argv[1]) if len(argv) > 1 else 2
+    variant = get_variant(argv[2]) if len(argv) > 2 else STANDARD
+    game = HasamiShogiGame(variant=variant)
+    for num_workers in sorted({1, workers}):
+        engine = MCTSEngine(time_limit=seconds, workers=num_workers, seed=0)
+        engine.search(game)  # Starts the worker processes
+        move, info = engine.search(game)
+        print("%s, %d worker(s): %s" % (variant.name, num_workers, info))
+        engine.close()
+
+
+if __name__ == '__main__':
+    main()
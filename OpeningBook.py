@@ -0,0 +1,145 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Opening book built offline from game archives(Record.py), e.g. the self-play games of Tournament.py. For every
+# position of the first plies of each game, the moves played are scored by the results of the games, and the best
+# scoring move is kept. Positions are keyed by their Zobrist hash after symmetry reduction: red's positions are seen
+# from red's side of the board(rows reversed, colors swapped) so both colors share entries, and a position and its
+# mirror image are one entry. The book is a memory-mapped index(Lookup.py).
+# Usage: python Tournament.py --games 1000 --black ai --red random --archive games.hsgr
+#        python OpeningBook.py games.hsgr --plies 16 --output book.idx
+
+import argparse
+import os
+import sys
+import time
+from Game import HasamiShogiGame
+from Lookup import LookupResult, MappedIndex, write_index
+from Position import transform_bitboard
+from Record import WIN_CONDITION, read_records
+from Variant import STANDARD
+
+MAGIC = b"HSOB"
+DEFAULT_PATH = "book.idx"
+_BLACK_SYMMETRIES = (0, 1)  # Identity and mirror
+_RED_SYMMETRIES = (2, 3)  # Rows reversed, without and with the mirror
+
+
+def book_key(position, player_color):
+    """
+    Returns (key, symmetry) of the position with the player to move: the hash of the smaller of the position and its
+    mirror image, both seen from the player's side, and the symmetry of the board which gives it.
+    """
+    tables = position.get_tables()
+    opponent_color = "RED" if player_color == "BLACK" else "BLACK"
+    mover, opponent = position.get_pieces(player_color), position.get_pieces(opponent_color)
+    best = None
+    for symmetry in (_BLACK_SYMMETRIES if player_color == "BLACK" else _RED_SYMMETRIES):
+        mapping = tables.symmetries[symmetry]
+        pieces = (transform_bitboard(mover, mapping), transform_bitboard(opponent, mapping))
+        if best is None or pieces < best[0]:
+            best = (pieces, symmetry)
+    (mover, opponent), symmetry = best
+    # The player to move takes black's keys and the opponent red's, as if black were to move.
+    key = 0
+    for color, pieces in (("BLACK", mover), ("RED", opponent)):
+        color_keys = tables.zobrist_keys[color]
+        while pieces:
+            low_bit = pieces & -pieces
+            key ^= color_keys[low_bit.bit_length() - 1]
+            pieces ^= low_bit
+    return key or 1, symmetry  # 0 marks an empty slot of the index
+
+
+def build_book(paths, max_plies=16, min_games=2):
+    """
+    Returns the book entries from the games in the archive files: for each position reached in the first max_plies
+    plies, the move with the best average result for the player making it, among the moves played in at least
+    min_games games. An entry packs the move squares(in the key's orientation), the number of games(at most 255) and
+    the score in percent.
+    """
+    stats = dict()  # Key -> {(from, to): [games, points]}
+    for path in paths:
+        for record in read_records(path):
+            if record.win_condition != WIN_CONDITION:
+                continue
+            game = HasamiShogiGame()
+            tables = game.get_position().get_tables()
+            for ply, (from_row, from_col, to_row, to_col) in enumerate(record.moves()):
+                if ply >= max_plies:
+                    break
+                player = game.get_active_player()
+                key, symmetry = book_key(game.get_position(), player)
+                mapping = tables.symmetries[symmetry]
+                move = (mapping[from_row * tables.size + from_col], mapping[to_row * tables.size + to_col])
+                points = 1.0 if record.result == player + "_WON" else 0.0 if record.result.endswith("_WON") else 0.5
+                move_stats = stats.setdefault(key, dict()).setdefault(move, [0, 0.0])
+                move_stats[0] += 1
+                move_stats[1] += points
+                game.make_move(from_row, from_col, to_row, to_col)
+    entries = dict()
+    for key, moves in stats.items():
+        candidates = [(points / games, games, move) for move, (games, points) in moves.items() if games >= min_games]
+        if candidates:
+            score, games, (from_square, to_square) = max(candidates)
+            entries[key] = from_square | to_square << 8 | min(games, 255) << 16 | round(100 * score) << 24
+    return entries
+
+
+class OpeningBook:
+    """An opening book file opened for lookups. probe() finds a game's position in O(1) in the memory-mapped index."""
+    def __init__(self, path=DEFAULT_PATH):
+        """Opens the book file."""
+        self._index = MappedIndex(path, MAGIC)
+
+    def get_num_entries(self):
+        """Returns the number of positions in the book."""
+        return self._index.get_num_entries()
+
+    def probe(self, game):
+        """Returns the LookupResult with the book move of the game's position, or None if it is not in the book."""
+        variant = game.get_variant()
+        if (variant.board_size != self._index.board_size or variant.win_captures != self._index.rule or
+                variant.jumps or variant.line_length or game.get_game_state() != "UNFINISHED"):
+            return None
+        position = game.get_position()
+        key, symmetry = book_key(position, game.get_active_player())
+        value = self._index.get(key)
+        if value is None:
+            return None
+        tables = position.get_tables()
+        inverse = tables.inverse_symmetries[symmetry]
+        move = tables.squares[inverse[value & 255]] + tables.squares[inverse[value >> 8 & 255]]
+        if move not in game.legal_moves_from(move[0], move[1]):
+            return None  # Another position with the same hash
+        return LookupResult("book", move, games=value >> 16 & 255, score=(value >> 24) / 100)
+
+    def close(self):
+        """Closes the book file."""
+        self._index.close()
+
+
+def main(argv=None):
+    """Builds an opening book from game archives on the command line."""
+    parser = argparse.ArgumentParser(description="Builds a Hasami Shogi opening book from game archives.")
+    parser.add_argument("archives", nargs="+", help="game archive files written by Tournament.py --archive")
+    parser.add_argument("--plies", type=int, default=16, help="plies from the start of each game in the book")
+    parser.add_argument("--min-games", type=int, default=2, help="games a move must be played in to be kept")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="index file to write")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    entries = build_book(args.archives, args.plies, args.min_games)
+    write_index(args.output, MAGIC, STANDARD.board_size, STANDARD.win_captures, entries)
+    print("%d positions written to %s (%d bytes) in %.1fs" % (
+        len(entries), args.output, os.path.getsize(args.output), time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,86 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Perft counts the leaf nodes of the legal move tree to a fixed depth. Used to check the move generator and captures,
+# and to measure nodes per second. With a variant name(or "all"), the variants are benchmarked the same way, plus the
+# moves per second of random games. Usage: python Perft.py [max_depth] [variant|all]
+
+import random
+import sys
+import time
+from Game import HasamiShogiGame
+from Variant import STANDARD, VARIANTS, get_variant
+
+
+def perft(game, depth):
+    """Returns the number of leaf nodes reachable from the game in exactly depth moves(finished games are leaves)."""
+    if depth == 0:
+        return 1
+    moves = game.legal_moves()
+    if depth == 1:
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        game.make_move(*move)
+        nodes += perft(game, depth - 1)
+        game.unmake_move()
+    return nodes
+
+
+def divide(game, depth):
+    """Returns a dictionary of the perft count below each legal move of the game."""
+    counts = dict()
+    for move in game.legal_moves():
+        game.make_move(*move)
+        counts[move] = perft(game, depth - 1)
+        game.unmake_move()
+    return counts
+
+
+def random_games_speed(variant, num_games=20, seed=1, max_moves=200):
+    """Returns the moves per second(move generation and make_move) playing random games of the variant."""
+    rng = random.Random(seed)
+    start, num_moves = time.perf_counter(), 0
+    for _ in range(num_games):
+        game = HasamiShogiGame(variant=variant)
+        while game.get_game_state() == "UNFINISHED" and num_moves < max_moves * num_games:
+            moves = game.legal_moves()
+            if not moves or len(game.get_move_history()) >= max_moves:
+                break
+            game.make_move(*rng.choice(moves))
+            num_moves += 1
+    return num_moves / max(time.perf_counter() - start, 1e-9)
+
+
+def main():
+    """
+    Prints perft counts and nodes per second from the starting position for each depth up to max_depth, for the
+    standard game or the named variants.
+    """
+    max_depth = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    if len(sys.argv) > 2:
+        variants = list(VARIANTS.values()) if sys.argv[2] == "all" else [get_variant(sys.argv[2])]
+    else:
+        variants = [STANDARD]
+    for variant in variants:
+        if len(variants) > 1 or variant is not STANDARD:
+            print("%s (%dx%d)" % (variant, variant.board_size, variant.board_size))
+        for depth in range(1, max_depth + 1):
+            game = HasamiShogiGame(variant=variant)
+            start = time.perf_counter()
+            nodes = perft(game, depth)
+            elapsed = time.perf_counter() - start
+            print("perft(%d) = %d    %.3fs    %d nodes/sec" % (depth, nodes, elapsed, nodes / max(elapsed, 1e-9)))
+        if len(variants) > 1 or variant is not STANDARD:
+            print("random games    %d moves/sec" % random_games_speed(variant))
+
+
+if __name__ == '__main__':
+    main()
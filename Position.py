@@ -0,0 +1,432 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+import functools
+import random
+
+BOARD_SIZE = 9
+
+# Directions relative to black side of board. Up and left decrease the bit index, down and right increase it.
+UP, LEFT, DOWN, RIGHT = 0, 1, 2, 3
+DIRECTIONS = ((-1, 0), (0, -1), (1, 0), (0, 1))
+
+
+def square_index(row, col):
+    """Returns the bit index of a square on the 9x9 board, numbered row by row from the top left corner."""
+    return row * BOARD_SIZE + col
+
+
+def square_bit(row, col):
+    """Returns the single-bit mask of a square on the 9x9 board."""
+    return 1 << (row * BOARD_SIZE + col)
+
+
+def popcount(bitboard):
+    """Returns the number of set bits of a bitboard."""
+    return bin(bitboard).count("1")
+
+
+def iter_squares(bitboard, board_size=BOARD_SIZE):
+    """Yields the (row, col) of each set bit of a bitboard, lowest bit first."""
+    while bitboard:
+        low_bit = bitboard & -bitboard
+        yield divmod(low_bit.bit_length() - 1, board_size)
+        bitboard ^= low_bit
+
+
+def _make_rays(size):
+    """Returns the ray of squares from each square to the edge of the board in each direction, as bitboards."""
+    rays = []
+    for index in range(size * size):
+        row, col = divmod(index, size)
+        square_rays = []
+        for d_row, d_col in DIRECTIONS:
+            ray, ray_row, ray_col = 0, row + d_row, col + d_col
+            while 0 <= ray_row < size and 0 <= ray_col < size:
+                ray |= 1 << (ray_row * size + ray_col)
+                ray_row, ray_col = ray_row + d_row, ray_col + d_col
+            square_rays.append(ray)
+        rays.append(tuple(square_rays))
+    return tuple(rays)
+
+
+def _make_jumps(size):
+    """
+    Returns for each square the (over bit, landing bit) pairs of the jumps over an adjacent square to the square just
+    past it, in each direction that stays on the board.
+    """
+    jumps = []
+    for index in range(size * size):
+        row, col = divmod(index, size)
+        square_jumps = []
+        for d_row, d_col in DIRECTIONS:
+            land_row, land_col = row + 2 * d_row, col + 2 * d_col
+            if 0 <= land_row < size and 0 <= land_col < size:
+                square_jumps.append((1 << ((row + d_row) * size + col + d_col), 1 << (land_row * size + land_col)))
+        jumps.append(tuple(square_jumps))
+    return tuple(jumps)
+
+
+def _make_corner_captures(size):
+    """
+    Returns a dictionary from each of the eight squares next to a corner to the (corner bit, partner bit) pair. A
+    corner piece is captured when both squares next to it are held by the other color.
+    """
+    corner_captures = dict()
+    last = size - 1
+    for corner_row, corner_col in ((0, 0), (0, last), (last, 0), (last, last)):
+        row_step, col_step = (1 if corner_row == 0 else -1), (1 if corner_col == 0 else -1)
+        corner_bit = 1 << (corner_row * size + corner_col)
+        side_row = (corner_row + row_step) * size + corner_col
+        side_col = corner_row * size + corner_col + col_step
+        corner_captures[side_row] = (corner_bit, 1 << side_col)
+        corner_captures[side_col] = (corner_bit, 1 << side_row)
+    return corner_captures
+
+
+def _make_line_runs(size):
+    """
+    Returns for each square of a line(rank or file) and each occupancy of the line by the defending color, the
+    (run, stop) masks toward the low end and toward the high end of the line. The run is the defending pieces next to
+    the square, the stop the single square past the run. The run is captured when the attacker holds the stop square.
+    Both masks are 0 when there is no run or it reaches the edge.
+    """
+    line_runs = []
+    for square in range(size):
+        square_runs = []
+        for defenders in range(1 << size):
+            runs = []
+            for step in (-1, 1):
+                run, stop = 0, square + step
+                while 0 <= stop < size and defenders >> stop & 1:
+                    run, stop = run | 1 << stop, stop + step
+                runs += (run, 1 << stop) if run and 0 <= stop < size else (0, 0)
+            square_runs.append(tuple(runs))
+        line_runs.append(tuple(square_runs))
+    return tuple(line_runs)
+
+
+def _make_symmetries(size):
+    """
+    Returns the eight symmetries of the square board as square index maps: identity, mirror(columns reversed), flip
+    (rows reversed), both, then the same four after transposing. The rules are the same under each of them.
+    """
+    last = size - 1
+    symmetries = []
+    for transpose in (False, True):
+        for flip_rows, flip_cols in ((False, False), (False, True), (True, False), (True, True)):
+            mapping = []
+            for row, col in (divmod(index, size) for index in range(size * size)):
+                row, col = (col, row) if transpose else (row, col)
+                mapping.append((last - row if flip_rows else row) * size + (last - col if flip_cols else col))
+            symmetries.append(tuple(mapping))
+    return tuple(symmetries)
+
+
+def _make_zobrist_keys(num_squares, seed=20211204):
+    """Returns random 64 bit Zobrist keys for each color on each square, and the key for red to move."""
+    rng = random.Random(seed)
+    piece_keys = dict(BLACK=tuple(rng.getrandbits(64) for _ in range(num_squares)),
+                      RED=tuple(rng.getrandbits(64) for _ in range(num_squares)))
+    return piece_keys, rng.getrandbits(64)
+
+
+class BoardTables:
+    """
+    The precomputed move, capture and hash tables for one board size, indexed by square index(row * size + col).
+    Built once per size by get_tables() and shared by every position and game of that size.
+    """
+    def __init__(self, size):
+        """Builds the tables for a size x size board."""
+        self.size = size
+        self.num_squares = size * size
+        # RAYS excludes the square itself, SHADOWS are the square plus its ray, the squares a blocking piece on that
+        # square cuts off from a slide.
+        self.squares = tuple(divmod(index, size) for index in range(self.num_squares))
+        self.rays = _make_rays(size)
+        self.shadows = tuple(tuple((1 << index) | ray for ray in self.rays[index]) for index in range(self.num_squares))
+        self.jumps = _make_jumps(size)
+        self.corner_captures = _make_corner_captures(size)
+        # symmetries[n][index] is the square the symmetry moves the square to, inverse_symmetries[n] maps it back.
+        self.symmetries = _make_symmetries(size)
+        self.inverse_symmetries = tuple(tuple(mapping.index(index) for index in range(self.num_squares))
+                                        for mapping in self.symmetries)
+        # Per-line tables. line_runs[square][defenders] gives the (low run, low stop, high run, high stop) line masks,
+        # file_bits[line] spreads a file mask to a bitboard of column 0, line_squares[index] is (row, col, bit of the
+        # square in its rank, bit of the square in its file).
+        self.line_runs = _make_line_runs(size)
+        self.file_bits = tuple(sum(1 << (row * size) for row in range(size) if line >> row & 1)
+                               for line in range(1 << size))
+        self.line_squares = tuple((row, col, 1 << col, 1 << row) for row, col in self.squares)
+        # Zobrist hashing, the hash of a position is the XOR of the key of each piece, XOR the side key when red is to
+        # move. Keys come from a fixed seed so hashes are the same in every process.
+        self.zobrist_keys, self.zobrist_red_to_move = _make_zobrist_keys(self.num_squares)
+
+    def get_start(self, rows=1):
+        """Returns the starting (black, red) bitboards with the first rows ranks filled for each color."""
+        red = (1 << (rows * self.size)) - 1
+        return red << (self.size * (self.size - rows)), red
+
+
+@functools.lru_cache(maxsize=None)
+def get_tables(board_size=BOARD_SIZE):
+    """Returns the BoardTables of a board size, built on first use."""
+    return BoardTables(board_size)
+
+
+# The tables of the standard 9x9 board.
+STANDARD_TABLES = get_tables(BOARD_SIZE)
+NUM_SQUARES = STANDARD_TABLES.num_squares
+RANK_MASK = (1 << BOARD_SIZE) - 1
+START_BLACK, START_RED = STANDARD_TABLES.get_start()  # Last rank(row 8) and first rank(row 0)
+SQUARES = STANDARD_TABLES.squares
+RAYS = STANDARD_TABLES.rays
+SHADOWS = STANDARD_TABLES.shadows
+CORNER_CAPTURES = STANDARD_TABLES.corner_captures
+LINE_RUNS = STANDARD_TABLES.line_runs
+FILE_BITS = STANDARD_TABLES.file_bits
+LINE_SQUARES = STANDARD_TABLES.line_squares
+ZOBRIST_KEYS, ZOBRIST_RED_TO_MOVE = STANDARD_TABLES.zobrist_keys, STANDARD_TABLES.zobrist_red_to_move
+
+
+def transform_bitboard(bitboard, mapping):
+    """Returns the bitboard with each square moved by a square index map, e.g. one of BoardTables.symmetries."""
+    transformed = 0
+    while bitboard:
+        low_bit = bitboard & -bitboard
+        transformed |= 1 << mapping[low_bit.bit_length() - 1]
+        bitboard ^= low_bit
+    return transformed
+
+
+def move_mask(tables, index, occupied):
+    """
+    Returns the bitboard of empty squares a piece on the square can slide to along its rank and file, given the
+    occupied squares. The nearest blocker on a decreasing ray is its highest bit, on an increasing ray its lowest bit.
+    """
+    shadows = tables.shadows
+    up, left, down, right = tables.rays[index]
+    moves = 0
+    blockers = up & occupied
+    moves |= up ^ shadows[blockers.bit_length() - 1][UP] if blockers else up
+    blockers = left & occupied
+    moves |= left ^ shadows[blockers.bit_length() - 1][LEFT] if blockers else left
+    blockers = down & occupied
+    moves |= down ^ shadows[(blockers & -blockers).bit_length() - 1][DOWN] if blockers else down
+    blockers = right & occupied
+    moves |= right ^ shadows[(blockers & -blockers).bit_length() - 1][RIGHT] if blockers else right
+    return moves
+
+
+def capture_mask(tables, attackers, defenders, to_index):
+    """
+    Returns the bitboard of the defending pieces captured by an attacking piece on the to square, from bare bitboards
+    (attackers including the piece moved). Position.get_capture_mask gives the same result from its line masks, this
+    walks the four rays instead, for code which has no Position such as the tablebase generator.
+    """
+    shadows = tables.shadows
+    captured = 0
+    for direction, ray in enumerate(tables.rays[to_index]):
+        stops = ray & ~defenders
+        if not stops or stops == ray:
+            continue
+        # The nearest square which is not a defender: the lowest bit on an increasing ray, the highest on a decreasing.
+        stop = (stops & -stops).bit_length() - 1 if direction >= DOWN else stops.bit_length() - 1
+        if attackers >> stop & 1:
+            captured |= ray & ~shadows[stop][direction]
+    if to_index in tables.corner_captures:
+        corner_bit, partner_bit = tables.corner_captures[to_index]
+        if attackers & partner_bit and defenders & corner_bit:
+            captured |= corner_bit
+    return captured
+
+
+def zobrist_hash(position, player_color):
+    """Returns the Zobrist hash of the position with the specified player to move, computed from scratch."""
+    tables = position.get_tables()
+    key = tables.zobrist_red_to_move if player_color == "RED" else 0
+    for color in ("BLACK", "RED"):
+        pieces = position.get_pieces(color)
+        while pieces:
+            low_bit = pieces & -pieces
+            key ^= tables.zobrist_keys[color][low_bit.bit_length() - 1]
+            pieces ^= low_bit
+    return key
+
+
+def _make_lines(bitboard, size):
+    """Returns the occupancy of each rank and of each file of a bitboard as size bit masks, in two lists."""
+    ranks, files = [0] * size, [0] * size
+    for row, col in iter_squares(bitboard, size):
+        ranks[row] |= 1 << col
+        files[col] |= 1 << row
+    return ranks, files
+
+
+class Position:
+    """
+    Represents the pieces on a Hasami Shogi board as one packed integer(bitboard) per color. Bit row * size + col is
+    set when the square is occupied by that color. Each color's occupancy of every rank and file is also kept as bit
+    masks, updated with the bitboards, so captures are found with a few table lookups. The board is 9x9 unless the
+    tables of another size are given. The class does not depend on pygame.
+    """
+    def __init__(self, black=None, red=None, tables=STANDARD_TABLES):
+        """Creates a position, by default the starting setup with pieces on the first and last rank(row)."""
+        if black is None or red is None:
+            start_black, start_red = tables.get_start()
+            black, red = start_black if black is None else black, start_red if red is None else red
+        self._tables = tables
+        self._size = tables.size
+        self._pieces = dict(BLACK=black, RED=red)
+        self._ranks, self._files = dict(), dict()
+        for color, pieces in self._pieces.items():
+            self._ranks[color], self._files[color] = _make_lines(pieces, self._size)
+
+    def set_pieces(self, black, red):
+        """Replaces the pieces of both colors in place, so views of the position(a Board) stay attached to it."""
+        self._pieces["BLACK"], self._pieces["RED"] = black, red
+        for color, pieces in self._pieces.items():
+            self._ranks[color], self._files[color] = _make_lines(pieces, self._size)
+
+    def copy(self):
+        """Returns an independent copy of the position."""
+        position = Position.__new__(Position)
+        position._tables, position._size = self._tables, self._size
+        position._pieces = dict(self._pieces)
+        position._ranks = dict(BLACK=list(self._ranks["BLACK"]), RED=list(self._ranks["RED"]))
+        position._files = dict(BLACK=list(self._files["BLACK"]), RED=list(self._files["RED"]))
+        return position
+
+    def get_tables(self):
+        """Returns the BoardTables of the position's board size."""
+        return self._tables
+
+    def get_size(self):
+        """Returns the number of ranks(and files) of the board."""
+        return self._size
+
+    def get_pieces(self, player_color):
+        """Returns the bitboard of the pieces of the specified color."""
+        return self._pieces[player_color]
+
+    def get_occupied(self):
+        """Returns the bitboard of all occupied squares."""
+        return self._pieces["BLACK"] | self._pieces["RED"]
+
+    def count_pieces(self, player_color):
+        """Returns the number of pieces of the specified color on the board."""
+        return popcount(self._pieces[player_color])
+
+    def get_square_occupant(self, row, col):
+        """Returns whether the specified square is occupied by a red piece, black piece, or neither."""
+        bit = 1 << (row * self._size + col)
+        return "BLACK" if self._pieces["BLACK"] & bit else "RED" if self._pieces["RED"] & bit else "NONE"
+
+    def get_square_state(self, row, col):
+        """Returns the state of a square as shown on the Board, 'B', 'R' or '.'."""
+        bit = 1 << (row * self._size + col)
+        return "B" if self._pieces["BLACK"] & bit else "R" if self._pieces["RED"] & bit else "."
+
+    def set_square(self, row, col, state=None):
+        """Updates the state of the specified square, BLACK, RED or None for empty."""
+        bit = 1 << (row * self._size + col)
+        for color in ("BLACK", "RED"):
+            if self._pieces[color] & bit:
+                self._toggle(color, bit)
+        if state in ("BLACK", "RED"):
+            self._toggle(state, bit)
+
+    def move_piece(self, player_color, from_bit, to_bit):
+        """Moves a piece of the specified color between two single-bit squares."""
+        self._pieces[player_color] ^= from_bit | to_bit
+        ranks, files = self._ranks[player_color], self._files[player_color]
+        line_squares = self._tables.line_squares
+        row, col, col_bit, row_bit = line_squares[from_bit.bit_length() - 1]
+        ranks[row] ^= col_bit
+        files[col] ^= row_bit
+        row, col, col_bit, row_bit = line_squares[to_bit.bit_length() - 1]
+        ranks[row] ^= col_bit
+        files[col] ^= row_bit
+
+    def remove_pieces(self, player_color, captured_mask):
+        """Removes the pieces of the specified color in the captured mask."""
+        self._toggle(player_color, self._pieces[player_color] & captured_mask)
+
+    def add_pieces(self, player_color, pieces_mask):
+        """Adds pieces of the specified color on the squares in the mask, used to restore captured pieces."""
+        self._toggle(player_color, pieces_mask & ~self._pieces[player_color])
+
+    def _toggle(self, player_color, mask):
+        """Flips the squares in the mask for the specified color, in the bitboard and the rank and file masks."""
+        self._pieces[player_color] ^= mask
+        ranks, files = self._ranks[player_color], self._files[player_color]
+        for row, col in iter_squares(mask, self._size):
+            ranks[row] ^= 1 << col
+            files[col] ^= 1 << row
+
+    def get_move_mask(self, index):
+        """
+        Returns the bitboard of empty squares the piece on the square can slide to along its rank and file(no
+        jumping), see move_mask().
+        """
+        return move_mask(self._tables, index, self._pieces["BLACK"] | self._pieces["RED"])
+
+    def get_jump_mask(self, index):
+        """Returns the bitboard of empty squares the piece on the square can reach by jumping over an adjacent piece."""
+        occupied = self._pieces["BLACK"] | self._pieces["RED"]
+        moves = 0
+        for over_bit, land_bit in self._tables.jumps[index]:
+            if occupied & over_bit and not occupied & land_bit:
+                moves |= land_bit
+        return moves
+
+    def get_capture_mask(self, player_color, from_index, to_index):
+        """
+        Returns the bitboard of the pieces the player captures by moving from one square to another. It gives the same
+        result before the move is made or after(until the captures are removed), for slides and jumps: the square moved
+        from never counts as an attacker, though before a jump it may end a run next to the to square. A run of
+        defending pieces next to the to square along its rank or file is captured when the square past it holds one of
+        the player's pieces, corners use the corner table(the square moved from is never the partner square).
+        """
+        defender_color = "RED" if player_color == "BLACK" else "BLACK"
+        tables = self._tables
+        row, col = tables.squares[to_index]
+        from_row, from_col = tables.squares[from_index]
+        line_runs = tables.line_runs
+        captured = 0
+        low_run, low_stop, high_run, high_stop = line_runs[col][self._ranks[defender_color][row]]
+        if low_run or high_run:
+            attackers = self._ranks[player_color][row] & ~(1 << from_col if from_row == row else 0)
+            line = (low_run if attackers & low_stop else 0) | (high_run if attackers & high_stop else 0)
+            if line:
+                captured = line << (row * self._size)
+        low_run, low_stop, high_run, high_stop = line_runs[row][self._files[defender_color][col]]
+        if low_run or high_run:
+            attackers = self._files[player_color][col] & ~(1 << from_row if from_col == col else 0)
+            line = (low_run if attackers & low_stop else 0) | (high_run if attackers & high_stop else 0)
+            if line:
+                captured |= tables.file_bits[line] << col
+        if to_index in tables.corner_captures:
+            corner_bit, partner_bit = tables.corner_captures[to_index]
+            if self._pieces[player_color] & partner_bit and self._pieces[defender_color] & corner_bit:
+                captured |= corner_bit
+        return captured
+
+    def __eq__(self, other):
+        return isinstance(other, Position) and self._pieces == other._pieces and self._size == other._size
+
+    def __hash__(self):
+        return hash((self._pieces["BLACK"], self._pieces["RED"]))
+
+    def __str__(self):
+        rows = []
+        for row in range(self._size):
+            rows.append(" ".join(self.get_square_state(row, col) for col in range(self._size)))
+        return "\n".join(rows)
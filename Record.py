@@ -0,0 +1,242 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Compact binary game records. An archive file starts with the magic bytes and format version, followed by one record
+# per game: a 6 byte header (variant, win condition, result, repetition limit(0 for none), number of moves) and one
+# byte per move. Version 1 archives, whose headers have no repetition limit, can still be read. Only games of the
+# standard variant from its start position can be recorded.
+#
+# A move byte is relative to the position before the move. The high nibble is the ordinal of the moving piece among
+# the mover's pieces(lowest square index first, at most 9 pieces). The low nibble is the destination: 0-7 for the other
+# rows of the same column, 8-15 for the other columns of the same row.
+
+import mmap
+import struct
+from Game import HasamiShogiGame
+from Position import BOARD_SIZE, SQUARES, popcount, square_index
+from Variant import STANDARD
+
+MAGIC = b"HSGR"
+VERSION = 2
+FILE_HEADER = struct.Struct("<4sB")
+RECORD_HEADER = struct.Struct("<BBBBH")
+RECORD_HEADERS = {1: struct.Struct("<BBBH"), VERSION: RECORD_HEADER}  # Header of a record by archive version
+VARIANT = 1
+WIN_CONDITION = 8
+RESULTS = ("UNFINISHED", "BLACK_WON", "RED_WON", "DRAW")
+
+
+def encode_move(mover_pieces, from_index, to_index):
+    """Returns the move byte, given the bitboard of the mover's pieces before the move."""
+    ordinal = popcount(mover_pieces & ((1 << from_index) - 1))
+    from_row, from_col = SQUARES[from_index]
+    to_row, to_col = SQUARES[to_index]
+    if to_col == from_col:
+        target = to_row - (to_row > from_row)
+    else:
+        target = BOARD_SIZE - 1 + to_col - (to_col > from_col)
+    return ordinal << 4 | target
+
+
+def decode_move(mover_pieces, move_byte):
+    """Returns the move (from_row, from_col, to_row, to_col) of a move byte, given the mover's pieces bitboard."""
+    ordinal, target = move_byte >> 4, move_byte & 15
+    for _ in range(ordinal):
+        mover_pieces &= mover_pieces - 1
+    from_row, from_col = SQUARES[(mover_pieces & -mover_pieces).bit_length() - 1]
+    if target < BOARD_SIZE - 1:
+        return from_row, from_col, target + (target >= from_row), from_col
+    target -= BOARD_SIZE - 1
+    return from_row, from_col, from_row, target + (target >= from_col)
+
+
+def check_recordable(game):
+    """Raises ValueError if the game can't be recorded: it is of another variant, or set up from another position."""
+    if game.get_variant() is not STANDARD:
+        raise ValueError("Only standard games can be recorded, not %s" % game.get_variant())
+    if game.get_start() != STANDARD.get_start() + ("BLACK",):
+        raise ValueError("Only games from the start position can be recorded")
+
+
+def _pack_header(game, num_moves):
+    """Returns the record header of the game with num_moves moves."""
+    return RECORD_HEADER.pack(VARIANT, WIN_CONDITION, RESULTS.index(game.get_game_state()),
+                              game.get_repetition_limit() or 0, num_moves)
+
+
+def encode_game(game):
+    """
+    Returns the record bytes of a game, header and moves, by replaying its move history. Raises ValueError if the
+    game can't be recorded, see check_recordable().
+    """
+    check_recordable(game)
+    replay = HasamiShogiGame()
+    moves = bytearray()
+    for from_row, from_col, to_row, to_col in game.get_move_history():
+        pieces = replay.get_position().get_pieces(replay.get_active_player())
+        moves.append(encode_move(pieces, square_index(from_row, from_col), square_index(to_row, to_col)))
+        replay.make_move(from_row, from_col, to_row, to_col)
+    return _pack_header(game, len(moves)) + moves
+
+
+class GameRecordWriter:
+    """
+    Writes game records to a binary archive file. Either write finished games with write_game(), or stream a game as
+    it is played: begin_game() hooks the writer into the game's make_move, end_game() writes the record.
+    """
+    def __init__(self, path, append=False):
+        """
+        Opens the archive file, writing the file header unless appending to an existing archive. Raises ValueError
+        when appending to an archive of another version.
+        """
+        self._file = open(path, "ab" if append else "wb")
+        if self._file.tell() == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        else:
+            with open(path, "rb") as archive:
+                version = _check_file_header(archive.read(FILE_HEADER.size))
+            if version != VERSION:
+                self._file.close()
+                raise ValueError("Can't append to a version %d archive" % version)
+        self._game = None
+        self._moves = bytearray()
+        self._num_records = 0
+
+    def begin_game(self, game):
+        """
+        Starts recording the moves made in the game, after the moves it already has. A game being recorded is ended
+        and written first. Raises ValueError if the game can't be recorded.
+        """
+        check_recordable(game)
+        self.end_game()
+        self._game = game
+        self._moves = bytearray(encode_game(game)[RECORD_HEADER.size:])
+        game.add_move_listener(self._on_move)
+
+    def _on_move(self, game, move):
+        """
+        Move listener, appends the move byte, or drops the last one when a move is taken back. Raises ValueError for a
+        takeback with no move recorded, which would leave the record out of step with the game.
+        """
+        if move is None:
+            if not self._moves:
+                raise ValueError("A move was taken back before the start of the record")
+            del self._moves[-1]
+            return
+        from_row, from_col, to_row, to_col = move
+        from_bit, to_bit = 1 << square_index(from_row, from_col), 1 << square_index(to_row, to_col)
+        mover = game.get_position().get_square_occupant(to_row, to_col)
+        pieces = game.get_position().get_pieces(mover) ^ to_bit | from_bit  # Mover's pieces before the move
+        self._moves.append(encode_move(pieces, from_bit.bit_length() - 1, to_bit.bit_length() - 1))
+
+    def end_game(self):
+        """Stops recording the current game and writes its record."""
+        if self._game is None:
+            return
+        self._game.remove_move_listener(self._on_move)
+        self.write_record(_pack_header(self._game, len(self._moves)) + self._moves)
+        self._game = None
+
+    def write_game(self, game):
+        """Writes the record of a game from its move history."""
+        self.write_record(encode_game(game))
+
+    def write_record(self, record):
+        """Writes encoded record bytes, e.g. from encode_game() in another process."""
+        self._file.write(record)
+        self._num_records += 1
+
+    def get_num_records(self):
+        """Returns the number of records written by this writer."""
+        return self._num_records
+
+    def close(self):
+        """Writes any game being recorded and closes the file."""
+        self.end_game()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class GameRecord:
+    """A game read from an archive. The header is decoded eagerly, the moves only when iterated or replayed."""
+    def __init__(self, variant, win_condition, result, move_bytes, repetition_limit=0):
+        """Creates a record from its header fields and move bytes, a repetition limit of 0 is none."""
+        self.variant = variant
+        self.win_condition = win_condition
+        self.result = RESULTS[result]
+        self.repetition_limit = repetition_limit or None
+        self._move_bytes = move_bytes
+
+    def get_num_moves(self):
+        """Returns the number of moves in the game."""
+        return len(self._move_bytes)
+
+    def moves(self):
+        """Yields the moves of the game as (from_row, from_col, to_row, to_col), replaying it to decode them."""
+        game = HasamiShogiGame(self.repetition_limit)
+        for move_byte in self._move_bytes:
+            move = decode_move(game.get_position().get_pieces(game.get_active_player()), move_byte)
+            game.make_move(*move)
+            yield move
+
+    def replay(self):
+        """Returns a HasamiShogiGame with all moves of the record made, and the repetition limit it was played with."""
+        game = HasamiShogiGame(self.repetition_limit)
+        for move_byte in self._move_bytes:
+            game.make_move(*decode_move(game.get_position().get_pieces(game.get_active_player()), move_byte))
+        return game
+
+
+def _check_file_header(header):
+    """Returns the archive version, raises ValueError if the bytes are not the header of a supported archive."""
+    if len(header) < FILE_HEADER.size:
+        raise ValueError("Not a Hasami Shogi game archive: file too short")
+    magic, version = FILE_HEADER.unpack(header[:FILE_HEADER.size])
+    if magic != MAGIC or version not in RECORD_HEADERS:
+        raise ValueError("Not a Hasami Shogi game archive, or unsupported version %d" % version)
+    return version
+
+
+def _unpack_record(record_header, header, offset=0):
+    """Returns (variant, win condition, result, repetition limit, number of moves) from a record header."""
+    fields = record_header.unpack_from(header, offset)
+    if record_header is RECORD_HEADER:
+        return fields
+    variant, win_condition, result, num_moves = fields
+    return variant, win_condition, result, 0, num_moves
+
+
+def read_records(path, use_mmap=True):
+    """
+    Generator yielding the GameRecord of each game in an archive file. The file is memory-mapped(or read sequentially
+    if use_mmap is False), so archives larger than memory can be scanned.
+    """
+    with open(path, "rb") as archive:
+        if not use_mmap:
+            record_header = RECORD_HEADERS[_check_file_header(archive.read(FILE_HEADER.size))]
+            while True:
+                header = archive.read(record_header.size)
+                if len(header) < record_header.size:
+                    return
+                variant, win_condition, result, limit, num_moves = _unpack_record(record_header, header)
+                yield GameRecord(variant, win_condition, result, archive.read(num_moves), limit)
+        with mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ) as archive_map:
+            record_header = RECORD_HEADERS[_check_file_header(archive_map[:FILE_HEADER.size])]
+            offset, end = FILE_HEADER.size, len(archive_map)
+            while offset + record_header.size <= end:
+                variant, win_condition, result, limit, num_moves = _unpack_record(record_header, archive_map, offset)
+                offset += record_header.size
+                yield GameRecord(variant, win_condition, result, archive_map[offset:offset + num_moves], limit)
+                offset += num_moves
@@ -0,0 +1,350 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Asyncio game server hosting many games at once. Usage: python Server.py --port 8765
+#
+# The protocol is one JSON object per line over TCP. Requests carry an "op" and an optional "id", which is echoed in
+# the reply so clients can match replies to requests:
+#   {"op": "create", "color": "BLACK"}         Creates a game and plays the color(BLACK, RED or BOTH). -> created
+#                                              An optional "variant" names the rules(Variant.py), standard by default.
+#   {"op": "join", "game": 7}                  Joins a game as the color nobody plays yet. -> joined
+#   {"op": "move", "game": 7, "move": [8, 0, 1, 0]}
+#                                              Makes a move. Every client of the game is sent a delta.
+#   {"op": "state", "game": 7}                 -> state, the full game including its move history.
+#   {"op": "rematch", "game": 7}               Restarts a finished game. Every client of the game is sent a reset.
+#                                              A rematch of a game just restarted is also replied a reset. -> reset
+#   {"op": "leave", "game": 7}                 Leaves a game. A game is dropped once no client plays it.
+# A delta is the only message sent after each move, rather than the whole board:
+#   {"op": "delta", "game": 7, "ply": 1, "player": "BLACK", "move": [8, 0, 1, 0], "captured": [[0, 0]],
+#    "state": "UNFINISHED", "turn": "RED"}
+# Errors are replied as {"op": "error", "error": "..."}.
+#
+# With --checkpoint FILE the games are saved to the file every --checkpoint-interval seconds and when the server stops,
+# and loaded from it when the server starts, so they can be joined again after a restart. A checkpoint is the magic
+# bytes and the next game id, then each game's id, snapshot length and snapshot(HasamiShogiGame.snapshot()).
+
+import argparse
+import asyncio
+import json
+import os
+import struct
+import sys
+from Game import MAX_REPETITION_LIMIT, HasamiShogiGame
+from Position import iter_squares
+from Variant import STANDARD, get_variant
+
+COLORS = ("BLACK", "RED")
+DEFAULT_PORT = 8765
+CHECKPOINT_MAGIC = b"HSCP"
+CHECKPOINT_HEADER = struct.Struct("<4sI")
+SESSION_HEADER = struct.Struct("<IH")
+MAX_CLIENT_BUFFER = 1 << 20  # Bytes waiting to be sent to a client before it is dropped as too slow
+
+
+class _RequestError(Exception):
+    """Raised while handling a request which can't be carried out, the message is sent back to the client."""
+
+
+class GameSession:
+    """A game hosted by the server, with the connected clients playing or watching it."""
+    def __init__(self, game_id, repetition_limit=None, variant=STANDARD, game=None):
+        """Creates a session with the game, e.g. one restored from a checkpoint, or else a new game of the variant."""
+        self.game_id = game_id
+        self.game = HasamiShogiGame(repetition_limit, variant) if game is None else game
+        self._repetition_limit = repetition_limit
+        self.clients = dict()  # Client -> set of the colors it plays
+
+    def get_free_colors(self):
+        """Returns the colors no client plays yet."""
+        taken = set()
+        for colors in self.clients.values():
+            taken |= colors
+        return [color for color in COLORS if color not in taken]
+
+    def restart(self):
+        """Starts a new game in the session, resetting the game in place."""
+        self.game.reset()
+
+    def get_state(self):
+        """Returns the full state of the session as a message dictionary."""
+        game, position = self.game, self.game.get_position()
+        size = position.get_size()
+        board = "".join(position.get_square_state(row, col) for row in range(size) for col in range(size))
+        return dict(op="state", game=self.game_id, variant=game.get_variant().name, board=board,
+                    moves=game.get_move_history(), state=game.get_game_state(), turn=game.get_active_player(),
+                    captured=dict(BLACK=game.get_num_captured_pieces("BLACK"),
+                                  RED=game.get_num_captured_pieces("RED")))
+
+
+class GameServer:
+    """
+    Hosts games for clients connected over TCP. Each game is validated by HasamiShogiGame.make_move, and every client
+    of the game is sent only what a move changed. All sessions live in memory in one event loop.
+    """
+    def __init__(self, max_sessions=10000, repetition_limit=3):
+        """Creates a server holding at most max_sessions games."""
+        self._max_sessions = max_sessions
+        self._repetition_limit = repetition_limit
+        self._sessions = dict()
+        self._next_game_id = 1
+        self._server = None
+        self._num_moves = 0
+
+    async def start(self, host="127.0.0.1", port=DEFAULT_PORT):
+        """Starts listening, returns the port, which is picked by the system if port is 0."""
+        self._server = await asyncio.start_server(self._handle_client, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        """Serves clients until cancelled."""
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self):
+        """Stops listening and closes the server."""
+        self._server.close()
+        await self._server.wait_closed()
+
+    def get_stats(self):
+        """Returns a dictionary of the number of games, connected clients and moves made."""
+        clients = set()
+        for session in self._sessions.values():
+            clients.update(session.clients)
+        return dict(sessions=len(self._sessions), clients=len(clients), moves=self._num_moves)
+
+    def save_checkpoint(self, path):
+        """
+        Writes a snapshot of every game to the checkpoint file, replacing it only once fully written. Returns the
+        number of games saved.
+        """
+        data = bytearray(CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, self._next_game_id))
+        for game_id, session in self._sessions.items():
+            snapshot = session.game.snapshot()
+            data += SESSION_HEADER.pack(game_id, len(snapshot)) + snapshot
+        with open(path + ".tmp", "wb") as checkpoint_file:
+            checkpoint_file.write(data)
+        os.replace(path + ".tmp", path)
+        return len(self._sessions)
+
+    def load_checkpoint(self, path):
+        """
+        Adds the games of a checkpoint file, with no clients until they are joined. Returns the number of games loaded,
+        raises ValueError if the file is not a valid checkpoint.
+        """
+        with open(path, "rb") as checkpoint_file:
+            data = checkpoint_file.read()
+        if len(data) < CHECKPOINT_HEADER.size or data[:4] != CHECKPOINT_MAGIC:
+            raise ValueError("Not a Hasami Shogi server checkpoint: %s" % path)
+        self._next_game_id = max(self._next_game_id, CHECKPOINT_HEADER.unpack_from(data)[1])
+        offset, num_loaded = CHECKPOINT_HEADER.size, 0
+        while offset < len(data):
+            if offset + SESSION_HEADER.size > len(data):
+                raise ValueError("Truncated checkpoint: %s" % path)
+            game_id, length = SESSION_HEADER.unpack_from(data, offset)
+            offset += SESSION_HEADER.size
+            game = HasamiShogiGame.from_snapshot(data[offset:offset + length])
+            offset += length
+            session = GameSession(game_id, game.get_repetition_limit(), game.get_variant(), game)
+            self._sessions[game_id] = session
+            self._next_game_id = max(self._next_game_id, game_id + 1)
+            num_loaded += 1
+        return num_loaded
+
+    async def _handle_client(self, reader, writer):
+        """Reads and handles the requests of one client until it disconnects."""
+        joined = dict()  # Game id -> session, for the games the client is in
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                request = None
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise _RequestError("request must be a JSON object")
+                    reply = self._handle_request(writer, joined, request)
+                except (ValueError, _RequestError) as error:
+                    reply = dict(op="error", error=str(error))
+                    if isinstance(request, dict) and "id" in request:
+                        reply["id"] = request["id"]
+                if reply is not None:
+                    _send(writer, reply)
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            for session in joined.values():
+                self._leave(writer, session)
+            writer.close()
+
+    def _handle_request(self, client, joined, request):
+        """Carries out a request, returns the reply to send to the client, or None if already sent."""
+        op = request.get("op")
+        if op == "create":
+            color = request.get("color", "BLACK")
+            if color not in COLORS + ("BOTH",):
+                raise _RequestError("unknown color %r" % (color,))
+            try:
+                variant_name = request.get("variant", STANDARD.name)
+                if not isinstance(variant_name, str):
+                    raise ValueError("variant must be a name")
+                variant = get_variant(variant_name)
+            except ValueError as error:
+                raise _RequestError(str(error))
+            if len(self._sessions) >= self._max_sessions:
+                raise _RequestError("server full")
+            session = GameSession(self._next_game_id, self._repetition_limit, variant)
+            self._sessions[session.game_id] = session
+            self._next_game_id += 1
+            session.clients[client] = set(COLORS) if color == "BOTH" else {color}
+            joined[session.game_id] = session
+            return _reply(request, op="created", game=session.game_id, variant=variant.name,
+                          colors=sorted(session.clients[client]))
+
+        session = self._get_session(request)
+        if op == "join":
+            free = session.get_free_colors()
+            colors = {free[0]} if free else set()  # Watches the game if both colors are taken
+            session.clients.setdefault(client, set()).update(colors)
+            joined[session.game_id] = session
+            state = session.get_state()
+            state.update(op="joined", colors=sorted(session.clients[client]))
+            return _reply(request, **state)
+        if op == "state":
+            return _reply(request, **session.get_state())
+        if client not in session.clients:
+            raise _RequestError("not in game %d" % session.game_id)
+        if op == "move":
+            self._move(client, session, request)
+            return None
+        if op == "rematch":
+            if not session.clients[client]:
+                raise _RequestError("watchers can't ask for a rematch")
+            reset = dict(op="reset", game=session.game_id)
+            if session.game.get_game_state() != "UNFINISHED":
+                session.restart()
+                for other in session.clients:
+                    _send(other, _reply(request, **reset) if other is client else reset)
+                return None
+            if session.game.get_move_history():
+                raise _RequestError("game %d is not finished" % session.game_id)
+            return _reply(request, **reset)  # Both players asking for a rematch restart once
+        if op == "leave":
+            self._leave(client, session)
+            del joined[session.game_id]
+            return _reply(request, op="left", game=session.game_id)
+        raise _RequestError("unknown op %r" % (op,))
+
+    def _get_session(self, request):
+        """Returns the session of the game the request is for."""
+        game_id = request.get("game")
+        if not isinstance(game_id, int):
+            raise _RequestError("game must be a game id")
+        session = self._sessions.get(game_id)
+        if session is None:
+            raise _RequestError("no game %r" % (request.get("game"),))
+        return session
+
+    def _move(self, client, session, request):
+        """Makes a move in the session's game and sends the delta to every client of the game."""
+        game = session.game
+        move, size = request.get("move"), game.get_position().get_size()
+        if not (isinstance(move, list) and len(move) == 4 and
+                all(type(value) is int and 0 <= value < size for value in move)):
+            raise _RequestError("move must be [from_row, from_col, to_row, to_col]")
+        player = game.get_active_player()
+        if player not in session.clients[client]:
+            raise _RequestError("not your turn")
+        defender = "RED" if player == "BLACK" else "BLACK"
+        defender_pieces = game.get_position().get_pieces(defender)
+        if not game.make_move(*move):
+            raise _RequestError("illegal move")
+        self._num_moves += 1
+        captured = defender_pieces & ~game.get_position().get_pieces(defender)
+        delta = dict(op="delta", game=session.game_id, ply=len(game.get_move_history()), player=player, move=move,
+                     captured=[list(square) for square in iter_squares(captured, size)], state=game.get_game_state(),
+                     turn=game.get_active_player())
+        for other in session.clients:
+            _send(other, _reply(request, **delta) if other is client else delta)
+
+    def _leave(self, client, session):
+        """Removes the client from the session, and drops the session once it has no clients."""
+        session.clients.pop(client, None)
+        if not session.clients:
+            self._sessions.pop(session.game_id, None)
+
+
+def _reply(request, **message):
+    """Returns the reply message, with the request's id if it has one."""
+    if "id" in request:
+        message["id"] = request["id"]
+    return message
+
+
+def _send(writer, message):
+    """
+    Queues a message to a client, the event loop sends it without blocking the other clients. A client which lets
+    more than MAX_CLIENT_BUFFER bytes pile up(it reads slower than its games send) is disconnected, and leaves its
+    games when its handler sees the connection closed.
+    """
+    if writer.is_closing():
+        return
+    if writer.transport.get_write_buffer_size() > MAX_CLIENT_BUFFER:
+        writer.transport.abort()  # close() would wait to send the buffer first
+        return
+    writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+
+
+def main(argv=None):
+    """Runs the server from the command line."""
+    parser = argparse.ArgumentParser(description="Hasami Shogi game server.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port to listen on")
+    parser.add_argument("--max-sessions", type=int, default=10000, help="games hosted at most at once")
+    parser.add_argument("--repetitions", type=int, default=3, help="repetitions of a position for a draw")
+    parser.add_argument("--checkpoint", metavar="FILE", help="file the games are saved to and loaded from")
+    parser.add_argument("--checkpoint-interval", type=float, default=60.0, help="seconds between checkpoints")
+    args = parser.parse_args(argv)
+    if not 0 <= args.repetitions <= MAX_REPETITION_LIMIT:
+        parser.error("--repetitions must be from 0 to %d" % MAX_REPETITION_LIMIT)
+
+    async def save_checkpoints(server):
+        while True:
+            await asyncio.sleep(args.checkpoint_interval)
+            try:
+                server.save_checkpoint(args.checkpoint)
+            except Exception as error:  # Keeps serving, and checkpointing at the next interval
+                print("Checkpoint to %s failed: %r" % (args.checkpoint, error), file=sys.stderr)
+
+    async def serve():
+        server = GameServer(args.max_sessions, args.repetitions)
+        if args.checkpoint and os.path.exists(args.checkpoint):
+            print("Loaded %d games from %s" % (server.load_checkpoint(args.checkpoint), args.checkpoint))
+        port = await server.start(args.host, args.port)
+        print("Serving Hasami Shogi on %s:%d" % (args.host, port))
+        if not args.checkpoint:
+            await server.serve_forever()
+            return
+        saver = asyncio.create_task(save_checkpoints(server))
+        try:
+            await server.serve_forever()
+        finally:
+            saver.cancel()
+            print("Saved %d games to %s" % (server.save_checkpoint(args.checkpoint), args.checkpoint))
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
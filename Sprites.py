@@ -9,20 +9,27 @@
 #               assumed to be all or all but one piece captured.
 
 import pygame
+from Assets import get_image
 
+# Board layout in pixels: square size, border around the board and gap between squares.
+SQUARE_WIDTH = 72
+SQUARE_HEIGHT = 90
+BORDER = 50
+GAP_SIZE = 2
 
-class Sprites(pygame.sprite.Sprite):
-    """Represents the sprites for each square."""
+
+class Sprites(pygame.sprite.DirtySprite):
+    """Represents the sprites for each square. The sprite is marked dirty when its state changes, to be redrawn."""
     def __init__(self, row, col, square_state):
         """Initialize sprite to represent each square on the board."""
-        pygame.sprite.Sprite.__init__(self)
+        pygame.sprite.DirtySprite.__init__(self)
         self._row = row
         self._col = col
         self._square_state = square_state
-        self._black_img = pygame.image.load('images/Black.png')
-        self._red_img = pygame.image.load('images/Red.png')
-        self._blank_img = pygame.image.load('images/Blank.png')
-        self._green_img = pygame.image.load('images/Green.png')
+        self._black_img = get_image('Black.png')
+        self._red_img = get_image('Red.png')
+        self._blank_img = get_image('Blank.png')
+        self._green_img = get_image('Green.png')
 
         if square_state == "B":
             self.image = self._black_img
@@ -31,9 +38,7 @@ class Sprites(pygame.sprite.Sprite):
         else:
             self.image = self._blank_img
 
-        self._size = self.image.get_rect().size
-        self.rect = pygame.Rect(col * self._size[0] + 50 + 2 * (col + 1), row * self._size[1] + 50 + 2 * (row + 1),
-                                self._size[0], self._size[1])
+        self.rect = pygame.Rect(get_square_rect(row, col))
 
     def get_state(self):
         """Gets the state of the Square Sprite."""
@@ -41,6 +46,7 @@ class Sprites(pygame.sprite.Sprite):
 
     def set_state(self, new_state=None):
         """Sets the state of the Square Sprite"""
+        previous_image = self.image
         if new_state is None:
             self._square_state = "."
             self.image = self._blank_img
@@ -53,3 +59,11 @@ class Sprites(pygame.sprite.Sprite):
         elif new_state == "GREEN":
             self._square_state = "G"
             self.image = self._green_img
+        if self.image is not previous_image:
+            self.dirty = 1
+
+
+def get_square_rect(row, col):
+    """Returns the (x, y, width, height) of a square's sprite in pixels."""
+    return (col * (SQUARE_WIDTH + GAP_SIZE) + BORDER + GAP_SIZE, row * (SQUARE_HEIGHT + GAP_SIZE) + BORDER + GAP_SIZE,
+            SQUARE_WIDTH, SQUARE_HEIGHT)
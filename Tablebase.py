@@ -0,0 +1,349 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Endgame tablebase. Every position with few pieces left is solved by retrograde analysis: starting from the wins by
+# capture, results are propagated backwards one ply at a time, so each position gets its exact number of plies to the
+# end of the game with best play. The won and lost positions are written to a memory-mapped index(Lookup.py), keyed by
+# the pieces of the player to move and of the opponent, reduced by the eight symmetries of the board. Positions in the
+# tablebase which are not in the index are draws. Colors don't matter in an endgame, so one entry serves both.
+# Usage: python Tablebase.py --pieces 4 --output tablebase.idx     (all 2 against 2 endgames, a few minutes)
+
+import argparse
+import itertools
+import os
+import sys
+import time
+from array import array
+from Lookup import LookupResult, MappedIndex, write_index
+from Position import capture_mask, move_mask, popcount
+from Variant import STANDARD, get_variant
+
+MAGIC = b"HSTB"
+DEFAULT_PATH = "tablebase.idx"
+MAX_PIECES = 7  # Pieces packed into a 64 bit key
+MAX_PLIES = 255  # Longest result stored, an odd number of plies is a win and an even one a loss
+
+
+def get_loss_pieces(variant):
+    """Returns the number of pieces a player has left when the game is lost, 1 in the standard game."""
+    return variant.num_pieces - variant.win_captures
+
+
+def check_variant(variant):
+    """Raises ValueError for a variant the tablebase can't solve: one won other than by captures, or with jumps."""
+    if variant.jumps or variant.line_length or not variant.win_captures:
+        raise ValueError("The tablebase needs a variant won only by captures and without jumps, not %s" % variant)
+
+
+def _squares_of(bitboard):
+    """Returns the square indexes of the set bits of a bitboard, lowest first."""
+    squares = []
+    while bitboard:
+        low_bit = bitboard & -bitboard
+        squares.append(low_bit.bit_length() - 1)
+        bitboard ^= low_bit
+    return squares
+
+
+def canonical_key(tables, mover, opponent):
+    """
+    Returns (key, symmetry) for the pieces of the player to move and of the opponent: the smallest key over the eight
+    symmetries of the board, and the symmetry which gives it. A key packs the piece counts and the sorted squares of
+    each side, one byte each.
+    """
+    mover_squares, opponent_squares = _squares_of(mover), _squares_of(opponent)
+    counts = len(mover_squares) << 4 | len(opponent_squares)
+    best_key, best_symmetry = None, 0
+    for symmetry, mapping in enumerate(tables.symmetries):
+        key = counts
+        for square in sorted([mapping[square] for square in mover_squares]):
+            key = key << 8 | square
+        for square in sorted([mapping[square] for square in opponent_squares]):
+            key = key << 8 | square
+        if best_key is None or key < best_key:
+            best_key, best_symmetry = key, symmetry
+    return best_key, best_symmetry
+
+
+class TablebaseBuilder:
+    """
+    Solves every endgame of a variant up to a total number of pieces by retrograde analysis. Each table holds the
+    positions with a given number of pieces for the player to move and for the opponent, one byte per position: 0 for
+    a draw, else the plies to the end of the game, odd for a win of the player to move and even for a loss. Tables
+    are indexed densely by the rank of each side's set of squares, without symmetry, and reduced only when written.
+    """
+    def __init__(self, variant=STANDARD, max_pieces=4):
+        """Creates a builder for the endgames of the variant with at most max_pieces pieces on the board."""
+        check_variant(variant)
+        if max_pieces > MAX_PIECES:
+            raise ValueError("At most %d pieces fit a tablebase key" % MAX_PIECES)
+        self._variant = variant
+        self._tables = variant.get_tables()
+        self._loss_pieces = get_loss_pieces(variant)
+        self._max_pieces = max_pieces
+        self._neighbors = [0] * self._tables.num_squares  # Squares next to each square, where captures can start
+        for index, rays in enumerate(self._tables.rays):
+            for direction, ray in enumerate(rays):
+                if ray:
+                    self._neighbors[index] |= (ray & -ray) if direction >= 2 else 1 << (ray.bit_length() - 1)
+        self._combos, self._ranks = dict(), dict()
+        self._results, self._counters, self._capture_losses = dict(), dict(), dict()
+        self._move_from, self._move_to = dict(), dict()
+
+    def get_table_keys(self):
+        """Returns the (mover pieces, opponent pieces) of each table solved, smallest tables first."""
+        low = self._loss_pieces + 1
+        return [(mover, total - mover) for total in range(2 * low, self._max_pieces + 1)
+                for mover in range(low, total - low + 1)]
+
+    def build(self, report=None):
+        """
+        Solves all tables, those with fewer pieces first since captures lead into them. report, if given, is called
+        with a line of progress text.
+        """
+        low = self._loss_pieces + 1
+        for total in range(2 * low, self._max_pieces + 1):
+            start = time.perf_counter()
+            group = [(mover, total - mover) for mover in range(low, total - low + 1)]
+            self._solve_group(group)
+            if report is not None:
+                for table in group:
+                    results = self._results[table]
+                    decisive = len(results) - results.count(0)
+                    report("%dv%d: %d positions, %d won or lost, longest %d plies, %.1fs" % (
+                        table[0], table[1], len(results), decisive, max(results), time.perf_counter() - start))
+
+    def write(self, path):
+        """Writes the won and lost positions to an index file, one entry per position up to symmetry."""
+        tables, entries = self._tables, dict()
+        for table in self.get_table_keys():
+            mover_combos, opponent_combos = self._get_combos(table[0]), self._get_combos(table[1])
+            num_opponent = len(opponent_combos)
+            results, move_from, move_to = self._results[table], self._move_from[table], self._move_to[table]
+            for index, plies in enumerate(results):
+                if not plies:
+                    continue
+                mover_rank, opponent_rank = divmod(index, num_opponent)
+                key, symmetry = canonical_key(tables, mover_combos[mover_rank], opponent_combos[opponent_rank])
+                if key not in entries:
+                    mapping = tables.symmetries[symmetry]
+                    entries[key] = plies | mapping[move_from[index]] << 8 | mapping[move_to[index]] << 16
+        write_index(path, MAGIC, tables.size, self._loss_pieces, entries, extra=self._max_pieces)
+        return len(entries)
+
+    def _get_combos(self, count):
+        """Returns the bitboards of all sets of count squares in rank order, and fills the rank dictionary."""
+        if count not in self._combos:
+            combos = [sum(1 << square for square in squares)
+                      for squares in itertools.combinations(range(self._tables.num_squares), count)]
+            self._combos[count] = combos
+            self._ranks[count] = dict((bitboard, rank) for rank, bitboard in enumerate(combos))
+        return self._combos[count]
+
+    def _solve_group(self, group):
+        """Solves the tables with the same total number of pieces together, quiet moves lead from one to another."""
+        buckets = [array("Q") for _ in range(MAX_PLIES + 1)]  # Positions to finish at each ply, index * 8 + table
+        for table_number, table in enumerate(group):
+            self._initialize(table, table_number, buckets)
+        for ply in range(1, MAX_PLIES + 1):
+            for entry in buckets[ply]:
+                self._finish(group, entry & 7, entry >> 3, ply, buckets)
+            buckets[ply] = None
+
+    def _initialize(self, table, table_number, buckets):
+        """
+        Sets up a table: counts each position's quiet moves, and looks up the captures, which either win at once or
+        lead into a smaller table solved earlier. Positions winning by a capture, or losing whatever they do, are put
+        in the bucket of their ply.
+        """
+        tables, loss_pieces = self._tables, self._loss_pieces
+        num_mover, num_opponent = table
+        mover_combos, opponent_combos = self._get_combos(num_mover), self._get_combos(num_opponent)
+        size = len(mover_combos) * len(opponent_combos)
+        counters, capture_losses = bytearray(size), bytearray(size)
+        move_from, move_to = bytearray(size), bytearray(size)
+        self._results[table] = bytearray(size)
+        self._counters[table], self._capture_losses[table] = counters, capture_losses
+        self._move_from[table], self._move_to[table] = move_from, move_to
+        neighbors, index = self._neighbors, -1
+        for mover in mover_combos:
+            mover_squares = _squares_of(mover)
+            for opponent in opponent_combos:
+                index += 1
+                if mover & opponent:
+                    continue
+                occupied, near = mover | opponent, 0
+                for square in _squares_of(opponent):
+                    near |= neighbors[square]
+                quiet, best_win, worst_loss, escape = 0, 0, 0, False
+                for from_square in mover_squares:
+                    targets = move_mask(tables, from_square, occupied)
+                    captures = targets & near
+                    quiet += popcount(targets ^ captures)
+                    while captures:
+                        to_bit = captures & -captures
+                        captures ^= to_bit
+                        attackers = mover ^ (1 << from_square) | to_bit
+                        captured = capture_mask(tables, attackers, opponent, to_bit.bit_length() - 1)
+                        if not captured:
+                            quiet += 1
+                            continue
+                        left = num_opponent - popcount(captured)
+                        if left <= loss_pieces:
+                            plies = 1
+                        else:  # The opponent moves next in the smaller table
+                            child = self._ranks[left][opponent ^ captured] * len(self._combos[num_mover]) + \
+                                    self._ranks[num_mover][attackers]
+                            plies = self._results[(left, num_mover)][child]
+                            if not plies:
+                                escape = True
+                                continue
+                            plies = _next_ply(plies)
+                        if plies % 2 and (not best_win or plies < best_win):
+                            best_win = plies
+                            move_from[index], move_to[index] = from_square, to_bit.bit_length() - 1
+                        elif not plies % 2 and plies > worst_loss and not best_win:
+                            worst_loss = plies
+                            move_from[index], move_to[index] = from_square, to_bit.bit_length() - 1
+                if best_win:
+                    counters[index] = 255  # Never lost, and won in best_win plies unless a quiet move wins sooner
+                    self._results[table][index] = best_win
+                    buckets[best_win].append(index << 3 | table_number)
+                elif escape or not (quiet or worst_loss):
+                    counters[index] = 255  # A capture into a drawn endgame, or no move at all: never lost
+                elif not quiet:
+                    self._results[table][index] = worst_loss
+                    buckets[worst_loss].append(index << 3 | table_number)
+                else:
+                    counters[index], capture_losses[index] = quiet, worst_loss
+
+    def _finish(self, group, table_number, index, ply, buckets):
+        """
+        Finishes a position whose result is known at this ply, and updates the positions one quiet move before it:
+        after a loss they win at the next ply, after a win they lose once every quiet move has been shown to lose.
+        """
+        tables = self._tables
+        table = group[table_number]
+        if self._results[table][index] != ply:
+            return  # Won sooner through another move
+        num_mover, num_opponent = table
+        mover_combos, opponent_combos = self._combos[num_mover], self._combos[num_opponent]
+        mover_rank, opponent_rank = divmod(index, len(opponent_combos))
+        mover, opponent = mover_combos[mover_rank], opponent_combos[opponent_rank]
+        occupied = mover | opponent
+        # The opponent made the last move, so the positions before it are in the table with the sides swapped.
+        previous = (num_opponent, num_mover)
+        previous_number = group.index(previous)
+        previous_results, counters = self._results[previous], self._counters[previous]
+        move_from, move_to = self._move_from[previous], self._move_to[previous]
+        opponent_ranks, num_previous_opponent = self._ranks[num_opponent], len(mover_combos)
+        for to_square in _squares_of(opponent):
+            if mover & self._neighbors[to_square] and capture_mask(tables, opponent, mover, to_square):
+                continue  # Arriving here captures, so the move came from a smaller table
+            sources = move_mask(tables, to_square, occupied)
+            others = opponent ^ (1 << to_square)
+            while sources:
+                from_bit = sources & -sources
+                sources ^= from_bit
+                before = opponent_ranks[others | from_bit] * num_previous_opponent + mover_rank
+                result = previous_results[before]
+                if not ply % 2:  # The player to move loses here, so the move before won, unless it won sooner
+                    if result and (not result % 2 or result <= ply + 1):
+                        continue
+                    previous_results[before] = ply + 1
+                    move_from[before], move_to[before] = from_bit.bit_length() - 1, to_square
+                    buckets[ply + 1].append(before << 3 | previous_number)
+                    continue
+                if result:
+                    continue
+                counters[before] -= 1
+                if not counters[before]:
+                    plies = _next_ply(ply)
+                    if self._capture_losses[previous][before] > plies:
+                        plies = self._capture_losses[previous][before]  # The capture move already recorded
+                    else:
+                        move_from[before], move_to[before] = from_bit.bit_length() - 1, to_square
+                    previous_results[before] = plies
+                    buckets[plies].append(before << 3 | previous_number)
+
+
+def _next_ply(ply):
+    """
+    Returns the result one ply before a result of ply plies. Raises ValueError past MAX_PLIES, as a longer result
+    can't be stored, and clamping it would turn a loss into a win.
+    """
+    if ply >= MAX_PLIES:
+        raise ValueError("An endgame lasts more than %d plies, too long to store" % MAX_PLIES)
+    return ply + 1
+
+
+class Tablebase:
+    """
+    An endgame tablebase file opened for lookups. probe() finds a game's position in O(1): the canonical key of the
+    position is computed from the pieces, then looked up in the memory-mapped index.
+    """
+    def __init__(self, path=DEFAULT_PATH):
+        """Opens the tablebase file."""
+        self._index = MappedIndex(path, MAGIC)
+        self._loss_pieces = self._index.rule
+        self._max_pieces = self._index.extra
+
+    def get_max_pieces(self):
+        """Returns the most pieces on the board in a solved endgame."""
+        return self._max_pieces
+
+    def probe(self, game):
+        """
+        Returns the LookupResult of the game's position: the result for the player to move with the best move, or a
+        draw without a move. Returns None if the position has too many pieces or the game is of another variant.
+        """
+        variant = game.get_variant()
+        if (variant.board_size != self._index.board_size or variant.jumps or variant.line_length or
+                not variant.win_captures or get_loss_pieces(variant) != self._loss_pieces):
+            return None
+        if game.get_game_state() != "UNFINISHED":
+            return None
+        position, player = game.get_position(), game.get_active_player()
+        mover, opponent = position.get_pieces(player), position.get_pieces("RED" if player == "BLACK" else "BLACK")
+        num_mover, num_opponent = popcount(mover), popcount(opponent)
+        if num_mover + num_opponent > self._max_pieces or min(num_mover, num_opponent) <= self._loss_pieces:
+            return None
+        tables = position.get_tables()
+        key, symmetry = canonical_key(tables, mover, opponent)
+        value = self._index.get(key)
+        if value is None:
+            return LookupResult("tablebase", None, "DRAW")
+        inverse = tables.inverse_symmetries[symmetry]
+        move = tables.squares[inverse[value >> 8 & 255]] + tables.squares[inverse[value >> 16 & 255]]
+        plies = value & 255
+        return LookupResult("tablebase", move, "WIN" if plies % 2 else "LOSS", plies)
+
+    def close(self):
+        """Closes the tablebase file."""
+        self._index.close()
+
+
+def main(argv=None):
+    """Builds a tablebase from the command line."""
+    parser = argparse.ArgumentParser(description="Builds the Hasami Shogi endgame tablebase.")
+    parser.add_argument("--pieces", type=int, default=4, help="most pieces on the board, both colors together")
+    parser.add_argument("--variant", default=STANDARD.name, help="rules of the endgames, e.g. small for 7x7")
+    parser.add_argument("--output", default=DEFAULT_PATH, help="index file to write")
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    builder = TablebaseBuilder(get_variant(args.variant), args.pieces)
+    builder.build(report=print)
+    num_entries = builder.write(args.output)
+    print("%d entries written to %s (%d bytes) in %.1fs" % (num_entries, args.output, os.path.getsize(args.output),
+                                                           time.perf_counter() - start))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
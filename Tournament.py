@@ -0,0 +1,134 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Headless self-play tournament. Plays games between two players across a process pool and writes one JSON line per
+# game to the output file as games finish. Usage: python Tournament.py --games 100 --black ai --red random
+
+import argparse
+import functools
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from Game import HasamiShogiGame
+from Engine import AlphaBetaEngine
+from MonteCarlo import MCTSEngine
+from OpeningBook import OpeningBook
+from Record import GameRecordWriter, encode_game
+from Tablebase import Tablebase
+
+
+def make_player(player, settings, seed):
+    """Returns a function choosing a move for a game, for the player name 'random', 'ai' or 'mcts'."""
+    if player == "random":
+        rng = random.Random(seed)
+        return lambda game: rng.choice(game.legal_moves())
+    if player == "mcts":
+        engine = MCTSEngine(time_limit=settings["time"], seed=seed)
+        return lambda game: engine.search(game)[0]
+    engine = AlphaBetaEngine(time_limit=settings["time"], max_depth=settings["depth"], hash_mb=settings["hash"])
+    return lambda game: engine.search(game)[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _open_book(path):
+    """Returns the OpeningBook at the path, opened once per worker process and shared by its games."""
+    return OpeningBook(path)
+
+
+@functools.lru_cache(maxsize=None)
+def _open_tablebase(path):
+    """Returns the Tablebase at the path, opened once per worker process and shared by its games."""
+    return Tablebase(path)
+
+
+def play_game(game_number, black, red, settings):
+    """Plays one game and returns its result as a dictionary, with the encoded game record under 'record'."""
+    start = time.perf_counter()
+    seed = settings["seed"] + game_number
+    players = dict(BLACK=make_player(black, settings, seed), RED=make_player(red, settings, seed + 1))
+    game = HasamiShogiGame(repetition_limit=settings["repetitions"])
+    lookups = [_open_book(settings["book"])] if settings.get("book") else []
+    if settings.get("tablebase"):
+        lookups.append(_open_tablebase(settings["tablebase"]))
+    game.set_lookups(lookups)
+    num_moves = 0
+    while game.get_game_state() == "UNFINISHED" and num_moves < settings["max_moves"]:
+        if not game.legal_moves():
+            break
+        game.make_move(*players[game.get_active_player()](game))
+        num_moves += 1
+    return dict(game=game_number, black=black, red=red, result=game.get_game_state(), moves=num_moves,
+                black_captured=game.get_num_captured_pieces("BLACK"), red_captured=game.get_num_captured_pieces("RED"),
+                seconds=round(time.perf_counter() - start, 4), worker=os.getpid(), record=encode_game(game))
+
+
+def run_tournament(num_games, black, red, settings, output, workers=None, archive=None):
+    """
+    Plays num_games games on a pool of worker processes, writing each result to the output file(and the game record to
+    the archive file, if given) as soon as it finishes. Returns a report dictionary with totals, games per second and
+    per-worker stats.
+    """
+    start = time.perf_counter()
+    results, worker_stats = dict(), dict()
+    writer = GameRecordWriter(archive) if archive else None
+    with open(output, "w") as output_file, ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(play_game, game_number, black, red, settings) for game_number in range(num_games)]
+        for future in as_completed(futures):
+            result = future.result()
+            record = result.pop("record")
+            if writer is not None:
+                writer.write_record(record)
+            output_file.write(json.dumps(result) + "\n")
+            output_file.flush()
+            results[result["result"]] = results.get(result["result"], 0) + 1
+            stats = worker_stats.setdefault(result["worker"], dict(games=0, moves=0, seconds=0.0))
+            stats["games"] += 1
+            stats["moves"] += result["moves"]
+            stats["seconds"] += result["seconds"]
+    if writer is not None:
+        writer.close()
+    elapsed = time.perf_counter() - start
+    for stats in worker_stats.values():
+        stats["seconds"] = round(stats["seconds"], 3)
+        stats["games_per_sec"] = round(stats["games"] / stats["seconds"], 2) if stats["seconds"] else 0.0
+    return dict(games=num_games, results=results, seconds=round(elapsed, 3),
+                games_per_sec=round(num_games / elapsed, 2) if elapsed else 0.0, workers=worker_stats)
+
+
+def main(argv=None):
+    """Runs a tournament from the command line and prints the report."""
+    parser = argparse.ArgumentParser(description="Headless Hasami Shogi self-play tournament.")
+    parser.add_argument("--games", type=int, default=10, help="number of games to play")
+    parser.add_argument("--black", choices=("random", "ai", "mcts"), default="ai", help="player for black")
+    parser.add_argument("--red", choices=("random", "ai", "mcts"), default="random", help="player for red")
+    parser.add_argument("--time", type=float, default=0.1, help="ai and mcts time limit per move in seconds")
+    parser.add_argument("--depth", type=int, default=32, help="ai maximum search depth")
+    parser.add_argument("--hash", type=float, default=4, help="ai transposition table size in megabytes")
+    parser.add_argument("--book", default=None, help="opening book file for the ai players")
+    parser.add_argument("--tablebase", default=None, help="endgame tablebase file for the ai players")
+    parser.add_argument("--max-moves", type=int, default=300, help="moves before a game is stopped unfinished")
+    parser.add_argument("--repetitions", type=int, default=3, help="repetitions of a position for a draw")
+    parser.add_argument("--seed", type=int, default=0, help="seed for the random players")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes, default one per core")
+    parser.add_argument("--output", default="tournament.jsonl", help="JSON lines file for the game results")
+    parser.add_argument("--archive", default=None, help="binary game record archive to write the games to")
+    args = parser.parse_args(argv)
+    settings = dict(time=args.time, depth=args.depth, hash=args.hash, max_moves=args.max_moves,
+                    repetitions=args.repetitions, seed=args.seed, book=args.book, tablebase=args.tablebase)
+    report = run_tournament(args.games, args.black, args.red, settings, args.output, args.workers, args.archive)
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+from array import array
+
+EXACT, LOWER_BOUND, UPPER_BOUND = 1, 2, 3
+NO_MOVE = 0xFFFF
+# Bytes per entry: 8 key, 1 depth, 4 score, 1 flag, 2 move. A move is stored as four nibbles: from row, from column,
+# to row, to column, so boards up to 15x15 fit.
+ENTRY_BYTES = 16
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results keyed by Zobrist hash. The entries are kept in flat arrays, so the memory used
+    is capped at size_mb. Each bucket has two slots: a depth-preferred slot which keeps the deepest result, and an
+    always-replace slot which takes everything else.
+    """
+    def __init__(self, size_mb=16):
+        """Creates a table using at most size_mb megabytes."""
+        self._num_buckets = max(1, int(size_mb * 1024 * 1024) // (2 * ENTRY_BYTES))
+        num_slots = 2 * self._num_buckets
+        self._keys = array("Q", bytes(8 * num_slots))
+        self._depths = array("b", bytes(num_slots))
+        self._scores = array("i", bytes(4 * num_slots))
+        self._flags = array("b", bytes(num_slots))  # 0 marks an empty slot
+        self._moves = array("H", [NO_MOVE]) * num_slots
+        self._probes = 0
+        self._hits = 0
+        self._stores = 0
+
+    def get_num_entries(self):
+        """Returns the number of slots in the table."""
+        return 2 * self._num_buckets
+
+    def probe(self, key):
+        """Returns (depth, score, flag, move) stored for the hash key, or None. Move is None if no move was stored."""
+        self._probes += 1
+        slot = (key % self._num_buckets) * 2
+        for slot in (slot, slot + 1):
+            if self._flags[slot] and self._keys[slot] == key:
+                self._hits += 1
+                move = self._moves[slot]
+                move = None if move == NO_MOVE else (move >> 12, move >> 8 & 15, move >> 4 & 15, move & 15)
+                return self._depths[slot], self._scores[slot], self._flags[slot], move
+        return None
+
+    def store(self, key, depth, score, flag, move=None):
+        """
+        Stores a search result for the hash key. It goes in the depth-preferred slot if that slot is empty, holds the
+        same position, or was searched less deep, else in the always-replace slot.
+        """
+        self._stores += 1
+        slot = (key % self._num_buckets) * 2
+        if self._flags[slot] and self._keys[slot] != key and self._depths[slot] > depth:
+            slot += 1
+        self._keys[slot] = key
+        self._depths[slot] = min(depth, 127)
+        self._scores[slot] = score
+        self._flags[slot] = flag
+        if move is None:
+            self._moves[slot] = NO_MOVE
+        else:
+            self._moves[slot] = move[0] << 12 | move[1] << 8 | move[2] << 4 | move[3]
+
+    def clear(self):
+        """Empties the table and resets the counters."""
+        self._flags = array("b", bytes(len(self._flags)))
+        self._probes = self._hits = self._stores = 0
+
+    def get_probe_counts(self):
+        """Returns the number of probes and hits so far."""
+        return self._probes, self._hits
+
+    def get_hit_rate(self):
+        """Returns the fraction of probes which found an entry."""
+        return self._hits / self._probes if self._probes else 0.0
+
+    def get_stats(self):
+        """Returns a dictionary of the table counters: probes, hits, hit rate, stores and slots in use."""
+        return dict(probes=self._probes, hits=self._hits, hit_rate=self.get_hit_rate(), stores=self._stores,
+                    used=self.get_num_entries() - self._flags.count(0), entries=self.get_num_entries())
@@ -0,0 +1,93 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Rule variants. A Variant sets the board size, the starting ranks, how a game is won and whether pieces may jump.
+# HasamiShogiGame(variant=get_variant("dai-hasami")) plays a variant, the standard game is the default.
+
+import functools
+from Position import DIRECTIONS, get_tables
+
+
+class Variant:
+    """
+    A set of Hasami Shogi rules. The move, capture and hash tables of the board size are built once and shared by all
+    variants of that size, as are the five in a row tables.
+    """
+    def __init__(self, name, board_size=9, start_rows=1, win_captures=None, line_length=0, jumps=False):
+        """
+        Creates a variant. Each color starts with start_rows full ranks and wins once win_captures of the opponent's
+        pieces are captured(by default all but one, 0 for no capture win). With a line_length, a color also wins
+        with that many pieces in a row(orthogonal or diagonal) outside its starting ranks. With jumps, a piece may
+        also jump over an adjacent piece of either color to the empty square just past it.
+        """
+        self.name = name
+        self.board_size = board_size
+        self.start_rows = start_rows
+        self.num_pieces = board_size * start_rows
+        self.win_captures = self.num_pieces - 1 if win_captures is None else win_captures
+        self.line_length = line_length
+        self.jumps = jumps
+
+    def get_tables(self):
+        """Returns the BoardTables of the board size."""
+        return get_tables(self.board_size)
+
+    def get_start(self):
+        """Returns the starting (black, red) bitboards."""
+        return get_tables(self.board_size).get_start(self.start_rows)
+
+    def get_line_windows(self, player_color):
+        """
+        Returns for each square the bitboards of the lines of line_length squares through it which lie outside the
+        player's starting ranks, the lines which win the game for the player.
+        """
+        return _make_line_windows(self.board_size, self.line_length, self.start_rows, player_color)
+
+    def __str__(self):
+        return self.name
+
+
+@functools.lru_cache(maxsize=None)
+def _make_line_windows(size, length, camp_rows, player_color):
+    """Returns the winning lines through each square, see Variant.get_line_windows."""
+    camp = range(size - camp_rows, size) if player_color == "BLACK" else range(camp_rows)
+    windows = [[] for _ in range(size * size)]
+    if not length:
+        return tuple(tuple(square_windows) for square_windows in windows)
+    for d_row, d_col in DIRECTIONS[2:] + ((1, 1), (1, -1)):  # Down, right and both diagonals cover every line once
+        for row in range(size):
+            for col in range(size):
+                squares = [(row + step * d_row, col + step * d_col) for step in range(length)]
+                if not all(0 <= line_row < size and 0 <= line_col < size for line_row, line_col in squares):
+                    continue
+                if any(line_row in camp for line_row, _ in squares):
+                    continue
+                window = sum(1 << (line_row * size + line_col) for line_row, line_col in squares)
+                for line_row, line_col in squares:
+                    windows[line_row * size + line_col].append(window)
+    return tuple(tuple(square_windows) for square_windows in windows)
+
+
+# Preset variants by name.
+VARIANTS = dict((variant.name, variant) for variant in (
+    Variant("standard"),
+    Variant("capture-all", win_captures=9),
+    Variant("small", board_size=7),
+    Variant("large", board_size=11),
+    Variant("dai-hasami", start_rows=2, win_captures=0, line_length=5, jumps=True),
+))
+STANDARD = VARIANTS["standard"]
+
+
+def get_variant(name):
+    """Returns the preset variant with the name, raises ValueError if there is none."""
+    if name not in VARIANTS:
+        raise ValueError("Unknown variant %r, choose from %s" % (name, ", ".join(VARIANTS)))
+    return VARIANTS[name]
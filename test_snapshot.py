@@ -0,0 +1,76 @@
+# Hasami Shogi - Variant 1
+# By Josh Harris (jharrisjoshua)
+
+# Description:  The program represents an abstract board game called Hasami Shogi, variant 1. The players start with
+#               nine pieces on the first and last rank(row) of a 9x9 board. Black moves first, followed by Red. A
+#               player wins by capturing all but one of their opponents pieces. Pieces can move to any empty space on
+#               the same rank or file(no jumping). You can capture enemy pieces (one or multiple) by blocking them on
+#               opposite sides with two of your pieces( corner pieces must be blocked orthogonally). Win condition is
+#               assumed to be all or all but one piece captured.
+
+# Snapshot round trips, of games from the start and games set up from notation. Usage: python -m pytest
+
+import random
+import pytest
+from Game import MAX_REPETITION_LIMIT, HasamiShogiGame
+from Variant import VARIANTS
+
+
+def _play_random(game, num_moves, seed):
+    """Makes up to num_moves random moves in the game."""
+    rng = random.Random(seed)
+    for _ in range(num_moves):
+        moves = game.legal_moves()
+        if not moves:
+            break
+        game.make_move(*rng.choice(moves))
+
+
+def _assert_same_game(game, restored):
+    """Checks that the restored game has the position, turn, state, captures and history of the game."""
+    assert restored.get_notation() == game.get_notation()
+    assert restored.get_hash() == game.get_hash()
+    assert restored.get_game_state() == game.get_game_state()
+    for color in ("BLACK", "RED"):
+        assert restored.get_num_captured_pieces(color) == game.get_num_captured_pieces(color)
+    assert restored.get_move_history() == game.get_move_history()
+    assert restored.snapshot() == game.snapshot()
+
+
+@pytest.mark.parametrize("variant_name", list(VARIANTS))
+def test_snapshot_round_trip(variant_name):
+    game = HasamiShogiGame(repetition_limit=3, variant=VARIANTS[variant_name])
+    _play_random(game, 60, seed=1)
+    _assert_same_game(game, HasamiShogiGame.from_snapshot(game.snapshot()))
+
+
+@pytest.mark.parametrize("num_moves", [0, 1, 2, 30])
+def test_snapshot_round_trip_from_notation(num_moves):
+    game = HasamiShogiGame.from_notation("RRRRRRRRR/9/9/9/9/9/B8/9/1BBBBBBBB r")
+    _play_random(game, num_moves, seed=num_moves)
+    restored = HasamiShogiGame.from_snapshot(game.snapshot())
+    _assert_same_game(game, restored)
+    while restored.get_move_history():
+        restored.unmake_move()
+    assert restored.get_notation() == "RRRRRRRRR/9/9/9/9/9/B8/9/1BBBBBBBB r"
+
+
+def test_snapshot_round_trip_from_notation_with_captures():
+    game = HasamiShogiGame.from_notation("2R2R2R/1R2B4/B5R1B/1R4B2/9/R5B2/8B/2BR5/1B3B3 b")
+    _play_random(game, 20, seed=2)
+    _assert_same_game(game, HasamiShogiGame.from_snapshot(game.snapshot()))
+
+
+def test_reset_forgets_the_start_position():
+    game = HasamiShogiGame.from_notation("RRRRRRRRR/9/9/9/9/9/B8/9/1BBBBBBBB r")
+    game.reset()
+    _play_random(game, 10, seed=3)
+    assert len(game.snapshot()) == len(HasamiShogiGame().snapshot()) + len(game.get_move_history())
+    _assert_same_game(game, HasamiShogiGame.from_snapshot(game.snapshot()))
+
+
+def test_snapshot_repetition_limit():
+    game = HasamiShogiGame(repetition_limit=MAX_REPETITION_LIMIT)
+    assert HasamiShogiGame.from_snapshot(game.snapshot()).get_repetition_limit() == MAX_REPETITION_LIMIT
+    with pytest.raises(ValueError):
+        HasamiShogiGame(repetition_limit=MAX_REPETITION_LIMIT + 1)